@@ -0,0 +1,74 @@
+"""Decoding and validating a /store/batch body: row objects vs columnar payloads.
+
+"rows" is the ``/store/batch`` path: the JSON array is decoded, one
+``AnomalyInput`` is built per row (as FastAPI does for
+``List[AnomalyInput]``), then ``.dict()`` and ``validate_frame``.
+"json columns" and "msgpack columns" run ``parse_columnar_batch`` on the
+same batch sent as one array per field. Prediction and the database payload
+are timed for both so the body overhead can be compared with inference.
+Validated frames must match.
+
+Usage: python benchmarks/bench_batch_payload.py [n_rows ...]
+"""
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+
+import msgpack
+from pydantic import TypeAdapter
+
+from common import scaled_records, timed, write_model_bundle
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from columnar_payload import parse_columnar_batch
+    from file_processor import FileProcessor
+    from models import AnomalyInput
+    from predictor import TAMSPredictor
+
+ROWS_ADAPTER = TypeAdapter(list[AnomalyInput])
+
+
+def rows_path(body):
+    anomalies = ROWS_ADAPTER.validate_python(json.loads(body))
+    return FileProcessor.validate_frame([anomaly.dict() for anomaly in anomalies])
+
+
+def bodies(n_rows):
+    records = [{key: str(value) for key, value in record.items()} for record in scaled_records(n_rows)]
+    columns = {field: [record[field] for record in records] for field in records[0]}
+    return {
+        "rows": (json.dumps(records).encode(), None),
+        "json columns": (json.dumps(columns).encode(), "application/json"),
+        "msgpack columns": (msgpack.packb(columns), "application/msgpack"),
+    }
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.environ.get("MODEL_PATH") or write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor = TAMSPredictor(model_path)
+
+    print(f"{'rows':>7} {'payload':>16} {'body KB':>8} {'decode+validate ms':>19} {'predict ms':>11} {'db payload ms':>14}")
+    for n_rows in sizes:
+        expected = None
+        for name, (body, content_type) in bodies(n_rows).items():
+            if content_type is None:
+                seconds, frame = timed(rows_path, body)
+            else:
+                seconds, frame = timed(parse_columnar_batch, body, content_type)
+            if expected is None:
+                expected = frame
+            assert frame.reset_index(drop=True).equals(expected.reset_index(drop=True)), name
+            with contextlib.redirect_stdout(io.StringIO()):
+                predict_seconds, predictions = timed(predictor.predict_frame, frame)
+            payload_seconds, _ = timed(FileProcessor.prepare_for_database_frame, frame, predictions)
+            print(f"{n_rows:>7} {name:>16} {len(body) / 1024:>8.0f} {seconds * 1000:>19.1f} "
+                  f"{predict_seconds * 1000:>11.1f} {payload_seconds * 1000:>14.1f}")
+
+
+if __name__ == "__main__":
+    main([int(n) for n in sys.argv[1:]] or [1000, 10000, 50000])
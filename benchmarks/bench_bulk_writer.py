@@ -0,0 +1,135 @@
+"""Single-request batch insert vs ``BulkWriter`` against a stand-in PostgREST.
+
+First checks the writer's failure handling: with a request body limit and a
+share of transient 503 errors every row is still stored exactly once (the
+single request is rejected with 413), and a missing import batch record
+falls back to inserting without ``import_batch_id``, and a chunk stored
+by the server whose response was lost is not stored twice when retried.
+Then inserts ``rows``
+rows with a fixed server latency and reports the wall time, the client's
+peak traced memory and the insert requests sent.
+
+Usage: python benchmarks/bench_bulk_writer.py [rows ...]
+       (LATENCY_MS sets the server latency, default 20)
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+import tracemalloc
+import uuid
+
+import httpx
+
+from bench_database_client import rows_payload
+from postgrest_standin import StandInPostgrest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from bulk_writer import BulkWriter
+    from postgrest_client import AsyncPostgrestClient
+
+
+def make_client(server):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return AsyncPostgrestClient(server.url, server.key)
+
+
+class LostResponseClient:
+    """Stores the rows of the first insert, then times out as if its response were lost"""
+
+    def __init__(self):
+        self.stored = {}
+        self.calls = 0
+
+    async def insert_rows(self, table, rows, ignore_duplicates=False):
+        self.calls += 1
+        for row in rows:
+            if row['id'] in self.stored and not ignore_duplicates:
+                raise Exception("HTTP 409: duplicate key value violates unique constraint")
+            self.stored.setdefault(row['id'], row)
+        if self.calls == 1:
+            raise httpx.ReadTimeout("response lost")
+
+
+async def check_failures():
+    rows = rows_payload(3000)
+    with StandInPostgrest(latency=0, missing_tables={"missing"}, max_body_bytes=128 * 1024, failure_rate=0.3) as server:
+        client = make_client(server)
+        try:
+            await client.create_anomalies_batch([dict(r) for r in rows], "b")
+            raise AssertionError("oversized single request was accepted")
+        except Exception as e:
+            assert "HTTP 413" in str(e)
+        writer = BulkWriter(client, chunk_rows=200, backoff_seconds=0.01, max_retries=10)
+        result = await writer.write(rows, "b")
+        stored = server.table("anomalies")
+        assert result.rows_stored == len(rows) == len(stored), result.to_dict()
+        assert max(chunk.size_bytes for chunk in result.chunks) < 128 * 1024
+        assert writer.retries_total == server.stats()["failures"] > 0
+        print(f"failures: {len(rows)} rows stored in {len(result.chunks)} chunks after {writer.retries_total} retries "
+              f"(single request: 413)")
+
+        # Non-transient errors fail their chunk only, without retrying
+        writer = BulkWriter(client, chunk_rows=200, max_retries=10, table="missing")
+        server.reset_stats()
+        result = await writer.write(rows[:500], "b")
+        assert result.rows_failed == 500 and writer.retries_total == 0 and len(result.errors) == 3
+        await client.close()
+
+    with StandInPostgrest(latency=0, missing_batches={"ghost"}) as server:
+        client = make_client(server)
+        writer = BulkWriter(client, chunk_rows=100)
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = await writer.write(rows[:1000], "ghost")
+        stored = server.table("anomalies").values()
+        assert result.rows_stored == 1000 and writer.fk_fallbacks == 1
+        assert all("import_batch_id" not in row for row in stored)
+        await client.close()
+    print("failures: missing import batch falls back to rows without import_batch_id")
+
+    # A retried chunk the server had already stored: the rows keep their ids and duplicates are ignored
+    client = LostResponseClient()
+    writer = BulkWriter(client, ignore_duplicates=True, backoff_seconds=0.01)
+    result = await writer.write([{'id': str(uuid.uuid4()), **row} for row in rows[:2]], "b")
+    assert result.rows_stored == 2 == len(client.stored) and writer.retries_total == 1, result.to_dict()
+    print("failures: a chunk whose response was lost is stored once when retried")
+
+
+async def measure(server, insert):
+    server.reset_stats()
+    tracemalloc.start()
+    started = time.perf_counter()
+    stored = await insert()
+    elapsed = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return stored, elapsed, peak / 1e6, server.stats()["requests"]
+
+
+async def main(sizes):
+    await check_failures()
+    latency = float(os.environ.get("LATENCY_MS", "20")) / 1000
+    print(f"{'rows':>8} {'mode':>8} {'wall s':>7} {'rows/s':>9} {'peak MB':>8} {'requests':>9}")
+    for n_rows in sizes:
+        rows = rows_payload(n_rows)
+        with StandInPostgrest(latency=latency) as server:
+            client = make_client(server)
+            writer = BulkWriter(client)
+
+            async def single():
+                return len(await client.create_anomalies_batch([dict(r) for r in rows], "b"))
+
+            async def bulk():
+                return (await writer.write(rows, "b")).rows_stored
+
+            for name, insert in (("single", single), ("bulk", bulk)):
+                stored, elapsed, peak, requests = await measure(server, insert)
+                assert stored == n_rows
+                print(f"{n_rows:>8} {name:>8} {elapsed:>7.3f} {n_rows / elapsed:>9.0f} {peak:>8.1f} {requests:>9}")
+            await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [10000, 50000]))
@@ -0,0 +1,70 @@
+"""Batch path with per-row dicts vs one DataFrame end to end.
+
+Starts from an uploaded sheet already parsed into a DataFrame and times
+each stage up to the database rows: "records" converts it to dicts,
+validates row by row, predicts and builds the payload from the dicts (the
+previous path); "frame" keeps the DataFrame through ``validate_frame``,
+``predict_frame`` and ``prepare_for_database_frame``. Payloads must match.
+
+Usage: python benchmarks/bench_columnar_batch.py [n_rows ...]
+       (MODEL_PATH uses an existing bundle instead of training a 10-tree model)
+"""
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from common import scaled_raw_frame, write_model_bundle
+
+from file_processor import FileProcessor
+from predictor import TAMSPredictor
+
+
+def timed(stages, name, fn, *args):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = fn(*args)
+    stages[name] = time.perf_counter() - start
+    return result
+
+
+def records_path(predictor, raw):
+    stages = {}
+    records = timed(stages, "parse", FileProcessor._process_dataframe, raw)
+    validated = timed(stages, "validate", lambda: [FileProcessor.validate_anomaly_data(r) for r in records])
+    predictions = timed(stages, "predict", predictor.predict_batch, validated)
+    payload = timed(stages, "payload", FileProcessor.prepare_for_database_batch, validated, predictions)
+    return stages, payload
+
+
+def frame_path(predictor, raw):
+    stages = {}
+    frame = timed(stages, "parse", FileProcessor._prepare_frame, raw)
+    validated = timed(stages, "validate", FileProcessor.validate_frame, frame)
+    predictions = timed(stages, "predict", predictor.predict_frame, validated)
+    payload = timed(stages, "payload", FileProcessor.prepare_for_database_frame, validated, predictions)
+    return stages, payload
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.environ.get("MODEL_PATH") or write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor = TAMSPredictor(model_path)
+
+    print(f"{'rows':>8} {'path':>8} {'parse':>7} {'validate':>9} {'predict':>8} {'payload':>8} {'total s':>8}")
+    for n_rows in sizes:
+        raw = scaled_raw_frame(n_rows)
+        results = {"records": records_path(predictor, raw), "frame": frame_path(predictor, raw)}
+        # Row ids are random; every other field must match
+        assert ([{**row, 'id': None} for row in results["records"][1]]
+                == [{**row, 'id': None} for row in results["frame"][1]]), "payloads differ"
+        for name, (stages, _) in results.items():
+            print(f"{n_rows:>8} {name:>8} {stages['parse']:>7.3f} {stages['validate']:>9.3f} "
+                  f"{stages['predict']:>8.3f} {stages['payload']:>8.3f} {sum(stages.values()):>8.3f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000])
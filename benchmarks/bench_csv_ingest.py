@@ -0,0 +1,86 @@
+"""Peak memory and time of CSV ingestion: whole-file vs streamed pipeline.
+
+"whole" is the previous endpoint flow (read the upload, parse it at once,
+one list of dicts, one prediction call and one insert); "streamed" runs
+``FileProcessor.iter_csv_chunks`` through the ``IngestPipeline``. Each mode
+runs in its own process and the database insert is replaced by JSON
+encoding of the payload, which is what the HTTP client does with it. Peak
+RSS is reported above the process' RSS once the model is loaded
+(the model load itself can peak higher, which then hides smaller runs);
+NumPy's huge-page hint is disabled so RSS does not depend on fragmentation.
+
+Usage: python benchmarks/bench_csv_ingest.py [n_rows ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR, scaled_raw_frame, write_model_bundle
+
+WORKER = r"""
+import asyncio, contextlib, io, json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+mode, csv_path, model_path = sys.argv[2:5]
+with contextlib.redirect_stdout(io.StringIO()):
+    from predictor import TAMSPredictor
+    from inference_executor import InferenceExecutor
+    from file_processor import FileProcessor
+    from ingest_pipeline import IngestPipeline
+    from starlette.datastructures import UploadFile
+    executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def store(records, predictions):
+    payload = FileProcessor.prepare_for_database_batch(records, predictions)
+    json.dumps(payload)
+    return len(payload)
+
+async def store_frame(frame, predictions):
+    payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+    json.dumps(payload)
+    return len(payload)
+
+async def main():
+    upload = UploadFile(open(csv_path, "rb"), filename="export.csv")
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "whole":
+            records = await FileProcessor.process_csv_file(upload)
+            return await store(records, await executor.predict_batch(records))
+        pipeline = IngestPipeline(executor.predict_frame, store_frame)
+        return (await pipeline.run(FileProcessor.iter_csv_chunks(upload))).rows_stored
+
+loaded = rss_mb()
+start = time.perf_counter()
+stored = asyncio.run(main())
+print(json.dumps({"stored": stored, "seconds": time.perf_counter() - start, "loaded_mb": loaded, "peak_mb": peak_rss_mb()}))
+"""
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        # Huge pages make RSS depend on how fragmented the machine's memory is
+        env = dict(os.environ, NUMPY_MADVISE_HUGEPAGE="0")
+        print(f"{'rows':>9} {'CSV MB':>7} {'mode':>9} {'seconds':>8} {'peak MB over loaded':>20}")
+        for n_rows in sizes:
+            csv_path = os.path.join(tmp, "export.csv")
+            scaled_raw_frame(n_rows).to_csv(csv_path, index=False)
+            csv_mb = os.path.getsize(csv_path) / 2**20
+            for mode in ("whole", "streamed"):
+                out = subprocess.run([sys.executable, "-c", WORKER, ROOT_DIR, mode, csv_path, model_path],
+                                     capture_output=True, text=True, check=True, env=env).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                assert r["stored"] == n_rows
+                print(f"{n_rows:>9} {csv_mb:>7.1f} {mode:>9} {r['seconds']:>8.2f} {r['peak_mb'] - r['loaded_mb']:>20.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100_000, 500_000])
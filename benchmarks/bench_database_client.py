@@ -0,0 +1,118 @@
+"""Storage clients against a local stand-in PostgREST server.
+
+First checks that ``AsyncPostgrestClient`` behaves like ``SupabaseClient``
+(inserts, import batches, the foreign key retry and the missing
+import_batches table). Then runs ``concurrency`` simultaneous batch inserts
+with a fixed server latency and reports the wall time, the longest
+event-loop stall seen by a 5 ms ticker, the server-side concurrency and
+the TCP connections used.
+
+Usage: python benchmarks/bench_database_client.py [concurrency ...]
+       (LATENCY_MS sets the server latency, default 20; ROWS the rows per insert, default 100)
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import time
+
+from common import scaled_records
+from postgrest_standin import StandInPostgrest
+
+os.environ.setdefault("SUPABASE_URL", "http://127.0.0.1:9")
+os.environ.setdefault("SUPABASE_ROLE_KEY", "unused.service.key")
+with contextlib.redirect_stdout(io.StringIO()):
+    from database import SupabaseClient
+    from postgrest_client import AsyncPostgrestClient
+
+
+def make_clients(server):
+    os.environ["SUPABASE_URL"], os.environ["SUPABASE_ROLE_KEY"] = server.url, server.key
+    with contextlib.redirect_stdout(io.StringIO()):
+        return {"supabase": SupabaseClient(), "async": AsyncPostgrestClient()}
+
+
+def rows_payload(n_rows):
+    return [
+        {'equipement_id': r['num_equipement'], 'description': r['description'], 'system_id': r['systeme'],
+         'service': r['section_proprietaire'], 'status': 'nouvelle', 'source_origine': 'api',
+         'ai_fiabilite_integrite_score': 3, 'ai_disponibilite_score': 3,
+         'ai_process_safety_score': 3, 'ai_criticality_level': 9}
+        for r in scaled_records(n_rows)
+    ]
+
+
+def without_ids(rows):
+    return [{k: v for k, v in row.items() if k not in ("id", "import_batch_id")} for row in rows]
+
+
+async def check_behaviour():
+    """Same results from both clients, including the fallbacks"""
+    with StandInPostgrest(latency=0, missing_batches={"ghost-batch"}) as server:
+        results = {}
+        for name, client in make_clients(server).items():
+            with contextlib.redirect_stdout(io.StringIO()):
+                batch_id = await client.create_import_batch("export.csv", 0, status="processing")
+                stored = await client.create_anomalies_batch(rows_payload(20), batch_id)
+                single = await client.create_anomaly(rows_payload(1)[0])
+                await client.update_import_batch(batch_id, len(stored), "completed")
+                # Foreign key violation: retried without import_batch_id
+                retried = await client.create_anomalies_batch(rows_payload(3), "ghost-batch")
+            assert server.table("import_batches")[batch_id]["status"] == "completed"
+            assert all(row["import_batch_id"] == batch_id for row in stored)
+            assert all("import_batch_id" not in row for row in retried)
+            results[name] = (without_ids(stored), without_ids([single]), without_ids(retried))
+            await client.close()
+        assert results["async"] == results["supabase"], "clients returned different rows"
+
+    with StandInPostgrest(latency=0, missing_tables={"import_batches"}) as server:
+        for client in make_clients(server).values():
+            with contextlib.redirect_stdout(io.StringIO()):
+                # Missing import_batches table: a local id is returned
+                assert len(await client.create_import_batch("export.csv", 10)) == 36
+            await client.close()
+    print("behaviour: async client matches the supabase client")
+
+
+async def run_inserts(client, concurrency, rows):
+    ticks = []
+
+    async def ticker():
+        while True:
+            ticks.append(time.perf_counter())
+            await asyncio.sleep(0.005)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0)
+    stored = await asyncio.gather(*(client.create_anomalies_batch([dict(r) for r in rows], "b") for _ in range(concurrency)))
+    ticks.append(time.perf_counter())
+    tick.cancel()
+    assert sum(map(len, stored)) == concurrency * len(rows)
+    # Longest gap between two ticks beyond the 5 ms sleep: the event loop could not run anything else
+    stall = max(later - earlier for earlier, later in zip(ticks, ticks[1:])) - 0.005
+    return ticks[-1] - ticks[0], max(stall, 0.0)
+
+
+async def main(levels):
+    await check_behaviour()
+    latency = float(os.environ.get("LATENCY_MS", "20")) / 1000
+    rows = rows_payload(int(os.environ.get("ROWS", "100")))
+    with StandInPostgrest(latency=latency) as server:
+        clients = make_clients(server)
+        print(f"{'concurrent':>10} {'client':>9} {'wall s':>7} {'inserts/s':>10} {'max stall ms':>13} "
+              f"{'server concurrency':>19} {'connections':>12}")
+        for concurrency in levels:
+            for name, client in clients.items():
+                await run_inserts(client, 2, rows)  # warm up connections
+                server.reset_stats()
+                elapsed, stall = await run_inserts(client, concurrency, rows)
+                stats = server.stats()
+                print(f"{concurrency:>10} {name:>9} {elapsed:>7.3f} {concurrency / elapsed:>10.1f} {stall * 1000:>13.1f} "
+                      f"{stats['max_in_flight']:>19} {stats['connections']:>12}")
+        for client in clients.values():
+            await client.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1, 10, 50]))
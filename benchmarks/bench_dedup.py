@@ -0,0 +1,149 @@
+"""Re-importing overlapping exports with and without the deduplication index.
+
+Runs CSV exports through ``IngestPipeline`` as the upload endpoints do
+(inline inference, the database insert replaced by JSON encoding of the
+payload): an export of ``rows`` rows, a second export overlapping half of
+it, then the first one again. Reports the time and the rows scored and
+stored per import. Also checks that two overlapping imports running
+concurrently store every row once, and measures the index itself: claim
+throughput at 1M entries, reopen time and size on disk.
+
+Usage: python benchmarks/bench_dedup.py [rows]
+"""
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import scaled_raw_frame, write_model_bundle
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from dedup_index import DedupIndex
+    from file_processor import FileProcessor
+    from inference_executor import InferenceExecutor
+    from ingest_pipeline import IngestPipeline
+    from predictor import TAMSPredictor
+    from starlette.datastructures import UploadFile
+
+
+def long_export(n_rows):
+    """Export of ``n_rows`` distinct rows"""
+    df = scaled_raw_frame(n_rows)
+    df["Description"] = df["Description"] + " #" + np.arange(n_rows).astype(str)
+    return df
+
+
+def write_export(path, export, start, stop):
+    export.iloc[start:stop].to_csv(path, index=False)
+    return path
+
+
+async def import_file(path, executor, index, stored):
+    scored = 0
+
+    async def predict(frame):
+        nonlocal scored
+        scored += len(frame)
+        return await executor.predict_frame(frame)
+
+    async def store(frame, predictions):
+        payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+        json.dumps(payload)
+        stored.update(row["description"] for row in payload)
+        if index:
+            await index.settle(frame, owner=owner)
+        return len(payload)
+
+    owner = object()
+    pipeline = IngestPipeline(predict, store,
+                              dedup_chunk=(lambda frame: index.claim(frame, owner)) if index else None)
+    started = time.perf_counter()
+    result = await pipeline.run(FileProcessor.iter_csv_chunks(UploadFile(open(path, "rb"), filename="x.csv")))
+    if index:
+        index.release(owner)
+    return time.perf_counter() - started, scored, result
+
+
+async def check_concurrent(tmp, executor):
+    export = long_export(9000)
+    a = write_export(os.path.join(tmp, "a.csv"), export, 0, 6000)
+    b = write_export(os.path.join(tmp, "b.csv"), export, 3000, 9000)
+    with contextlib.redirect_stdout(io.StringIO()):
+        index = DedupIndex(os.path.join(tmp, "concurrent.db"), capacity=100000)
+    stored = collections.Counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await asyncio.gather(import_file(a, executor, index, stored), import_file(b, executor, index, stored))
+    assert len(stored) == 9000 and max(stored.values()) == 1, (len(stored), max(stored.values()))
+    assert index.metrics()["pending"] == 0
+    index.close()
+    print("concurrent: two overlapping imports stored 9000 distinct rows once each")
+
+
+async def measure_index(tmp, n_entries=1_000_000, n_claim=100_000):
+    path = os.path.join(tmp, "large.db")
+    rng = np.random.default_rng(0)
+    frame = lambda n: FileProcessor._prepare_frame(scaled_raw_frame(n).assign(
+        Description=lambda df: df["Description"] + " #" + rng.integers(0, 2**62, size=n).astype(str)).astype(str))
+    with contextlib.redirect_stdout(io.StringIO()):
+        index = DedupIndex(path, capacity=10_000_000)
+        await index.open()
+    known = frame(n_claim)
+    for _ in range(n_entries // n_claim - 1):
+        await index.settle(frame(n_claim))
+    await index.settle(known)
+    index.close()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        index = DedupIndex(path, capacity=10_000_000)
+        await index.open()
+    reopen = time.perf_counter() - started
+    size = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+    print(f"index: {index.bloom.count} entries, reopened in {reopen:.2f} s, {size / index.bloom.count:.0f} bytes/entry "
+          f"on disk, Bloom filter {index.bloom.bits.nbytes / 2**20:.1f} MB")
+    for name, rows in (("new", frame(n_claim)), ("known", known)):
+        checks = index.exact_checks
+        started = time.perf_counter()
+        kept, skipped = await index.claim(rows, name)
+        elapsed = time.perf_counter() - started
+        print(f"index: claim {n_claim} {name} rows: {n_claim / elapsed:,.0f} rows/s, "
+              f"{skipped} skipped, {index.exact_checks - checks} exact checks")
+        index.release(name)
+    index.close()
+
+
+async def main(n_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+        await check_concurrent(tmp, executor)
+
+        export = long_export(n_rows + n_rows // 2)
+        first = write_export(os.path.join(tmp, "first.csv"), export, 0, n_rows)
+        overlap = write_export(os.path.join(tmp, "overlap.csv"), export, n_rows // 2, n_rows + n_rows // 2)
+        print(f"{'import':>12} {'dedup':>6} {'seconds':>8} {'scored':>8} {'stored':>8} {'skipped':>8}")
+        for dedup in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                index = DedupIndex(os.path.join(tmp, "imports.db"), capacity=1_000_000) if dedup else None
+            stored = collections.Counter()
+            for name, path in (("first", first), ("overlapping", overlap), ("same again", first)):
+                with contextlib.redirect_stdout(io.StringIO()):
+                    seconds, scored, result = await import_file(path, executor, index, stored)
+                print(f"{name:>12} {'on' if dedup else 'off':>6} {seconds:>8.2f} {scored:>8} {result.rows_stored:>8} "
+                      f"{result.duplicates_skipped:>8}")
+            if dedup:
+                assert max(stored.values()) == 1 and len(stored) == n_rows + n_rows // 2
+                index.close()
+        await measure_index(tmp)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
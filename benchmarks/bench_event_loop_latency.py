@@ -0,0 +1,120 @@
+"""p99 latency of /store/single while a large /store/file/csv upload runs.
+
+Each executor mode runs in its own subprocess (the executor is configured
+from the environment when main.py is imported). The database client is
+replaced with an in-memory stand-in that sleeps to simulate a round trip.
+
+Usage: python benchmarks/bench_event_loop_latency.py [csv_rows] [modes...]
+"""
+import asyncio
+import contextlib
+import io
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+
+from common import ROOT_DIR, percentile, scaled_raw_frame, write_model_bundle
+
+DB_ROUND_TRIP = 0.005
+SINGLE_INTERVAL = 0.02
+
+
+def install_fake_database(main_module):
+    client = main_module.supabase_client
+
+    async def create_anomaly(data):
+        await asyncio.sleep(DB_ROUND_TRIP)
+        return {'id': str(uuid.uuid4()), **data}
+
+    async def create_anomalies_batch(rows, batch_id):
+        await asyncio.sleep(DB_ROUND_TRIP)
+        return rows
+
+    async def create_import_batch(filename, total_records):
+        return str(uuid.uuid4())
+
+    client.create_anomaly = create_anomaly
+    client.create_anomalies_batch = create_anomalies_batch
+    client.create_import_batch = create_import_batch
+
+
+async def run_load(main_module, csv_bytes: bytes):
+    import httpx
+
+    latencies = []
+    async with httpx.AsyncClient(app=main_module.app, base_url="http://bench", timeout=600) as client:
+        upload_done = asyncio.Event()
+
+        async def upload():
+            start = time.perf_counter()
+            response = await client.post("/store/file/csv", files={"file": ("bench.csv", csv_bytes, "text/csv")})
+            upload_done.set()
+            return response.status_code, time.perf_counter() - start
+
+        async def single(i: int, scheduled: float):
+            response = await client.post("/store/single", json={
+                "num_equipement": f"EQ{i}", "systeme": "Hydraulic", "description": "Pressure drop detected in main valve"
+            })
+            # Measured from the scheduled send time, so time spent waiting for a
+            # blocked event loop is counted too
+            latencies.append(time.perf_counter() - scheduled)
+            assert response.status_code == 200, response.text
+
+        async def singles():
+            tasks = []
+            start = time.perf_counter()
+            i = 0
+            while not upload_done.is_set():
+                scheduled = start + i * SINGLE_INTERVAL
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                tasks.append(asyncio.ensure_future(single(i, scheduled)))
+                i += 1
+            await asyncio.gather(*tasks)
+
+        (status, upload_time), _ = await asyncio.gather(upload(), singles())
+    return status, upload_time, latencies
+
+
+def run_mode(csv_rows: int):
+    with contextlib.redirect_stdout(io.StringIO()):
+        sys.path.insert(0, ROOT_DIR)
+        import main
+        install_fake_database(main)
+        main.inference_executor.start()
+        csv_bytes = scaled_raw_frame(csv_rows).to_csv(index=False).encode("utf-8")
+        status, upload_time, latencies = asyncio.run(run_load(main, csv_bytes))
+        main.inference_executor.shutdown()
+
+    ms = [latency * 1000 for latency in latencies]
+    print(f"{main.inference_executor.mode:>8} {csv_rows:>9} {upload_time:>10.2f} {len(ms):>8} "
+          f"{percentile(ms, 50):>9.1f} {percentile(ms, 99):>9.1f} {max(ms) if ms else float('nan'):>9.1f}")
+    assert status == 200, f"CSV upload failed with status {status}"
+
+
+def main(argv):
+    csv_rows = int(argv[0]) if argv else 100_000
+    modes = argv[1:] or ["inline", "thread", "process"]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=100)
+        env = dict(os.environ)
+        env.setdefault("SUPABASE_URL", "http://localhost:54321")
+        env.setdefault("SUPABASE_ROLE_KEY", "bench.bench.bench")
+        env["TAMS_MODEL_PATH"] = model_path
+
+        print(f"{'mode':>8} {'csv rows':>9} {'upload s':>10} {'singles':>8} {'p50 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+        for mode in modes:
+            subprocess.run([sys.executable, __file__, "--run", str(csv_rows)],
+                           env={**env, "INFERENCE_EXECUTOR": mode}, check=True)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        run_mode(int(sys.argv[2]))
+    else:
+        main(sys.argv[1:])
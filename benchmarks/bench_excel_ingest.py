@@ -0,0 +1,98 @@
+"""Peak memory and time of Excel ingestion: pd.read_excel vs read-only streaming.
+
+"whole" is the previous endpoint flow (``pd.read_excel`` on the upload, one
+list of dicts, one prediction call and one insert); "streamed" runs
+``FileProcessor.iter_excel_chunks`` (openpyxl read-only mode) through the
+``IngestPipeline``. The workbook has a small first sheet and the data on an
+"Oracle" sheet, like our exports. Measured as in ``bench_csv_ingest.py``:
+one process per mode, inserts replaced by JSON encoding, peak RSS above the
+process' RSS once the model is loaded.
+
+Usage: python benchmarks/bench_excel_ingest.py [n_rows ...]
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from common import ROOT_DIR, scaled_raw_frame, write_model_bundle
+
+WORKER = r"""
+import asyncio, contextlib, io, json, resource, sys, time
+sys.path.insert(0, sys.argv[1])
+mode, xlsx_path, model_path = sys.argv[2:5]
+with contextlib.redirect_stdout(io.StringIO()):
+    from predictor import TAMSPredictor
+    from inference_executor import InferenceExecutor
+    from file_processor import FileProcessor
+    from ingest_pipeline import IngestPipeline
+    from starlette.datastructures import UploadFile
+    executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+
+def rss_mb():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+async def store(records, predictions):
+    payload = FileProcessor.prepare_for_database_batch(records, predictions)
+    json.dumps(payload, default=str)
+    return len(payload)
+
+async def store_frame(frame, predictions):
+    payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+    json.dumps(payload, default=str)
+    return len(payload)
+
+async def main():
+    upload = UploadFile(open(xlsx_path, "rb"), filename="export.xlsx")
+    with contextlib.redirect_stdout(io.StringIO()):
+        if mode == "whole":
+            records = await FileProcessor.process_excel_file(upload)
+            return await store(records, await executor.predict_batch(records))
+        pipeline = IngestPipeline(executor.predict_frame, store_frame)
+        return (await pipeline.run(FileProcessor.iter_excel_chunks(upload))).rows_stored
+
+loaded = rss_mb()
+start = time.perf_counter()
+stored = asyncio.run(main())
+print(json.dumps({"stored": stored, "seconds": time.perf_counter() - start, "loaded_mb": loaded, "peak_mb": peak_rss_mb()}))
+"""
+
+
+def write_workbook(path: str, n_rows: int):
+    """Write the scaled data.csv rows to an "Oracle" sheet with openpyxl's write-only mode"""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    workbook.create_sheet("Notes").append(["Exported from Oracle"])
+    sheet = workbook.create_sheet("Oracle")
+    df = scaled_raw_frame(n_rows)
+    sheet.append(list(df.columns))
+    for row in df.itertuples(index=False):
+        sheet.append([None if value != value else value for value in row])
+    workbook.save(path)
+
+
+def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        # Huge pages make RSS depend on how fragmented the machine's memory is
+        env = dict(os.environ, NUMPY_MADVISE_HUGEPAGE="0")
+        print(f"{'rows':>9} {'XLSX MB':>8} {'mode':>9} {'seconds':>8} {'peak MB over loaded':>20}")
+        for n_rows in sizes:
+            xlsx_path = os.path.join(tmp, "export.xlsx")
+            write_workbook(xlsx_path, n_rows)
+            xlsx_mb = os.path.getsize(xlsx_path) / 2**20
+            for mode in ("whole", "streamed"):
+                out = subprocess.run([sys.executable, "-c", WORKER, ROOT_DIR, mode, xlsx_path, model_path],
+                                     capture_output=True, text=True, check=True, env=env).stdout
+                r = json.loads(out.strip().splitlines()[-1])
+                assert r["stored"] == n_rows
+                print(f"{n_rows:>9} {xlsx_mb:>8.1f} {mode:>9} {r['seconds']:>8.2f} {r['peak_mb'] - r['loaded_mb']:>20.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [20_000, 100_000])
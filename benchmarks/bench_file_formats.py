@@ -0,0 +1,101 @@
+"""Upload ingest throughput by file format: CSV, Excel, Parquet, Arrow IPC.
+
+The same scaled data.csv rows are written in each format and read back
+with the FileProcessor chunk iterators, first alone ("parse") and then
+through the whole IngestPipeline with inserts replaced by JSON encoding
+("ingest"). The rows stored must be identical across formats.
+
+Usage: python benchmarks/bench_file_formats.py [n_rows ...]
+       (MODEL_PATH uses an existing bundle instead of training a 10-tree model)
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+from common import scaled_raw_frame, write_model_bundle
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from starlette.datastructures import UploadFile
+
+from file_processor import FileProcessor
+from inference_executor import InferenceExecutor
+from ingest_pipeline import IngestPipeline
+from predictor import TAMSPredictor
+
+FORMATS = {
+    "csv": ("export.csv", FileProcessor.iter_csv_chunks),
+    "xlsx": ("export.xlsx", FileProcessor.iter_excel_chunks),
+    "parquet": ("export.parquet", FileProcessor.iter_parquet_chunks),
+    "arrow": ("export.arrows", FileProcessor.iter_arrow_chunks),
+}
+
+
+def write_files(tmp, n_rows):
+    df = scaled_raw_frame(n_rows)
+    paths = {name: os.path.join(tmp, filename) for name, (filename, _) in FORMATS.items()}
+    df.to_csv(paths["csv"], index=False)
+    with contextlib.redirect_stdout(io.StringIO()):
+        from bench_excel_ingest import write_workbook
+    write_workbook(paths["xlsx"], n_rows)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    pq.write_table(table, paths["parquet"])
+    with pa.ipc.new_stream(paths["arrow"], table.schema) as writer:
+        writer.write_table(table, max_chunksize=1_000)
+    return paths
+
+
+async def parse(path, iter_chunks):
+    rows = 0
+    async for chunk in iter_chunks(UploadFile(open(path, "rb"), filename=os.path.basename(path))):
+        rows += len(chunk)
+    return rows
+
+
+async def ingest(path, iter_chunks, executor):
+    rows = []
+
+    async def store(frame, predictions):
+        payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+        json.dumps(payload)
+        rows.extend(payload)
+        return len(payload)
+
+    upload = UploadFile(open(path, "rb"), filename=os.path.basename(path))
+    result = await IngestPipeline(executor.predict_frame, store).run(iter_chunks(upload))
+    return result.rows_stored, rows
+
+
+async def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.environ.get("MODEL_PATH") or write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+
+        print(f"{'rows':>8} {'format':>8} {'file MB':>8} {'parse s':>8} {'parse rows/s':>13} {'ingest s':>9} {'ingest rows/s':>14}")
+        for n_rows in sizes:
+            paths = write_files(tmp, n_rows)
+            expected = None
+            for name, (_, iter_chunks) in FORMATS.items():
+                with contextlib.redirect_stdout(io.StringIO()):
+                    start = time.perf_counter()
+                    assert await parse(paths[name], iter_chunks) == n_rows
+                    parse_s = time.perf_counter() - start
+                    start = time.perf_counter()
+                    stored, rows = await ingest(paths[name], iter_chunks, executor)
+                    ingest_s = time.perf_counter() - start
+                assert stored == n_rows
+                expected = expected or rows
+                assert rows == expected, f"{name} rows differ from csv"
+                size_mb = os.path.getsize(paths[name]) / 2**20
+                print(f"{n_rows:>8} {name:>8} {size_mb:>8.1f} {parse_s:>8.2f} {n_rows / parse_s:>13,.0f} "
+                      f"{ingest_s:>9.2f} {n_rows / ingest_s:>14,.0f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [100_000]))
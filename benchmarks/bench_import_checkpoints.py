@@ -0,0 +1,119 @@
+"""Recovering from an import that fails halfway: full re-upload vs resume.
+
+Runs a CSV export of ``rows`` rows through ``IngestPipeline`` as the
+upload endpoints do (inline inference, the database insert replaced by
+JSON encoding of the payload) with a store that fails once half of the
+rows are stored. The import is then retried without checkpoints (the
+whole file is scored and inserted again) and resumed from its
+checkpoints. Reports the rows scored and inserted and the time of each
+retry, checks that the resumed import stores every row once, and that
+resuming with a different file is refused.
+
+Usage: python benchmarks/bench_import_checkpoints.py [rows]
+"""
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import scaled_raw_frame, write_model_bundle
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from file_processor import FileProcessor
+    from import_checkpoints import ImportCheckpoints
+    from inference_executor import InferenceExecutor
+    from ingest_pipeline import IngestPipeline, IngestResult
+    from predictor import TAMSPredictor
+    from starlette.datastructures import UploadFile
+
+
+class DatabaseDown(Exception):
+    pass
+
+
+async def import_file(path, executor, checkpoints, batch_id, stored, fail_after=None):
+    """One import attempt; returns (seconds, rows scored, rows inserted, result)"""
+    scored = inserted = 0
+
+    async def predict(frame):
+        nonlocal scored
+        scored += len(frame)
+        return await executor.predict_frame(frame)
+
+    async def store(frame, predictions):
+        nonlocal inserted
+        if fail_after is not None and len(stored) >= fail_after:
+            raise DatabaseDown("database unreachable")
+        payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+        json.dumps(payload)
+        stored.update(row["description"] for row in payload)
+        inserted += len(payload)
+        if checkpoints:
+            await checkpoints.commit(batch_id, frame)
+        return len(payload)
+
+    committed = await checkpoints.begin(batch_id) if checkpoints else None
+    pipeline = IngestPipeline(predict, store,
+                              resume_chunk=(lambda frame: asyncio.to_thread(committed.skip, frame)) if committed else None)
+    result = IngestResult()
+    started = time.perf_counter()
+    status = 'failed'
+    try:
+        await pipeline.run(FileProcessor.iter_csv_chunks(UploadFile(open(path, "rb"), filename="x.csv")), result)
+        status = result.status()
+    except DatabaseDown:
+        pass
+    finally:
+        if checkpoints:
+            await checkpoints.finish(batch_id, status)
+    return time.perf_counter() - started, scored, inserted, result
+
+
+async def main(n_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+        export = scaled_raw_frame(n_rows)
+        export["Description"] = export["Description"] + " #" + np.arange(n_rows).astype(str)
+        path = os.path.join(tmp, "export.csv")
+        export.to_csv(path, index=False)
+
+        print(f"{'retry':>10} {'seconds':>8} {'scored':>8} {'inserted':>9} {'stored once':>12}")
+        for resume in (False, True):
+            with contextlib.redirect_stdout(io.StringIO()):
+                checkpoints = ImportCheckpoints(os.path.join(tmp, f"checkpoints-{resume}.db")) if resume else None
+            stored = collections.Counter()
+            await import_file(path, executor, checkpoints, "batch", stored, fail_after=n_rows // 2)
+            with contextlib.redirect_stdout(io.StringIO()):
+                seconds, scored, inserted, result = await import_file(path, executor, checkpoints, "batch", stored)
+            once = len(stored) == n_rows and max(stored.values()) == 1
+            print(f"{'resume' if resume else 're-upload':>10} {seconds:>8.2f} {scored:>8} {inserted:>9} {str(once):>12}")
+            if resume:
+                assert once and result.rows_resumed + result.rows_stored == n_rows, (result.to_dict(), len(stored))
+                assert await checkpoints.status("batch") == "completed"
+                checkpoints.close()
+
+        # A resumed import must be given the same file
+        with contextlib.redirect_stdout(io.StringIO()):
+            checkpoints = ImportCheckpoints(os.path.join(tmp, "mismatch.db"))
+            await import_file(path, executor, checkpoints, "batch", collections.Counter(), fail_after=n_rows // 2)
+        export.iloc[::-1].to_csv(path, index=False)
+        try:
+            with contextlib.redirect_stdout(io.StringIO()):
+                await import_file(path, executor, checkpoints, "batch", collections.Counter())
+            raise AssertionError("a different file was accepted to resume the import")
+        except ValueError as e:
+            print(f"different file: {e}")
+        checkpoints.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,166 @@
+"""Time to a response for a large upload: inline import vs background job.
+
+"inline" runs the CSV through ``IngestPipeline`` inside the request, as
+``/store/file/csv`` does; "job" submits it to an ``ImportJobQueue`` and
+returns once the upload is spooled, then polls the job status until it
+finishes, printing the progress and ETA it reports. Inference runs inline
+and the database insert is replaced by JSON encoding of the payload. Also
+checks that jobs survive a restart (a queue stopped mid-import is resumed
+by the next one) and that two queues sharing the job table run each job
+once.
+
+Usage: python benchmarks/bench_import_jobs.py [rows]
+"""
+import asyncio
+import collections
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from common import scaled_raw_frame, write_model_bundle
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from file_processor import FileProcessor
+    from import_jobs import ImportJobQueue
+    from inference_executor import InferenceExecutor
+    from ingest_pipeline import IngestPipeline, IngestResult
+    from predictor import TAMSPredictor
+    from starlette.datastructures import UploadFile
+
+
+def make_import(executor, stored):
+    """Stand-in for ``main.ingest_chunks`` that counts the rows stored per batch"""
+    async def store(frame, predictions):
+        payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+        json.dumps(payload)
+        return len(payload)
+
+    async def run_import(chunks, batch_id, result=None):
+        result = result if result is not None else IngestResult()
+        await IngestPipeline(executor.predict_frame, store).run(chunks, result)
+        stored[batch_id] += result.rows_stored
+        return result
+
+    return run_import
+
+
+def write_export(path, n_rows, seed=1337):
+    df = scaled_raw_frame(n_rows, seed=seed)
+    df["Description"] = df["Description"] + " #" + np.arange(n_rows).astype(str)
+    df.to_csv(path, index=False)
+    return path
+
+
+async def wait_for(queue, job_id, poll_seconds=0.5, show=False):
+    while True:
+        job = await queue.get(job_id)
+        if show and job["status"] == "running":
+            eta = f"{job['eta_seconds']:.1f}s" if job["eta_seconds"] is not None else "-"
+            total = f"{'~' if job['rows_total_estimated'] else ''}{job['rows_total']}"
+            print(f"  {job['elapsed_seconds']:>6.1f}s parsed {job['rows_parsed']:>8} scored {job['rows_scored']:>8} "
+                  f"stored {job['rows_stored']:>8} of {total:>9}  {job['rows_per_second']:>8,.0f} rows/s  eta {eta}")
+        if job["status"] not in ("queued", "running"):
+            return job
+        await asyncio.sleep(poll_seconds)
+
+
+async def compare(tmp, executor, csv_path, n_rows):
+    stored = collections.Counter()
+    run_import = make_import(executor, stored)
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_import(FileProcessor.iter_csv_chunks(UploadFile(open(csv_path, "rb"), filename="x.csv")), "inline")
+    inline = time.perf_counter() - started
+
+    queue = ImportJobQueue(run_import, path=os.path.join(tmp, "jobs.db"), spool_dir=os.path.join(tmp, "spool"),
+                           workers=2, progress_seconds=0.5)
+    queue.start()
+    started = time.perf_counter()
+    job = await queue.submit(UploadFile(open(csv_path, "rb"), filename="export.csv"), "job")
+    response = time.perf_counter() - started
+    print(f"job {job['job_id']}: {job['status']} after {response * 1000:.0f} ms")
+    with contextlib.redirect_stdout(io.StringIO()):
+        job = await wait_for(queue, job["job_id"])
+    finished = time.perf_counter() - started
+    await queue.stop()
+    assert job["status"] == "completed" and job["rows_stored"] == n_rows == stored["job"], (job, stored)
+    print(f"{'mode':>7} {'response s':>11} {'import s':>9}")
+    print(f"{'inline':>7} {inline:>11.2f} {inline:>9.2f}")
+    print(f"{'job':>7} {response:>11.3f} {finished:>9.2f}")
+
+
+async def show_progress(tmp, executor, csv_path):
+    stored = collections.Counter()
+    queue = ImportJobQueue(make_import(executor, stored), path=os.path.join(tmp, "progress.db"),
+                           spool_dir=os.path.join(tmp, "spool"), workers=1, progress_seconds=0.5)
+    queue.start()
+    job = await queue.submit(UploadFile(open(csv_path, "rb"), filename="export.csv"), "progress")
+    print("progress reported by GET /jobs/{id}:")
+    job = await wait_for(queue, job["job_id"], show=True)
+    print(f"  {job['status']} in {job['elapsed_seconds']:.1f}s, {job['rows_per_second']:,.0f} rows/s")
+    await queue.stop()
+
+
+async def check_restart(tmp, executor, csv_path, n_rows):
+    stored = collections.Counter()
+    paths = dict(path=os.path.join(tmp, "restart.db"), spool_dir=os.path.join(tmp, "spool"))
+    queue = ImportJobQueue(make_import(executor, stored), workers=1, progress_seconds=0.2, **paths)
+    queue.start()
+    job = await queue.submit(UploadFile(open(csv_path, "rb"), filename="export.csv"), "restart")
+    while (await queue.get(job["job_id"]))["rows_stored"] == 0:
+        await asyncio.sleep(0.1)
+    await queue.stop()
+    interrupted = await ImportJobQueue(None, **paths).get(job["job_id"])
+    assert interrupted["status"] == "queued", interrupted
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        queue = ImportJobQueue(make_import(executor, stored), workers=1, progress_seconds=0.2, **paths)
+        queue.start()
+        job = await wait_for(queue, job["job_id"], poll_seconds=0.1)
+        await queue.stop()
+    assert job["status"] == "completed" and job["rows_stored"] == n_rows and job["attempts"] == 1, job
+    print(f"restart: job stopped after {interrupted['rows_stored']} rows was queued again and completed "
+          f"by the next start")
+
+
+async def check_shared(tmp, executor, n_jobs=6, n_rows=2000):
+    stored = collections.Counter()
+    paths = dict(path=os.path.join(tmp, "shared.db"), spool_dir=os.path.join(tmp, "spool"))
+    queues = [ImportJobQueue(make_import(executor, stored), workers=2, poll_seconds=0.1, **paths) for _ in range(2)]
+    with contextlib.redirect_stdout(io.StringIO()):
+        for queue in queues:
+            queue.start()
+        jobs = [await queues[i % 2].submit(UploadFile(open(write_export(
+                    os.path.join(tmp, f"shared-{i}.csv"), n_rows, seed=i), "rb"), filename="export.csv"), f"shared-{i}")
+                for i in range(n_jobs)]
+        jobs = [await wait_for(queues[0], job["job_id"], poll_seconds=0.1) for job in jobs]
+        for queue in queues:
+            await queue.stop()
+    assert all(job["status"] == "completed" for job in jobs), jobs
+    assert all(stored[f"shared-{i}"] == n_rows for i in range(n_jobs)), stored
+    ran = [queue.finished_total for queue in queues]
+    print(f"shared table: {n_jobs} jobs run once each by two processes' queues ({ran[0]} + {ran[1]})")
+
+
+async def main(n_rows):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+        csv_path = write_export(os.path.join(tmp, "export.csv"), n_rows)
+        print(f"{n_rows} rows, CSV {os.path.getsize(csv_path) / 2**20:.1f} MB")
+        await compare(tmp, executor, csv_path, n_rows)
+        await show_progress(tmp, executor, csv_path)
+        await check_restart(tmp, executor, csv_path, n_rows)
+        await check_shared(tmp, executor)
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
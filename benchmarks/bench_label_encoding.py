@@ -0,0 +1,45 @@
+"""Compare per-row ``LabelEncoder.transform`` with the vectorized ``LabelLookup``.
+
+Usage: python benchmarks/bench_label_encoding.py [n_rows ...]
+"""
+import sys
+
+import numpy as np
+
+from common import build_model_bundle, scaled_records, timed
+
+from encoders import LabelLookup
+
+
+def encode_per_row(encoder, values):
+    """The original encoding loop from TAMSPredictor"""
+    encoded_values = []
+    for value in values:
+        try:
+            encoded_values.append(encoder.transform([value])[0])
+        except ValueError:
+            encoded_values.append(0)
+    return np.array(encoded_values)
+
+
+def encode_vectorized(lookup, values):
+    return lookup.transform(values)[0]
+
+
+def main(sizes):
+    bundle = build_model_bundle(n_estimators=10)
+    encoder = bundle['label_encoders']['Num_equipement']
+    lookup = LabelLookup.from_encoder(encoder)
+
+    print(f"{'rows':>10} {'per-row (s)':>12} {'vectorized (s)':>15} {'speedup':>9}")
+    for n_rows in sizes:
+        values = np.array([r['num_equipement'] for r in scaled_records(n_rows)], dtype=str)
+        # The per-row path is too slow to repeat at large sizes
+        per_row_time, expected = timed(encode_per_row, encoder, values, repeat=1)
+        vectorized_time, actual = timed(encode_vectorized, lookup, values)
+        assert np.array_equal(expected, actual), "vectorized encoding differs from LabelEncoder"
+        print(f"{n_rows:>10} {per_row_time:>12.4f} {vectorized_time:>15.5f} {per_row_time / vectorized_time:>8.0f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000])
@@ -0,0 +1,117 @@
+"""Cold start and per-worker memory: pickled bundle vs memory-mapped artifact.
+
+Starts N worker processes at once, each constructing a TAMSPredictor and
+running one small batch, the way N uvicorn or process-pool workers come up.
+While all of them are alive, memory is read from /proc/<pid>/smaps_rollup:
+RSS counts shared pages in every process, PSS splits them between the
+processes sharing them and USS is what each worker holds privately. The
+"imports" row is a worker that stops after importing the predictor module.
+
+Usage: python benchmarks/bench_model_artifact.py [workers ...]
+       (TREES and ROWS size the synthetic model; MODEL_PATH reuses an existing bundle)
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import ROOT_DIR, scaled_records, write_model_bundle
+
+from model_artifact import convert
+
+WORKER = r"""
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import predictor as predictor_module
+imported = time.perf_counter()
+if sys.argv[2] != "imports":
+    p = predictor_module.TAMSPredictor(sys.argv[3])
+    loaded = time.perf_counter()
+    p.predict_batch(json.loads(sys.argv[4]))
+else:
+    loaded = imported
+ready = time.perf_counter()
+print("RESULT " + json.dumps({"import_s": imported - start, "load_s": loaded - imported,
+                              "first_batch_s": ready - loaded}), flush=True)
+sys.stdin.read()
+"""
+
+
+def memory_kb(pid: int) -> dict:
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": fields["Rss"], "pss": fields["Pss"],
+            "uss": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)}
+
+
+def run_workers(n_workers: int, mode: str, model_path: str, artifact_path: str, records: list) -> dict:
+    env = dict(os.environ)
+    env.pop("TAMS_MODEL_ARTIFACT", None)
+    if mode == "artifact":
+        env["TAMS_MODEL_ARTIFACT"] = artifact_path
+
+    start = time.perf_counter()
+    procs = [
+        subprocess.Popen([sys.executable, "-c", WORKER, ROOT_DIR, mode, model_path, json.dumps(records)],
+                         stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                         env=env, text=True)
+        for _ in range(n_workers)
+    ]
+    results = []
+    for proc in procs:
+        for line in proc.stdout:
+            if line.startswith("RESULT "):
+                results.append(json.loads(line[len("RESULT "):]))
+                break
+    all_ready = time.perf_counter() - start
+
+    memory = [memory_kb(proc.pid) for proc in procs]
+    for proc in procs:
+        proc.stdin.close()
+        proc.wait()
+
+    def mean(key, rows):
+        return sum(row[key] for row in rows) / len(rows)
+
+    return {
+        "all_ready_s": all_ready,
+        "load_s": mean("load_s", results),
+        "rss_mb": mean("rss", memory) / 1024,
+        "pss_mb": mean("pss", memory) / 1024,
+        "uss_mb": mean("uss", memory) / 1024,
+        "total_pss_mb": sum(row["pss"] for row in memory) / 1024,
+    }
+
+
+def main(worker_counts):
+    n_trees = int(os.environ.get("TREES", "100"))
+    n_rows = int(os.environ.get("ROWS", "4000"))
+    records = scaled_records(16)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.environ.get("MODEL_PATH") or write_model_bundle(
+            os.path.join(tmp, "model.pkl"), n_estimators=n_trees, n_rows=n_rows)
+        artifact_path = os.path.join(tmp, "model.artifact")
+        convert(model_path, artifact_path)
+        artifact_mb = sum(os.path.getsize(os.path.join(artifact_path, name))
+                          for name in os.listdir(artifact_path)) / 2**20
+        print(f"pickle {os.path.getsize(model_path) / 2**20:.1f} MB, artifact {artifact_mb:.1f} MB")
+
+        print(f"{'workers':>7} {'format':>8} {'ready s':>8} {'load s':>7} {'RSS MB':>7} "
+              f"{'PSS MB':>7} {'USS MB':>7} {'sum PSS':>8}")
+        for n_workers in worker_counts:
+            for mode in ("imports", "pickle", "artifact"):
+                r = run_workers(n_workers, mode, model_path, artifact_path, records)
+                print(f"{n_workers:>7} {mode:>8} {r['all_ready_s']:>8.2f} {r['load_s']:>7.3f} {r['rss_mb']:>7.1f} "
+                      f"{r['pss_mb']:>7.1f} {r['uss_mb']:>7.1f} {r['total_pss_mb']:>8.1f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 4, 16])
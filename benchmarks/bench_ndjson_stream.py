@@ -0,0 +1,153 @@
+"""Time to first result and peak memory: JSON array body vs NDJSON stream.
+
+First checks ``/store/stream`` end to end: uvicorn serves the app against
+a stand-in PostgREST server and NDJSON bodies are posted to it, plain and
+chunked; every record must come back stored and be in the table.
+"array" is the ``/store/batch`` flow (the whole body decoded into
+``AnomalyInput`` models, one prediction call, one insert, one response);
+"stream" feeds the same records as NDJSON through ``NDJSONIngest`` in
+64 KB body chunks, as ``/store/stream`` receives them. The body arrives at
+``MB_PER_SECOND`` to mimic an upload. Inference runs inline and the
+database insert is replaced by JSON encoding of the payload. Peak memory
+is the Python allocation peak (tracemalloc) above the loaded model.
+
+Usage: python benchmarks/bench_ndjson_stream.py [records]
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import httpx
+
+from common import ROOT_DIR, scaled_records, write_model_bundle
+from postgrest_standin import StandInPostgrest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from file_processor import FileProcessor
+    from inference_executor import InferenceExecutor
+    from models import AnomalyInput
+    from ndjson_stream import NDJSONIngest
+    from predictor import TAMSPredictor
+
+BODY_CHUNK_BYTES = 64 * 1024
+MB_PER_SECOND = 50
+
+
+async def body_chunks(body: bytes):
+    """The body as it comes off the socket"""
+    for start in range(0, len(body), BODY_CHUNK_BYTES):
+        await asyncio.sleep(BODY_CHUNK_BYTES / (MB_PER_SECOND * 2**20))
+        yield body[start:start + BODY_CHUNK_BYTES]
+
+
+def store(frame, predictions):
+    payload = FileProcessor.prepare_for_database_frame(frame, predictions)
+    json.dumps(payload)
+    return payload
+
+
+async def run_array(body, executor):
+    received = b"".join([chunk async for chunk in body_chunks(body)])
+    anomalies = [AnomalyInput(**record) for record in json.loads(received)]
+    frame = FileProcessor.validate_frame([anomaly.dict() for anomaly in anomalies])
+    stored = store(frame, await executor.predict_frame(frame))
+    # The client learns the outcome with the response, after the last row is stored
+    return len(stored), None
+
+
+async def run_stream(body, executor):
+    async def process_batch(records):
+        valid = [FileProcessor.validate_anomaly_data(AnomalyInput(**record).dict()) for record in records]
+        frame = FileProcessor.validate_frame(valid)
+        predictions = await executor.predict_frame(frame)
+        store(frame, predictions)
+        return [{"status": "stored", "scores": predictions[i]} for i in range(len(valid))]
+
+    started = time.perf_counter()
+    first_result, stored = None, 0
+    async for data in NDJSONIngest().run(body_chunks(body), process_batch):
+        if first_result is None:
+            first_result = time.perf_counter() - started
+        stored += data.count(b'"stored"')
+    return stored, first_result
+
+
+async def measure(mode, body, executor):
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    started = time.perf_counter()
+    stored, first_result = await (run_array if mode == "array" else run_stream)(body, executor)
+    seconds = time.perf_counter() - started
+    peak = (tracemalloc.get_traced_memory()[1] - baseline) / 2**20
+    tracemalloc.stop()
+    return stored, seconds, first_result if first_result is not None else seconds, peak
+
+
+def check_endpoint(tmp, model_path, records):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    url = f"http://127.0.0.1:{port}"
+    with StandInPostgrest(latency=0) as server:
+        env = {**os.environ, "SUPABASE_URL": server.url, "SUPABASE_ROLE_KEY": server.key, "TAMS_MODEL_PATH": model_path,
+               "DEDUP_ENABLED": "false", "IMPORT_CHECKPOINTS_ENABLED": "false", "IMPORT_JOBS_WORKERS": "0"}
+        app = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--app-dir", ROOT_DIR,
+                                "--port", str(port), "--log-level", "warning"],
+                               cwd=tmp, env=env, stdout=subprocess.DEVNULL)
+        try:
+            deadline = time.monotonic() + 60
+            while True:
+                try:
+                    httpx.get(url)
+                    break
+                except httpx.TransportError:
+                    assert time.monotonic() < deadline and app.poll() is None, "the API did not start"
+                    time.sleep(0.2)
+            stored = 0
+            for n in (3, len(records)):
+                body = b"".join(json.dumps(record).encode() + b"\n" for record in records[:n])
+                chunked = (body[start:start + BODY_CHUNK_BYTES] for start in range(0, len(body), BODY_CHUNK_BYTES))
+                for name, content in (("plain", body), ("chunked", chunked)):
+                    response = httpx.post(f"{url}/store/stream", content=content, timeout=60,
+                                          headers={"Content-Type": "application/x-ndjson"})
+                    lines = response.content.splitlines()
+                    summary = json.loads(lines[-1])["summary"]
+                    assert response.status_code == 200 and summary["records"] == summary["stored"] == n, (name, summary)
+                    assert len(lines) == n + 1 and response.headers["X-Import-Batch-Id"]
+                    stored += n
+            assert len(server.table("anomalies")) == stored
+            print(f"endpoint: {stored} records posted to /store/stream (plain and chunked bodies) stored")
+        finally:
+            app.terminate()
+            app.wait()
+
+
+async def main(n_records):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = write_model_bundle(os.path.join(tmp, "model.pkl"), n_estimators=10)
+        with contextlib.redirect_stdout(io.StringIO()):
+            executor = InferenceExecutor(TAMSPredictor(model_path), mode="inline")
+        records = [{key: str(value) for key, value in record.items()} for record in scaled_records(n_records)]
+        check_endpoint(tmp, model_path, records[:2000])
+        bodies = {
+            "array": json.dumps(records).encode(),
+            "stream": b"".join(json.dumps(record).encode() + b"\n" for record in records),
+        }
+        print(f"{n_records} records, {len(bodies['stream']) / 2**20:.1f} MB at {MB_PER_SECOND} MB/s")
+        print(f"{'body':>7} {'stored':>8} {'seconds':>8} {'first result s':>15} {'peak MB':>8}")
+        for mode in ("array", "stream"):
+            with contextlib.redirect_stdout(io.StringIO()):
+                stored, seconds, first_result, peak = await measure(mode, bodies[mode], executor)
+            print(f"{mode:>7} {stored:>8} {seconds:>8.2f} {first_result:>15.3f} {peak:>8.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000))
@@ -0,0 +1,53 @@
+"""Prediction cache: re-uploading an already scored spreadsheet.
+
+Scores the same upload three times through the InferenceExecutor: without
+a cache, with a cold cache (only duplicate rows within the upload are
+saved) and with a warm cache (the re-upload). Predictions must match.
+
+Usage: python benchmarks/bench_prediction_cache.py [n_rows ...]
+       (MODEL_PATH uses an existing bundle instead of training a 100-tree model)
+"""
+import asyncio
+import contextlib
+import io
+import os
+import sys
+import tempfile
+import time
+
+from common import scaled_records, write_model_bundle
+
+from inference_executor import InferenceExecutor
+from prediction_cache import PredictionCache
+from predictor import TAMSPredictor
+
+
+async def run(executor, records):
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        result = await executor.predict_batch(records)
+    return time.perf_counter() - start, list(result)
+
+
+async def main(sizes):
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.environ.get("MODEL_PATH") or write_model_bundle(os.path.join(tmp, "model.pkl"), n_rows=4000)
+        with contextlib.redirect_stdout(io.StringIO()):
+            predictor = TAMSPredictor(model_path)
+
+    print(f"{'rows':>8} {'uncached s':>11} {'cold s':>8} {'warm s':>8} {'entries':>8} {'MB':>6}")
+    for n_rows in sizes:
+        records = scaled_records(n_rows, unseen_fraction=0.5)
+        cache = PredictionCache()
+        uncached, expected = await run(InferenceExecutor(predictor, mode="inline"), records)
+        cached = InferenceExecutor(predictor, mode="inline", cache=cache)
+        cold, cold_result = await run(cached, records)
+        warm, warm_result = await run(cached, records)
+        assert cold_result == expected and warm_result == expected, "cached predictions differ"
+        metrics = cache.metrics()
+        print(f"{n_rows:>8} {uncached:>11.3f} {cold:>8.3f} {warm:>8.3f} {metrics['entries']:>8} "
+              f"{metrics['bytes'] / 2**20:>6.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main([int(arg) for arg in sys.argv[1:]] or [1_000, 10_000, 100_000]))
@@ -0,0 +1,67 @@
+"""Row validation of a file import: per-row checks vs column-wise codes.
+
+"per-row" validates each record as ``/store/batch`` does before this
+change (``validate_anomaly_data`` on a dict per row, the first invalid row
+failing the whole batch, so every invalid row is skipped individually
+here to give the same rows); "column-wise" is ``validate_frame_rows`` on
+the chunk, which checks the required fields in a few column operations
+and returns the valid rows with a report of the others. A share
+``BAD_FRACTION`` of the rows misses a required field. Checks that both
+keep the same rows.
+
+Usage: python benchmarks/bench_row_validation.py [rows]
+"""
+import contextlib
+import io
+import sys
+import time
+
+import numpy as np
+
+from common import COLUMN_MAPPING, scaled_raw_frame
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from file_processor import FileProcessor
+
+BAD_FRACTION = 0.02
+
+
+def per_row(frame):
+    valid, rejected = [], 0
+    for record in frame.to_dict('records'):
+        try:
+            valid.append(FileProcessor.validate_anomaly_data(record))
+        except ValueError:
+            rejected += 1
+    return FileProcessor.validate_frame(valid), rejected
+
+
+def column_wise(frame):
+    valid, rejected = FileProcessor.validate_frame_rows(frame)
+    return valid, rejected.rows
+
+
+def main(n_rows):
+    frame = scaled_raw_frame(n_rows).rename(columns=COLUMN_MAPPING).fillna("")
+    rng = np.random.default_rng(7)
+    bad = np.flatnonzero(rng.random(n_rows) < BAD_FRACTION)
+    frame.loc[bad, "description"] = ""
+    frame.loc[bad[::3], "systeme"] = None
+
+    print(f"{n_rows} rows, {len(bad)} invalid")
+    print(f"{'validation':>12} {'seconds':>8} {'rows/s':>10} {'rejected':>9}")
+    kept = {}
+    for name, validate in (("per-row", per_row), ("column-wise", column_wise)):
+        started = time.perf_counter()
+        valid, rejected = validate(frame)
+        seconds = time.perf_counter() - started
+        kept[name] = valid.reset_index(drop=True)
+        print(f"{name:>12} {seconds:>8.3f} {n_rows / seconds:>10.0f} {rejected:>9}")
+    assert kept["per-row"].equals(kept["column-wise"][kept["per-row"].columns])
+
+    _, report = FileProcessor.validate_frame_rows(frame)
+    print(f"report: {report.summary()}, by error {report.to_dict()['by_error']}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
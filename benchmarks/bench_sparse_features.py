@@ -0,0 +1,65 @@
+"""Peak memory and throughput of dense vs sparse feature preparation.
+
+"dense" is the previous path (``toarray()`` on the bag-of-words matrix and
+``np.concatenate`` with the encoded columns), "sparse" is the CSR path of
+InferenceSession. Both are fed into the estimator. A small forest is used
+so the measurement is dominated by the feature matrices, not the trees.
+
+Usage: python benchmarks/bench_sparse_features.py [n_rows ...]
+"""
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+from common import COLUMN_MAPPING, build_model_bundle, scaled_raw_frame
+
+from encoders import LabelLookup
+from inference_session import InferenceSession
+
+
+def dense_transform(session, df):
+    """The previous feature layout: one dense float block per batch"""
+    feature_arrays = []
+    for step in session.plan:
+        if step.kind == 'label':
+            values = df[step.source].fillna("unknown").astype(str).to_numpy()
+            feature_arrays.append(step.transformer.transform(values)[0].reshape(-1, 1))
+        else:
+            text = step.transformer.transform(df[step.source].fillna("unknown").astype(str))
+            feature_arrays.append(text.toarray())
+    return np.concatenate(feature_arrays, axis=1)
+
+
+def measure(fn):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, result
+
+
+def main(sizes):
+    bundle = build_model_bundle(n_estimators=5)
+    model = bundle['model']
+    session = InferenceSession.build(
+        model,
+        label_lookups={k: LabelLookup.from_encoder(v) for k, v in bundle['label_encoders'].items()},
+        vectorizer=bundle['vectorizer'],
+    )
+
+    print(f"{'rows':>9} {'path':>7} {'peak MB':>9} {'seconds':>8} {'rows/s':>10}")
+    for n_rows in sizes:
+        df = scaled_raw_frame(n_rows).rename(columns=COLUMN_MAPPING).fillna("")
+        results = {}
+        for name, transform in (("dense", dense_transform), ("sparse", InferenceSession.transform)):
+            elapsed, peak, results[name] = measure(lambda: model.predict(transform(session, df)))
+            print(f"{n_rows:>9} {name:>7} {peak / 2**20:>9.1f} {elapsed:>8.2f} {n_rows / elapsed:>10.0f}")
+        assert np.array_equal(results["dense"], results["sparse"]), "dense and sparse predictions differ"
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [10_000, 100_000, 1_000_000])
@@ -0,0 +1,50 @@
+"""Latency of the flattened tree evaluator against scikit-learn's predict.
+
+The scorer column is what TAMSPredictor uses: the evaluator up to
+TAMS_TREE_EVALUATOR_MAX_BATCH rows, the model's own predict above that.
+Predictions are checked for bit-for-bit equality at every batch size.
+
+Usage: python benchmarks/bench_tree_evaluator.py [batch_size ...]
+"""
+import contextlib
+import io
+import sys
+
+import numpy as np
+
+from common import build_model_bundle, scaled_records, timed
+
+from tree_ensemble import TreeEnsembleEvaluator, TreeEnsembleScorer
+
+
+def main(sizes):
+    bundle = build_model_bundle(n_estimators=100)
+    model = bundle['model']
+    evaluator = TreeEnsembleEvaluator.from_model(model)
+    scorer = TreeEnsembleScorer(evaluator, model)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        from inference_session import InferenceSession
+        from encoders import LabelLookup
+        session = InferenceSession.build(
+            model,
+            label_lookups={k: LabelLookup.from_encoder(v) for k, v in bundle['label_encoders'].items()},
+            vectorizer=bundle['vectorizer'],
+        )
+
+    print(f"{len(evaluator.roots)} trees, {len(evaluator.feature)} nodes, max depth {evaluator.max_depth}")
+    print(f"{'batch':>8} {'sklearn ms':>12} {'evaluator ms':>13} {'scorer ms':>10} {'speedup':>8}")
+    for size in sizes:
+        X = session.transform(scaled_records(size))
+        repeat = 5 if size <= 10_000 else 1
+        sklearn_time, expected = timed(model.predict, X, repeat=repeat)
+        evaluator_time, actual = timed(evaluator.predict, X, repeat=repeat)
+        scorer_time, routed = timed(scorer.predict, X, repeat=repeat)
+        assert np.array_equal(expected, actual), f"predictions differ at batch size {size}"
+        assert np.array_equal(expected, routed), f"scorer predictions differ at batch size {size}"
+        print(f"{size:>8} {sklearn_time * 1000:>12.2f} {evaluator_time * 1000:>13.2f} {scorer_time * 1000:>10.2f} "
+              f"{sklearn_time / scorer_time:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [1, 10, 100, 1_000, 10_000, 100_000])
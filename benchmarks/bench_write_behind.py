@@ -0,0 +1,180 @@
+"""Write-behind queue vs direct inserts for single records.
+
+First checks the queue's guarantees against a stand-in PostgREST server:
+- records queued by a process killed with SIGKILL are replayed by the next
+  one and stored exactly once;
+- a flush interrupted after the insert but before the queue was updated
+  does not store duplicates when replayed;
+- a record the database rejects is isolated and dead-lettered without
+  holding back the records around it;
+- records queued while the database is unreachable are kept, however
+  many flushes fail, and stored once it is back.
+Then stores ``records`` single records one at a time with a fixed server
+latency and reports the per-record latency seen by the caller (direct
+``create_anomaly`` vs ``enqueue`` with each SQLite synchronous mode) and
+how long the flusher took to drain the queue.
+
+Usage: python benchmarks/bench_write_behind.py [records]
+       (LATENCY_MS sets the server latency, default 20)
+"""
+import asyncio
+import contextlib
+import io
+import json
+import os
+import signal
+import socket
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_database_client import rows_payload
+from common import ROOT_DIR, percentile
+from postgrest_standin import StandInPostgrest
+
+with contextlib.redirect_stdout(io.StringIO()):
+    from bulk_writer import BulkWriter
+    from postgrest_client import AsyncPostgrestClient
+    from write_behind import WriteBehindQueue
+
+CHILD = """
+import asyncio, json, os, sys
+sys.path[:0] = [{root!r}, {benchmarks!r}]
+from write_behind import WriteBehindQueue
+from bench_database_client import rows_payload
+
+async def main():
+    # The flusher never gets to run: records only exist in the queue file
+    queue = WriteBehindQueue(None, path={path!r}, flush_rows=10 ** 6, flush_interval=3600)
+    queue.open()
+    ids = [await queue.enqueue(row) for row in rows_payload({n})]
+    print(json.dumps(ids), flush=True)
+    os.kill(os.getpid(), 9)
+
+asyncio.run(main())
+"""
+
+
+def make_queue(server, path, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        client = AsyncPostgrestClient(server.url, server.key)
+    return WriteBehindQueue(BulkWriter(client, ignore_duplicates=True, backoff_seconds=0.01), path=path, **kwargs)
+
+
+async def drain(queue, timeout=60):
+    deadline = time.monotonic() + timeout
+    while queue.depth:
+        assert time.monotonic() < deadline, queue.metrics()
+        await asyncio.sleep(0.01)
+
+
+async def check_guarantees(tmp):
+    with StandInPostgrest(latency=0, rejected_equipment={"POISON"}) as server:
+        # Killed process: its queued records are replayed by the next start
+        path = os.path.join(tmp, "killed.db")
+        script = CHILD.format(root=ROOT_DIR, benchmarks=os.path.dirname(os.path.abspath(__file__)), path=path, n=300)
+        child = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        assert child.returncode == -signal.SIGKILL, child.stderr
+        ids = json.loads(child.stdout)
+        queue = make_queue(server, path, flush_interval=0.01)
+        with contextlib.redirect_stdout(io.StringIO()):
+            queue.start()
+        assert queue.replayed == 300
+        await drain(queue)
+        await queue.stop()
+        assert sorted(server.table("anomalies")) == sorted(ids)
+        print("guarantees: 300 records queued by a killed process were replayed and stored once")
+
+        # Interrupted flush: stored rows are still queued and are sent again
+        path = os.path.join(tmp, "interrupted.db")
+        queue = make_queue(server, path, flush_interval=3600)
+        queue.open()
+        rows = rows_payload(200)
+        ids = [await queue.enqueue(row) for row in rows]
+        pending = [json.loads(payload) for _, payload, _, _ in queue._read_batch()]
+        await queue.writer.write(pending)
+        await queue.flush()
+        await queue.stop()
+        stored = server.table("anomalies")
+        assert all(i in stored for i in ids) and len(stored) == 500 and queue.flush_failures == 0
+        print("guarantees: replaying an already stored flush does not duplicate rows")
+
+        # Poison record: isolated, dead-lettered, the others are stored
+        path = os.path.join(tmp, "poison.db")
+        queue = make_queue(server, path, flush_interval=0.01, retry_seconds=0.01, max_attempts=4)
+        queue.start()
+        rows = rows_payload(300)
+        rows[137]['equipement_id'] = "POISON"
+        with contextlib.redirect_stdout(io.StringIO()):
+            ids = [await queue.enqueue(row) for row in rows]
+            await drain(queue)
+        await queue.stop()
+        stored = server.table("anomalies")
+        dead = sqlite3.connect(path).execute("SELECT payload FROM dead_letter").fetchall()
+        assert [json.loads(payload)["id"] for payload, in dead] == [ids[137]]
+        assert all(i in stored for i in ids[:137] + ids[138:]) and ids[137] not in stored
+        print(f"guarantees: 1 rejected record dead-lettered, 299 stored ({queue.flushes_total} flushes)")
+
+        # Outage: connection errors never use up a record's attempts
+        path = os.path.join(tmp, "outage.db")
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            closed_url = f"http://127.0.0.1:{sock.getsockname()[1]}"
+        with contextlib.redirect_stdout(io.StringIO()):
+            down = AsyncPostgrestClient(closed_url, server.key)
+        queue = WriteBehindQueue(BulkWriter(down, ignore_duplicates=True, max_retries=0), path=path,
+                                 flush_interval=3600, max_attempts=2)
+        queue.open()
+        ids = [await queue.enqueue(row) for row in rows_payload(5)]
+        for _ in range(5):
+            assert await queue.flush() == 0
+        assert queue.depth == 5 and queue.dead_lettered_total == 0, queue.metrics()
+        queue.writer = make_queue(server, path).writer
+        assert await queue.flush() == 5
+        await queue.stop()
+        assert all(i in server.table("anomalies") for i in ids)
+        print("guarantees: 5 records queued during an outage survived 5 failed flushes and were stored")
+
+
+async def main(n_records):
+    latency = float(os.environ.get("LATENCY_MS", "20")) / 1000
+    with tempfile.TemporaryDirectory() as tmp:
+        await check_guarantees(tmp)
+        rows = rows_payload(n_records)
+        print(f"{'mode':>22} {'p50 ms':>7} {'p99 ms':>7} {'records/s':>10} {'drained s':>10}")
+        with StandInPostgrest(latency=latency) as server:
+            with contextlib.redirect_stdout(io.StringIO()):
+                client = AsyncPostgrestClient(server.url, server.key)
+            latencies = []
+            started = time.perf_counter()
+            for row in rows:
+                t0 = time.perf_counter()
+                await client.create_anomaly(dict(row))
+                latencies.append(time.perf_counter() - t0)
+            elapsed = time.perf_counter() - started
+            print(f"{'direct':>22} {percentile(latencies, 50) * 1000:>7.2f} {percentile(latencies, 99) * 1000:>7.2f} "
+                  f"{n_records / elapsed:>10.0f} {'-':>10}")
+            await client.close()
+
+            for synchronous in ("NORMAL", "FULL"):
+                queue = make_queue(server, os.path.join(tmp, f"{synchronous}.db"), synchronous=synchronous)
+                queue.start()
+                latencies = []
+                started = time.perf_counter()
+                for row in rows:
+                    t0 = time.perf_counter()
+                    await queue.enqueue(row)
+                    latencies.append(time.perf_counter() - t0)
+                elapsed = time.perf_counter() - started
+                await drain(queue)
+                drained = time.perf_counter() - started
+                assert queue.rows_flushed_total == n_records
+                print(f"{'write-behind ' + synchronous:>22} {percentile(latencies, 50) * 1000:>7.2f} "
+                      f"{percentile(latencies, 99) * 1000:>7.2f} {n_records / elapsed:>10.0f} {drained:>10.2f}")
+                await queue.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000))
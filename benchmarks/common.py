@@ -0,0 +1,118 @@
+"""Shared helpers for the benchmark scripts.
+
+The benchmarks run against synthetic data derived from ``data.csv`` so they
+work without the production workbook or a trained model artifact.
+"""
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+import numpy as np
+import pandas as pd
+
+DATA_PATH = os.path.join(ROOT_DIR, "data.csv")
+
+COLUMN_MAPPING = {
+    'Num_equipement': 'num_equipement',
+    'Systeme': 'systeme',
+    'Description': 'description',
+    'Date de détéction de l\'anomalie': 'date_detection',
+    'Description de l\'équipement': 'description_equipement',
+    'Section propriétaire': 'section_proprietaire'
+}
+
+
+def load_raw_frame() -> pd.DataFrame:
+    """Load data.csv with its original (upload) column names"""
+    return pd.read_csv(DATA_PATH)
+
+
+def scaled_raw_frame(n_rows: int, unseen_fraction: float = 0.05, seed: int = 1337) -> pd.DataFrame:
+    """Scale data.csv up to ``n_rows`` rows, replacing a fraction of the
+    equipment ids with values the encoders have never seen"""
+    rng = np.random.default_rng(seed)
+    base = load_raw_frame()
+    idx = rng.integers(0, len(base), size=n_rows)
+    df = base.iloc[idx].reset_index(drop=True)
+    if unseen_fraction:
+        unseen = rng.random(n_rows) < unseen_fraction
+        df.loc[unseen, 'Num_equipement'] = [f"unseen-{i}" for i in np.flatnonzero(unseen)]
+    return df
+
+
+def scaled_records(n_rows: int, unseen_fraction: float = 0.05, seed: int = 1337) -> list:
+    """Same as ``scaled_raw_frame`` but as API-style records"""
+    df = scaled_raw_frame(n_rows, unseen_fraction, seed).rename(columns=COLUMN_MAPPING).fillna("")
+    return df.to_dict('records')
+
+
+def build_model_bundle(n_estimators: int = 100, seed: int = 1337, n_rows: int = None) -> dict:
+    """Train a model bundle shaped like the one the predictor loads
+    (model + label encoders + vectorizer), using random targets.
+    ``n_rows`` scales the training set up from data.csv for larger trees."""
+    from sklearn.preprocessing import LabelEncoder
+    from sklearn.feature_extraction.text import CountVectorizer
+    from sklearn.multioutput import MultiOutputRegressor
+    from sklearn.ensemble import RandomForestRegressor
+
+    rng = np.random.default_rng(seed)
+    # Scaled rows get distinct equipment ids half of the time so the trees grow with n_rows
+    df = (scaled_raw_frame(n_rows, unseen_fraction=0.5, seed=seed) if n_rows else load_raw_frame()).fillna("unknown")
+
+    label_encoders = {}
+    encoded = {}
+    for col in ["Num_equipement", "Systeme"]:
+        le = LabelEncoder()
+        encoded[col] = le.fit_transform(df[col])
+        label_encoders[col] = le
+
+    import scipy.sparse as sp
+    vectorizer = CountVectorizer(max_features=100)
+    text_features = vectorizer.fit_transform(df["Description"])
+    X = sp.hstack([
+        sp.csr_matrix(np.column_stack([encoded["Num_equipement"], encoded["Systeme"]]).astype(np.float64)),
+        text_features.astype(np.float64)
+    ], format="csr")
+
+    scores = rng.integers(1, 6, size=(len(df), 3))
+    y = np.column_stack([scores, scores.sum(axis=1)])
+
+    model = MultiOutputRegressor(RandomForestRegressor(n_estimators=n_estimators, random_state=seed))
+    model.fit(X, y)
+
+    return {
+        'model': model,
+        'label_encoders': label_encoders,
+        'vectorizer': vectorizer,
+        'target_columns': ["Fiabilité Intégrité", "Disponibilté", "Process Safety", "Criticité"],
+        'categorical_columns': ["Num_equipement", "Systeme"],
+    }
+
+
+def write_model_bundle(path: str, n_estimators: int = 100, n_rows: int = None) -> str:
+    """Train and dump a model bundle to ``path``"""
+    import joblib
+    joblib.dump(build_model_bundle(n_estimators=n_estimators, n_rows=n_rows), path)
+    return path
+
+
+def timed(fn, *args, repeat: int = 3, **kwargs):
+    """Return (best wall time in seconds, last result) over ``repeat`` runs"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def percentile(values, pct: float) -> float:
+    """Percentile of a list of latencies (in the same unit)"""
+    if not len(values):
+        return float("nan")
+    return float(np.percentile(np.asarray(values), pct))
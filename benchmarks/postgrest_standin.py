@@ -0,0 +1,171 @@
+"""Local stand-in for the Supabase REST (PostgREST) API, for benchmarks.
+
+Serves ``/rest/v1/<table>`` inserts (POST) and updates (PATCH ``?id=eq.``)
+from memory after an artificial ``latency``, like a remote database.
+Inserts into ``anomalies`` referencing an import batch listed in
+``missing_batches`` fail with PostgREST's foreign key violation, rows with
+an existing id fail with a unique violation unless the request asks for
+``resolution=ignore-duplicates`` (then they are skipped), tables in
+``missing_tables`` answer 404, anomalies whose ``equipement_id`` is listed
+in ``rejected_equipment`` fail a check constraint, bodies over ``max_body_bytes`` answer 413
+(like an API gateway) and a ``failure_rate`` share of inserts fail with a
+transient 503. Every request must carry the API key.
+It also counts requests, concurrency and the TCP connections used.
+
+The server runs in its own process so it does not compete with the
+client's event loop for the GIL:
+
+    with StandInPostgrest(latency=0.02) as server:
+        client = AsyncPostgrestClient(server.url, server.key)
+        server.stats(), server.table("anomalies")
+"""
+import asyncio
+import json
+import random
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+
+API_KEY = "standin.service.key"
+
+
+def create_app(latency: float, missing_tables, missing_batches, max_body_bytes=None, failure_rate=0.0,
+               rejected_equipment=()):
+    from starlette.applications import Starlette
+    from starlette.responses import JSONResponse, Response
+    from starlette.routing import Route
+
+    tables = {}
+    stats = {"requests": 0, "in_flight": 0, "max_in_flight": 0, "connections": set(), "failures": 0}
+    rng = random.Random(0)
+
+    async def handle(request):
+        if request.headers.get("apikey") != API_KEY or request.headers.get("authorization") != f"Bearer {API_KEY}":
+            return JSONResponse({"message": "Invalid API key"}, status_code=401)
+        stats["requests"] += 1
+        stats["in_flight"] += 1
+        stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+        stats["connections"].add(tuple(request.scope["client"]))
+        try:
+            await asyncio.sleep(latency)
+            return await apply(request)
+        finally:
+            stats["in_flight"] -= 1
+
+    async def apply(request):
+        table = request.path_params["table"]
+        if table in missing_tables:
+            return JSONResponse({"code": "42P01", "message": f'relation "public.{table}" does not exist'}, status_code=404)
+        raw = await request.body()
+        if max_body_bytes and len(raw) > max_body_bytes:
+            return JSONResponse({"message": "Request body too large"}, status_code=413)
+        if request.method == "POST" and failure_rate and rng.random() < failure_rate:
+            stats["failures"] += 1
+            return JSONResponse({"message": "Service temporarily unavailable"}, status_code=503)
+        body = json.loads(raw)
+        rows = tables.setdefault(table, {})
+        if request.method == "POST":
+            new_rows = body if isinstance(body, list) else [body]
+            for row in new_rows:
+                if table == "anomalies" and row.get("import_batch_id") in missing_batches:
+                    return JSONResponse({
+                        "code": "23503",
+                        "message": 'insert or update on table "anomalies" violates foreign key constraint '
+                                   '"anomalies_import_batch_id_fkey"',
+                        "details": f'Key (import_batch_id)=({row["import_batch_id"]}) is not present in table "import_batches".',
+                    }, status_code=409)
+                if table == "anomalies" and row.get("equipement_id") in rejected_equipment:
+                    return JSONResponse({
+                        "code": "23514",
+                        "message": 'new row for relation "anomalies" violates check constraint "anomalies_equipement_id_check"',
+                    }, status_code=400)
+            ignore_duplicates = "resolution=ignore-duplicates" in request.headers.get("prefer", "")
+            duplicate = next((row["id"] for row in new_rows if row.get("id") in rows), None)
+            if duplicate is not None and not ignore_duplicates:
+                return JSONResponse({
+                    "code": "23505",
+                    "message": f'duplicate key value violates unique constraint "{table}_pkey"',
+                    "details": f"Key (id)=({duplicate}) already exists.",
+                }, status_code=409)
+            stored = []
+            for row in new_rows:
+                row = {"id": row.get("id") or str(uuid.uuid4()), **row}
+                if row["id"] not in rows:
+                    rows[row["id"]] = row
+                    stored.append(row)
+        else:
+            row_id = request.query_params.get("id", "")[len("eq."):]
+            stored = [rows[row_id]] if row_id in rows else []
+            for row in stored:
+                row.update(body)
+        if "return=representation" in request.headers.get("prefer", ""):
+            return JSONResponse(stored, status_code=201 if request.method == "POST" else 200)
+        return Response(status_code=201 if request.method == "POST" else 204)
+
+    async def get_stats(request):
+        if request.method == "DELETE":
+            stats.update(requests=0, max_in_flight=0, connections=set(), failures=0)
+        return JSONResponse({**stats, "connections": len(stats["connections"])})
+
+    async def get_table(request):
+        return JSONResponse(tables.get(request.path_params["table"], {}))
+
+    return Starlette(routes=[
+        Route("/rest/v1/{table}", handle, methods=["POST", "PATCH"]),
+        Route("/_standin/stats", get_stats, methods=["GET", "DELETE"]),
+        Route("/_standin/tables/{table}", get_table),
+    ])
+
+
+class StandInPostgrest:
+    def __init__(self, latency: float = 0.02, missing_tables=(), missing_batches=(), max_body_bytes=None, failure_rate=0.0,
+                 rejected_equipment=()):
+        self.config = {"latency": latency, "missing_tables": list(missing_tables), "missing_batches": list(missing_batches),
+                       "max_body_bytes": max_body_bytes, "failure_rate": failure_rate,
+                       "rejected_equipment": list(rejected_equipment)}
+        self.key = API_KEY
+        self.url = None
+        self._process = None
+
+    def stats(self) -> dict:
+        return httpx.get(f"{self.url}/_standin/stats").json()
+
+    def reset_stats(self):
+        httpx.delete(f"{self.url}/_standin/stats")
+
+    def table(self, name: str) -> dict:
+        """Stored rows of ``name`` by id"""
+        return httpx.get(f"{self.url}/_standin/tables/{name}").json()
+
+    def __enter__(self):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+        self._process = subprocess.Popen([sys.executable, __file__, str(port), json.dumps(self.config)])
+        self.url = f"http://127.0.0.1:{port}"
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                self.stats()
+                return self
+            except httpx.TransportError:
+                if time.monotonic() > deadline or self._process.poll() is not None:
+                    self._process.kill()
+                    raise RuntimeError("stand-in PostgREST server did not start")
+                time.sleep(0.05)
+
+    def __exit__(self, *exc):
+        self._process.terminate()
+        self._process.wait()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    config = json.loads(sys.argv[2])
+    app = create_app(config["latency"], set(config["missing_tables"]), set(config["missing_batches"]),
+                     config["max_body_bytes"], config["failure_rate"], set(config["rejected_equipment"]))
+    uvicorn.run(app, host="127.0.0.1", port=int(sys.argv[1]), log_level="warning")
@@ -0,0 +1,231 @@
+import asyncio
+import os
+import random
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+import numpy as np
+
+# Largest insert request, in rows and in estimated JSON bytes
+BULK_INSERT_CHUNK_ROWS = int(os.environ.get("BULK_INSERT_CHUNK_ROWS", "500"))
+BULK_INSERT_CHUNK_BYTES = int(os.environ.get("BULK_INSERT_CHUNK_BYTES", str(1024 * 1024)))
+# Insert requests of one write in flight at the same time
+BULK_INSERT_CONCURRENCY = int(os.environ.get("BULK_INSERT_CONCURRENCY", "4"))
+# Retries of a chunk after a transient failure, and the first backoff (doubled each retry)
+BULK_INSERT_RETRIES = int(os.environ.get("BULK_INSERT_RETRIES", "3"))
+BULK_INSERT_BACKOFF_SECONDS = float(os.environ.get("BULK_INSERT_BACKOFF_SECONDS", "0.5"))
+
+# HTTP statuses worth retrying: timeouts, rate limiting and gateway/server errors
+TRANSIENT_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+# Postgres error classes worth retrying: connection, serialization/deadlock,
+# insufficient resources and cancelled statements (statement timeout)
+TRANSIENT_PG_CODE_PREFIXES = ("08", "40001", "40P01", "53", "57014", "57P")
+
+# JSON punctuation around one key/value pair ("key": "value",)
+_FIELD_OVERHEAD_BYTES = 6
+
+
+def is_transient(error: Exception) -> bool:
+    """Whether a failed insert may succeed when sent again"""
+    if isinstance(error, httpx.TransportError):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if status_code is not None:
+        return status_code in TRANSIENT_STATUS_CODES
+    code = getattr(error, "code", None)
+    return code is not None and str(code).startswith(TRANSIENT_PG_CODE_PREFIXES)
+
+
+def is_batch_fk_violation(error: Exception) -> bool:
+    """The import_batches row is missing (table without the batch record)"""
+    return "foreign key constraint" in str(error) and "import_batch_id" in str(error)
+
+
+def estimate_row_bytes(row: Dict[str, Any]) -> int:
+    """Approximate JSON size of a row, without encoding it"""
+    return 2 + sum(len(key) + len(str(value)) + _FIELD_OVERHEAD_BYTES for key, value in row.items())
+
+
+class ChunkOutcome:
+    """Outcome of one insert request"""
+
+    def __init__(self, index: int, start: int, rows: int, size_bytes: int):
+        self.index = index
+        self.start = start
+        self.rows = rows
+        self.size_bytes = size_bytes
+        self.attempts = 0
+        self.stored = False
+        self.error: Optional[str] = None
+        # Whether the last error may go away when the chunk is sent again later
+        self.transient = False
+        self.seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "index": self.index,
+            "start": self.start,
+            "rows": self.rows,
+            "bytes": self.size_bytes,
+            "attempts": self.attempts,
+            "stored": self.stored,
+            "error": self.error,
+            "transient": self.transient,
+            "seconds": self.seconds,
+        }
+
+
+class BulkWriteResult:
+    """Aggregate outcome of a bulk write, with one ChunkOutcome per insert request"""
+
+    def __init__(self, rows_total: int):
+        self.rows_total = rows_total
+        self.chunks: List[ChunkOutcome] = []
+        self.elapsed = 0.0
+
+    @property
+    def rows_stored(self) -> int:
+        return sum(chunk.rows for chunk in self.chunks if chunk.stored)
+
+    @property
+    def rows_failed(self) -> int:
+        return self.rows_total - self.rows_stored
+
+    @property
+    def errors(self) -> List[str]:
+        return [chunk.error for chunk in self.chunks if not chunk.stored and chunk.error]
+
+    def stored_mask(self) -> np.ndarray:
+        """Whether each row was stored, in input order"""
+        mask = np.zeros(self.rows_total, dtype=bool)
+        for chunk in self.chunks:
+            if chunk.stored:
+                mask[chunk.start:chunk.start + chunk.rows] = True
+        return mask
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows_total": self.rows_total,
+            "rows_stored": self.rows_stored,
+            "rows_failed": self.rows_failed,
+            "elapsed_seconds": self.elapsed,
+            "chunks": [chunk.to_dict() for chunk in self.chunks],
+        }
+
+
+class BulkWriter:
+    """Insert many anomaly rows as size-bounded chunks sent concurrently.
+
+    Rows are split into chunks of at most ``chunk_rows`` rows and
+    ``chunk_bytes`` estimated JSON bytes. At most ``concurrency`` chunks
+    are in flight, and each chunk's payload is only built when it is sent,
+    so memory follows the chunk size rather than the import size. A chunk
+    failing transiently (connection error, timeout, 429/5xx) is retried
+    with exponential backoff and jitter. Any other failure only fails that
+    chunk. The result reports every chunk's outcome, and whether a failed
+    chunk's last error was transient. With ``ignore_duplicates``, rows whose
+    id is already stored are skipped, so a write can be replayed safely.
+    """
+
+    def __init__(self, client, chunk_rows: int = None, chunk_bytes: int = None, concurrency: int = None,
+                 max_retries: int = None, backoff_seconds: float = None, table: str = "anomalies",
+                 ignore_duplicates: bool = False):
+        self.client = client
+        self.chunk_rows = chunk_rows or BULK_INSERT_CHUNK_ROWS
+        self.chunk_bytes = chunk_bytes or BULK_INSERT_CHUNK_BYTES
+        self.concurrency = concurrency or BULK_INSERT_CONCURRENCY
+        self.max_retries = max_retries if max_retries is not None else BULK_INSERT_RETRIES
+        self.backoff_seconds = backoff_seconds if backoff_seconds is not None else BULK_INSERT_BACKOFF_SECONDS
+        self.table = table
+        self.ignore_duplicates = ignore_duplicates
+
+        # Metrics
+        self.rows_stored_total = 0
+        self.rows_failed_total = 0
+        self.chunks_total = 0
+        self.chunks_failed = 0
+        self.retries_total = 0
+        self.fk_fallbacks = 0
+
+    def split(self, rows: List[Dict[str, Any]], chunk_rows: int = None) -> Iterator[Tuple[int, int, int]]:
+        """(start, stop, estimated bytes) of each chunk, bounded by rows and bytes"""
+        chunk_rows = chunk_rows or self.chunk_rows
+        start, size = 0, 0
+        for i, row in enumerate(rows):
+            row_bytes = estimate_row_bytes(row)
+            if i > start and (i - start >= chunk_rows or size + row_bytes > self.chunk_bytes):
+                yield start, i, size
+                start, size = i, 0
+            size += row_bytes
+        if start < len(rows):
+            yield start, len(rows), size
+
+    async def _send(self, rows: List[Dict[str, Any]], batch_id: Optional[str], outcome: ChunkOutcome, state: Dict[str, bool]):
+        while True:
+            outcome.attempts += 1
+            with_batch = batch_id is not None and not state["without_batch_id"]
+            # The payload is built per attempt and per chunk, never for the whole import
+            payload = [{**row, 'import_batch_id': batch_id} for row in rows] if with_batch else rows
+            try:
+                await self.client.insert_rows(self.table, payload, ignore_duplicates=self.ignore_duplicates)
+                outcome.stored = True
+                return
+            except Exception as e:
+                if with_batch and is_batch_fk_violation(e):
+                    # Missing import_batches record: this and later chunks go without the batch id
+                    if not state["without_batch_id"]:
+                        print("Warning: import_batch_id foreign key constraint failed, inserting without batch_id")
+                        self.fk_fallbacks += 1
+                    state["without_batch_id"] = True
+                    continue
+                outcome.error = f"{type(e).__name__}: {e}"
+                outcome.transient = is_transient(e)
+                if not outcome.transient or outcome.attempts > self.max_retries:
+                    return
+                self.retries_total += 1
+                delay = self.backoff_seconds * 2 ** (outcome.attempts - 1)
+                await asyncio.sleep(delay * (0.5 + random.random()))
+
+    async def write(self, rows: List[Dict[str, Any]], batch_id: Optional[str] = None,
+                    chunk_rows: int = None) -> BulkWriteResult:
+        """Insert ``rows`` (tagged with ``batch_id``); failed chunks are reported, not raised
+
+        ``chunk_rows`` overrides the rows per request for this write.
+        """
+        started = time.perf_counter()
+        result = BulkWriteResult(len(rows))
+        chunks = self.split(rows, chunk_rows)
+        state = {"without_batch_id": False}
+
+        async def worker():
+            # Workers share the chunk iterator, so chunks are sent in order as slots free up
+            for start, stop, size_bytes in chunks:
+                outcome = ChunkOutcome(len(result.chunks), start, stop - start, size_bytes)
+                result.chunks.append(outcome)
+                chunk_started = time.perf_counter()
+                await self._send(rows[start:stop], batch_id, outcome, state)
+                outcome.seconds = time.perf_counter() - chunk_started
+
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+
+        result.elapsed = time.perf_counter() - started
+        self.chunks_total += len(result.chunks)
+        self.chunks_failed += sum(not chunk.stored for chunk in result.chunks)
+        self.rows_stored_total += result.rows_stored
+        self.rows_failed_total += result.rows_failed
+        return result
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "chunk_rows": self.chunk_rows,
+            "chunk_bytes": self.chunk_bytes,
+            "concurrency": self.concurrency,
+            "max_retries": self.max_retries,
+            "rows_stored_total": self.rows_stored_total,
+            "rows_failed_total": self.rows_failed_total,
+            "chunks_total": self.chunks_total,
+            "chunks_failed": self.chunks_failed,
+            "retries_total": self.retries_total,
+            "fk_fallbacks": self.fk_fallbacks,
+        }
@@ -0,0 +1,74 @@
+import json
+from typing import Any, Dict
+
+import msgpack
+import numpy as np
+import pandas as pd
+
+from file_processor import FileProcessor
+
+# Content types of a columnar batch body
+JSON_CONTENT_TYPES = ('application/json',)
+MSGPACK_CONTENT_TYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Columns of a batch, as the fields of AnomalyInput; other keys are ignored like extra fields
+REQUIRED_COLUMNS = ('num_equipement', 'systeme', 'description')
+OPTIONAL_COLUMNS = ('date_detection', 'description_equipement', 'section_proprietaire')
+
+
+def decode_columns(body: bytes, content_type: str) -> Dict[str, Any]:
+    """Decode a columnar body (JSON or MessagePack, by content type) into its column lists"""
+    media_type = (content_type or '').split(';')[0].strip().lower()
+    if media_type in MSGPACK_CONTENT_TYPES:
+        try:
+            columns = msgpack.unpackb(body, raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise ValueError(f"Invalid MessagePack body: {str(e)}")
+    elif media_type in JSON_CONTENT_TYPES or not media_type:
+        try:
+            columns = json.loads(body)
+        except ValueError as e:
+            raise ValueError(f"Invalid JSON body: {str(e)}")
+    else:
+        raise ValueError(f"Unsupported content type '{media_type}': send application/json or application/msgpack")
+    if not isinstance(columns, dict):
+        raise ValueError("Body must be an object of columns, e.g. {\"num_equipement\": [...], \"systeme\": [...], ...}")
+    return columns
+
+
+def columns_to_frame(columns: Dict[str, Any]) -> pd.DataFrame:
+    """Check the column lists of a batch and return it validated, as ``validate_frame`` does
+
+    Each column is type-checked in one pass: identifiers and text must be
+    strings (optional columns may hold nulls), as in ``AnomalyInput``.
+    Missing optional columns default to empty values.
+    """
+    missing = [name for name in REQUIRED_COLUMNS if name not in columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    present = [name for name in REQUIRED_COLUMNS + OPTIONAL_COLUMNS if name in columns]
+    for name in present:
+        if not isinstance(columns[name], list):
+            raise ValueError(f"Column '{name}' must be an array")
+    lengths = {name: len(columns[name]) for name in present}
+    if len(set(lengths.values())) > 1:
+        raise ValueError(f"Columns must have the same length, got {lengths}")
+    if not lengths[REQUIRED_COLUMNS[0]]:
+        raise ValueError("No anomalies provided")
+
+    frame = {}
+    for name in present:
+        values = np.array(columns[name], dtype=object)
+        # 'string' (or 'empty' when every value is null) in one pass over the column
+        kind = pd.api.types.infer_dtype(values, skipna=name in OPTIONAL_COLUMNS)
+        if kind not in ('string', 'empty'):
+            row = next(i for i, value in enumerate(values) if not isinstance(value, str)
+                       and not (value is None and name in OPTIONAL_COLUMNS))
+            raise ValueError(f"Column '{name}', row {row + 1}: value must be a string")
+        frame[name] = values
+    return FileProcessor.validate_frame(pd.DataFrame(frame))
+
+
+def parse_columnar_batch(body: bytes, content_type: str) -> pd.DataFrame:
+    """Validated DataFrame of a columnar batch body"""
+    return columns_to_frame(decode_columns(body, content_type))
@@ -0,0 +1,83 @@
+from typing import Any, Dict, List, Tuple, Union
+
+import numpy as np
+import pandas as pd
+
+# Fields a prediction depends on; every other field is ignored by the model
+CONTENT_FIELDS = ("num_equipement", "systeme", "description")
+
+# Fields identifying a stored anomaly: the content fields plus when and where it was reported
+RECORD_FIELDS = CONTENT_FIELDS + ("date_detection", "description_equipement", "section_proprietaire")
+
+# Stands in for missing values, which the model treats differently from ""
+MISSING_MARKER = "\x00"
+
+# Two independent 64-bit SipHash keys give a 128-bit content hash
+_HASH_KEYS = ("tams-content-k1.", "tams-content-k2.")
+
+
+def normalize_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Normalize the content fields of a frame without changing their predictions.
+
+    Identifiers are only converted to strings (label encoders are case and
+    whitespace sensitive). Descriptions are lowercased with whitespace runs
+    collapsed: the vectorizer, the hashing fallback and the keyword rules all
+    lowercase the text and match words.
+    """
+    normalized = {}
+    for field_name in CONTENT_FIELDS:
+        if field_name in df.columns:
+            values = df[field_name]
+            missing = values.isna().to_numpy()
+            values = values.astype(str)
+        else:
+            values = pd.Series([""] * len(df), index=df.index)
+            missing = np.ones(len(df), dtype=bool)
+        values = values.to_numpy(dtype=object)
+        if field_name == "description":
+            # Repeated descriptions are normalized once
+            codes, uniques = pd.factorize(values)
+            values = np.array([" ".join(text.lower().split()) for text in uniques], dtype=object)[codes]
+        values[missing] = MISSING_MARKER
+        normalized[field_name] = values
+    return pd.DataFrame(normalized)
+
+
+def content_hashes(data: Union[pd.DataFrame, List[Dict[str, Any]]]) -> List[int]:
+    """128-bit content hash of every record, as Python ints"""
+    df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+    if len(df) == 0:
+        return []
+    normalized = normalize_frame(df)
+    high, low = (pd.util.hash_pandas_object(normalized, index=False, hash_key=key).to_numpy()
+                 for key in _HASH_KEYS)
+    return [(h << 64) | l for h, l in zip(high.tolist(), low.tolist())]
+
+
+def content_hash(record: Dict[str, Any]) -> int:
+    """Content hash of a single record"""
+    return content_hashes([record])[0]
+
+
+def record_hashes(df: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray]:
+    """128-bit hash of every row over ``RECORD_FIELDS``, as (high, low) uint64 arrays.
+
+    Values are compared as text with surrounding whitespace stripped and
+    inner whitespace runs collapsed; missing and empty values are equal.
+    Case is kept, unlike ``content_hashes``: the stored text differs.
+    Each distinct value of a column is normalized and hashed once.
+    """
+    hashes = [np.zeros(len(df), dtype=np.uint64) for _ in _HASH_KEYS]
+    with np.errstate(over="ignore"):
+        for position, field_name in enumerate(RECORD_FIELDS):
+            if field_name in df.columns:
+                codes, uniques = pd.factorize(df[field_name].fillna("").astype(str).to_numpy(dtype=object))
+                uniques = np.array([" ".join(text.split()) for text in uniques], dtype=object)
+            else:
+                codes, uniques = np.zeros(len(df), dtype=np.intp), np.array([""], dtype=object)
+            for row_hash, key in zip(hashes, _HASH_KEYS):
+                column_hash = pd.util.hash_array(uniques, hash_key=key, categorize=False)[codes] if len(uniques) else 0
+                # Order-dependent mix of the column hashes (as pandas combines columns)
+                row_hash ^= column_hash
+                row_hash *= np.uint64(1000003 + 2 * position)
+    return hashes[0], hashes[1]
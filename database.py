@@ -1,5 +1,7 @@
+import asyncio
 import os
 from supabase import create_client, Client
+from postgrest.types import ReturnMethod
 from dotenv import load_dotenv
 from typing import List, Dict, Any, Optional
 import uuid
@@ -56,14 +58,28 @@ class SupabaseClient:
             else:
                 raise Exception(f"Error creating anomalies batch: {str(e)}")
     
-    async def create_import_batch(self, filename: str, total_records: int) -> str:
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> None:
+        """Insert rows without returning them; errors are raised as is (used by BulkWriter)
+
+        With ``ignore_duplicates``, rows whose primary key already exists are skipped.
+        """
+        def insert():
+            query = self.supabase.table(table)
+            if ignore_duplicates:
+                return query.upsert(rows, returning=ReturnMethod.minimal, ignore_duplicates=True).execute()
+            return query.insert(rows, returning=ReturnMethod.minimal).execute()
+
+        # The client is synchronous: run the request in a thread so the event loop is not blocked
+        await asyncio.to_thread(insert)
+    
+    async def create_import_batch(self, filename: str, total_records: int, status: str = 'completed') -> str:
         """Create an import batch record and return its ID"""
         try:
             batch_data = {
                 'id': str(uuid.uuid4()),
                 'filename': filename,
                 'total_records': total_records,
-                'status': 'completed',
+                'status': status,
                 'created_at': datetime.utcnow().isoformat()
             }
             
@@ -82,6 +98,36 @@ class SupabaseClient:
             # This allows the system to work even without the import_batches table
             print(f"Warning: Could not create import batch record: {str(e)}")
             return str(uuid.uuid4())
+    
+    async def update_import_batch(self, batch_id: str, total_records: int, status: str) -> None:
+        """Update the record count and status of an import batch (e.g. at the end of a streamed import)"""
+        try:
+            self.supabase.table('import_batches').update({
+                'total_records': total_records,
+                'status': status
+            }).eq('id', batch_id).execute()
+        except Exception as e:
+            # Like create_import_batch, the import_batches table is optional
+            print(f"Warning: Could not update import batch record: {str(e)}")
+    
+    async def close(self):
+        """Nothing to release: the supabase client opens a connection per request"""
+    
+    def metrics(self) -> Dict[str, Any]:
+        return {"client": "supabase"}
+
+# "async" talks to PostgREST without blocking the event loop; "supabase" uses the
+# synchronous supabase-py client, whose calls block the event loop for each round trip
+DATABASE_CLIENT = os.environ.get("DATABASE_CLIENT", "async").lower()
+
+def create_storage_client():
+    """Storage client selected by DATABASE_CLIENT"""
+    if DATABASE_CLIENT == "async":
+        from postgrest_client import AsyncPostgrestClient
+        return AsyncPostgrestClient()
+    if DATABASE_CLIENT == "supabase":
+        return SupabaseClient()
+    raise ValueError(f"DATABASE_CLIENT must be 'async' or 'supabase', got '{DATABASE_CLIENT}'")
 
 # Global instance
-supabase_client = SupabaseClient()
+supabase_client = create_storage_client()
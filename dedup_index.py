@@ -0,0 +1,230 @@
+import asyncio
+import math
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from content_hash import record_hashes
+
+# Rows of file imports already stored are skipped before prediction
+DEDUP_ENABLED = os.environ.get("DEDUP_ENABLED", "true").lower() in ("1", "true", "yes")
+# SQLite file holding the hash of every imported row
+DEDUP_INDEX_PATH = os.environ.get("DEDUP_INDEX_PATH", "dedup_index.db")
+# Rows the in-memory Bloom filter is sized for, and its false positive rate at that size
+DEDUP_BLOOM_CAPACITY = int(os.environ.get("DEDUP_BLOOM_CAPACITY", "10000000"))
+DEDUP_BLOOM_ERROR_RATE = float(os.environ.get("DEDUP_BLOOM_ERROR_RATE", "0.01"))
+
+# Bound parameters per exact-check query (SQLite's default limit is 999)
+_QUERY_BATCH = 500
+
+
+def _to_keys(high: np.ndarray, low: np.ndarray) -> list:
+    """16-byte big-endian keys of the hashes, as stored in the index"""
+    pairs = np.empty((len(high), 2), dtype=">u8")
+    pairs[:, 0], pairs[:, 1] = high, low
+    raw = pairs.tobytes()
+    return [raw[i:i + 16] for i in range(0, len(raw), 16)]
+
+
+class BloomFilter:
+    """Bit array answering "maybe seen" or "certainly not seen" for 128-bit hashes.
+
+    Positions come from double hashing of the two 64-bit halves, so the
+    hashes are not hashed again. Sized for ``capacity`` entries at
+    ``error_rate`` false positives; beyond that the rate grows.
+    """
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.n_bits = max(64, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.n_hashes = max(1, round(self.n_bits / capacity * math.log(2)))
+        self.bits = np.zeros((self.n_bits + 7) // 8, dtype=np.uint8)
+        self.count = 0
+
+    def _positions(self, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+        step = high | np.uint64(1)
+        rounds = np.arange(self.n_hashes, dtype=np.uint64)[:, None]
+        # uint64 arithmetic wraps around, as double hashing expects
+        with np.errstate(over="ignore"):
+            return (low[None, :] + rounds * step[None, :]) % np.uint64(self.n_bits)
+
+    def add(self, high: np.ndarray, low: np.ndarray):
+        positions = self._positions(high, low).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         np.left_shift(1, positions & np.uint64(7)).astype(np.uint8))
+        self.count += len(high)
+
+    def might_contain(self, high: np.ndarray, low: np.ndarray) -> np.ndarray:
+        positions = self._positions(high, low)
+        hits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return hits.all(axis=0)
+
+    def error_rate(self) -> float:
+        """Expected false positive rate at the current count"""
+        return (1 - math.exp(-self.n_hashes * self.count / self.n_bits)) ** self.n_hashes
+
+
+class DedupIndex:
+    """Persistent index of imported rows, used to skip rows already stored.
+
+    Every row is hashed over its normalized fields (``record_hashes``).
+    Hashes of stored rows are kept in an SQLite table; a Bloom filter
+    rebuilt from it at startup answers most lookups from memory, and only
+    its positives are checked exactly against the table. Rows being
+    imported are claimed by their import until stored (``settle``) or
+    given up (``release``), so overlapping concurrent uploads and repeated
+    rows within one upload are also stored once. The Bloom filter and
+    the claims are per process: another process using the same index file
+    does not see the rows stored since it started, so run a single API
+    process per index file.
+    """
+
+    def __init__(self, path: str = None, capacity: int = None, error_rate: float = None):
+        self.path = path or DEDUP_INDEX_PATH
+        self.capacity = capacity or DEDUP_BLOOM_CAPACITY
+        self.error_rate = error_rate or DEDUP_BLOOM_ERROR_RATE
+        self.bloom: Optional[BloomFilter] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        # Claims and commits are serialized so a row is never admitted twice
+        self._lock: Optional[asyncio.Lock] = None
+        self._pending: Dict[bytes, Hashable] = {}
+        # Hashes of the claimed chunks, by (owner, first upload position), until settled
+        self._chunks: Dict[tuple, tuple] = {}
+
+        # Metrics
+        self.rows_checked = 0
+        self.duplicates_skipped = 0
+        self.exact_checks = 0
+        self.bloom_false_positives = 0
+
+    def _open(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # An entry lost to a power failure only lets one duplicate through
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS seen (hash BLOB PRIMARY KEY) WITHOUT ROWID")
+            bloom = BloomFilter(self.capacity, self.error_rate)
+            cursor = conn.execute("SELECT hash FROM seen")
+            while rows := cursor.fetchmany(100000):
+                pairs = np.frombuffer(b"".join(row[0] for row in rows), dtype=">u8").reshape(-1, 2)
+                bloom.add(pairs[:, 0].astype(np.uint64), pairs[:, 1].astype(np.uint64))
+            self._conn, self.bloom = conn, bloom
+            print(f"Dedup index: {bloom.count} rows from {self.path}")
+        return self._conn
+
+    async def open(self):
+        """Open the index file and load the Bloom filter"""
+        await asyncio.to_thread(self._locked, self._open)
+
+    def _locked(self, fn, *args):
+        with self._db_lock:
+            self._open()
+            return fn(*args)
+
+    def _known(self, keys: list) -> set:
+        found = set()
+        for i in range(0, len(keys), _QUERY_BATCH):
+            batch = keys[i:i + _QUERY_BATCH]
+            query = f"SELECT hash FROM seen WHERE hash IN ({','.join('?' * len(batch))})"
+            found.update(row[0] for row in self._conn.execute(query, batch))
+        return found
+
+    def _insert(self, keys: list):
+        self._conn.execute("BEGIN")
+        # In key order, the B-tree is filled page by page
+        self._conn.executemany("INSERT OR IGNORE INTO seen (hash) VALUES (?)", [(key,) for key in sorted(keys)])
+        self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _hash(frame: pd.DataFrame) -> Tuple[np.ndarray, np.ndarray, list]:
+        high, low = record_hashes(frame)
+        return high, low, _to_keys(high, low)
+
+    @staticmethod
+    def _chunk_key(owner: Hashable, frame: pd.DataFrame) -> tuple:
+        """A chunk of an import, by the upload position of its first row (the pipeline indexes rows by position)"""
+        return owner, frame.index[0]
+
+    def _get_lock(self) -> asyncio.Lock:
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        return self._lock
+
+    async def claim(self, frame: pd.DataFrame, owner: Hashable) -> Tuple[pd.DataFrame, int]:
+        """Rows of ``frame`` not stored or claimed yet, now claimed by ``owner``, and the count skipped"""
+        if not len(frame):
+            return frame, 0
+        if self.bloom is None:
+            await self.open()
+        high, low, keys = await asyncio.to_thread(self._hash, frame)
+        async with self._get_lock():
+            # Checked under the lock: a commit in between would otherwise go unseen
+            maybe = self.bloom.might_contain(high, low)
+            candidates = [key for key, hit in zip(keys, maybe) if hit]
+            known = await asyncio.to_thread(self._locked, self._known, candidates) if candidates else set()
+            self.exact_checks += len(candidates)
+            self.bloom_false_positives += len(candidates) - len(known)
+            keep = np.zeros(len(keys), dtype=bool)
+            for i, key in enumerate(keys):
+                if key not in known and key not in self._pending:
+                    self._pending[key] = owner
+                    keep[i] = True
+        skipped = len(keys) - int(keep.sum())
+        self.rows_checked += len(keys)
+        self.duplicates_skipped += skipped
+        kept = frame if skipped == 0 else frame[keep]
+        if len(kept):
+            self._chunks[self._chunk_key(owner, kept)] = (high[keep], low[keep], [key for key, new in zip(keys, keep) if new])
+        return kept, skipped
+
+    async def settle(self, frame: pd.DataFrame, stored: np.ndarray = None, owner: Hashable = None):
+        """Record the stored rows of a chunk (all when ``stored`` is None), so later imports
+        skip them, and give up the claims on the others; ``owner`` is the import that claimed it"""
+        if not len(frame):
+            return
+        claimed = self._chunks.pop(self._chunk_key(owner, frame), None)
+        if claimed is not None and len(claimed[2]) == len(frame):
+            high, low, keys = claimed
+        else:
+            high, low, keys = await asyncio.to_thread(self._hash, frame)
+        stored = np.ones(len(frame), dtype=bool) if stored is None else np.asarray(stored, dtype=bool)
+        stored_keys = [key for key, was_stored in zip(keys, stored) if was_stored]
+        async with self._get_lock():
+            if stored_keys:
+                await asyncio.to_thread(self._locked, self._insert, stored_keys)
+                self.bloom.add(high[stored], low[stored])
+            for key in keys:
+                self._pending.pop(key, None)
+
+    def release(self, owner: Hashable):
+        """Give up every claim of ``owner`` still pending (rows of chunks that were never stored)"""
+        for key in [key for key, claimed_by in self._pending.items() if claimed_by == owner]:
+            del self._pending[key]
+        for chunk_key in [chunk_key for chunk_key in self._chunks if chunk_key[0] == owner]:
+            del self._chunks[chunk_key]
+
+    def close(self):
+        with self._db_lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "entries": self.bloom.count if self.bloom else None,
+            "pending": len(self._pending),
+            "bloom_bits": self.bloom.n_bits if self.bloom else None,
+            "bloom_hashes": self.bloom.n_hashes if self.bloom else None,
+            "bloom_capacity": self.capacity,
+            "bloom_error_rate": self.bloom.error_rate() if self.bloom else None,
+            "rows_checked": self.rows_checked,
+            "duplicates_skipped": self.duplicates_skipped,
+            "exact_checks": self.exact_checks,
+            "bloom_false_positives": self.bloom_false_positives,
+        }
@@ -0,0 +1,215 @@
+import itertools
+from typing import Any, Dict, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+class LabelLookup:
+    """Vectorized replacement for calling ``LabelEncoder.transform`` row by row.
+
+    The encoder classes are turned into a sorted key array once, so a whole
+    column can be encoded with a single ``np.searchsorted`` call. Values the
+    encoder has never seen are detected with a vectorized mask and mapped to
+    ``unknown_value``.
+    """
+
+    def __init__(self, classes: Any, unknown_value: int = 0):
+        keys = np.asarray(classes).astype(str)
+        order = np.argsort(keys, kind="stable")
+        self.sorted_keys = keys[order]
+        # order[i] is the label code of sorted_keys[i]
+        self.codes = order.astype(np.int64)
+        self.unknown_value = unknown_value
+
+    @classmethod
+    def from_encoder(cls, encoder, unknown_value: int = 0) -> "LabelLookup":
+        """Build a lookup from a fitted scikit-learn ``LabelEncoder``"""
+        return cls(encoder.classes_, unknown_value=unknown_value)
+
+    @classmethod
+    def from_arrays(cls, sorted_keys: np.ndarray, codes: np.ndarray, unknown_value: int = 0) -> "LabelLookup":
+        """Wrap precomputed (e.g. memory-mapped) lookup arrays without copying them"""
+        lookup = cls.__new__(cls)
+        lookup.sorted_keys = sorted_keys
+        lookup.codes = codes
+        lookup.unknown_value = unknown_value
+        return lookup
+
+    def __len__(self) -> int:
+        return len(self.sorted_keys)
+
+    def transform(self, values: Any) -> Tuple[np.ndarray, np.ndarray]:
+        """Encode a column of values.
+
+        Returns the encoded int64 array and a boolean mask flagging the values
+        that were not part of the encoder classes.
+        """
+        values = np.asarray(values).astype(str)
+        if len(self.sorted_keys) == 0:
+            return np.full(len(values), self.unknown_value, dtype=np.int64), np.ones(len(values), dtype=bool)
+
+        positions = np.searchsorted(self.sorted_keys, values)
+        positions = np.minimum(positions, len(self.sorted_keys) - 1)
+        unseen = self.sorted_keys[positions] != values
+        encoded = np.where(unseen, self.unknown_value, self.codes[positions])
+        return encoded, unseen
+
+
+# CountVectorizer parameters that only affect how documents are analyzed
+ANALYZER_PARAMS = ("input", "encoding", "decode_error", "strip_accents", "lowercase",
+                   "stop_words", "token_pattern", "ngram_range", "analyzer")
+
+
+class VocabularyLookup:
+    """Array-backed replacement for a fitted ``CountVectorizer.transform``.
+
+    The vocabulary dict is replaced by a sorted term array and the feature
+    index of each term, so it can be stored as plain arrays and memory-mapped.
+    Documents are analyzed with the vectorizer's own analyzer and the tokens
+    of a whole batch are looked up with one ``np.searchsorted`` call. Output
+    matches the vectorizer: CSR, sorted indices, same dtype.
+    """
+
+    def __init__(self, sorted_terms: np.ndarray, indices: np.ndarray, params: Dict[str, Any],
+                 binary: bool = False, dtype: Any = np.int64):
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        self.sorted_terms = sorted_terms
+        self.indices = indices
+        self.params = dict(params)
+        self.binary = binary
+        self.dtype = np.dtype(dtype)
+        if isinstance(self.params.get("ngram_range"), list):
+            self.params["ngram_range"] = tuple(self.params["ngram_range"])
+        self.analyze = CountVectorizer(**self.params).build_analyzer()
+
+    @classmethod
+    def from_vectorizer(cls, vectorizer) -> "VocabularyLookup":
+        """Build a lookup from a fitted scikit-learn ``CountVectorizer``"""
+        params = {name: getattr(vectorizer, name) for name in ANALYZER_PARAMS}
+        if callable(params["analyzer"]) or vectorizer.preprocessor is not None or vectorizer.tokenizer is not None:
+            raise ValueError("Vectorizers with a custom analyzer, preprocessor or tokenizer are not supported")
+        terms = np.array(list(vectorizer.vocabulary_.keys()), dtype=str)
+        indices = np.fromiter(vectorizer.vocabulary_.values(), dtype=np.int64, count=len(terms))
+        order = np.argsort(terms, kind="stable")
+        return cls(terms[order], indices[order], params, binary=vectorizer.binary, dtype=vectorizer.dtype)
+
+    def __len__(self) -> int:
+        return len(self.sorted_terms)
+
+    def get_feature_names_out(self) -> np.ndarray:
+        names = np.empty(len(self.sorted_terms), dtype=self.sorted_terms.dtype)
+        names[self.indices] = self.sorted_terms
+        return names
+
+    def transform(self, raw_documents: Any) -> sp.csr_matrix:
+        """Bag-of-words counts, shape (documents, vocabulary size)"""
+        token_lists = [self.analyze(document) for document in raw_documents]
+        n_rows = len(token_lists)
+        lengths = np.fromiter((len(tokens) for tokens in token_lists), dtype=np.int64, count=n_rows)
+        tokens = np.array(list(itertools.chain.from_iterable(token_lists)), dtype=str)
+        rows = np.repeat(np.arange(n_rows, dtype=np.int64), lengths)
+
+        if len(self.sorted_terms) and len(tokens):
+            positions = np.minimum(np.searchsorted(self.sorted_terms, tokens), len(self.sorted_terms) - 1)
+            known = self.sorted_terms[positions] == tokens
+            columns, rows = self.indices[positions[known]], rows[known]
+        else:
+            columns, rows = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        # Duplicate (row, column) pairs are summed into counts
+        X = sp.csr_matrix((np.ones(len(columns), dtype=self.dtype), (rows, columns)),
+                          shape=(n_rows, len(self.sorted_terms)), dtype=self.dtype)
+        X.sum_duplicates()
+        if self.binary:
+            X.data.fill(1)
+        return X
+
+
+# Joins descriptions so a column can be tokenized with one split() call
+TOKEN_SEPARATOR = "\x01"
+
+
+def stable_hash(values: Any) -> np.ndarray:
+    """Hash a column of values to uint64, identically in every process.
+
+    Unlike the built-in ``hash()``, which is salted per interpreter, this
+    uses pandas' keyed SipHash over the whole array in one call.
+    """
+    values = np.asarray(values, dtype=object)
+    if len(values) == 0:
+        return np.zeros(0, dtype=np.uint64)
+    # Non-string objects are hashed through their str() form
+    return pd.util.hash_array(values, categorize=True)
+
+
+class HashingFeatureExtractor:
+    """Deterministic feature hashing for when no saved encoders are available.
+
+    Categorical columns become ``stable_hash(value) % categorical_buckets``;
+    the first ``max_words`` words of the description become positional
+    features ``stable_hash(word) % word_buckets``. Features are identical
+    across processes and restarts.
+    """
+
+    def __init__(self, categorical_columns=("systeme", "num_equipement"), text_column: str = "description",
+                 categorical_buckets: int = 1000, max_words: int = 100, word_buckets: int = 100):
+        self.categorical_columns = tuple(categorical_columns)
+        self.text_column = text_column
+        self.categorical_buckets = categorical_buckets
+        self.max_words = max_words
+        self.word_buckets = word_buckets
+
+    def encode_categorical(self, values: Any) -> np.ndarray:
+        """Hash a categorical column into ``categorical_buckets`` buckets"""
+        return (stable_hash(values) % np.uint64(self.categorical_buckets)).astype(np.int64)
+
+    @staticmethod
+    def _tokenize(descriptions: list) -> Tuple[np.ndarray, np.ndarray]:
+        """Lowercase and split a whole column at once.
+
+        Returns the words and the row each word came from. The column is
+        joined around a separator token and split in a single call; if a
+        description happens to contain the separator, rows are split one by one.
+        """
+        tokens = np.array(f" {TOKEN_SEPARATOR} ".join(descriptions).lower().split(), dtype=object)
+        is_separator = tokens == TOKEN_SEPARATOR
+        if np.count_nonzero(is_separator) == max(0, len(descriptions) - 1):
+            rows = np.cumsum(is_separator)[~is_separator]
+            return tokens[~is_separator], rows
+
+        word_lists = [description.lower().split() for description in descriptions]
+        lengths = np.fromiter((len(words) for words in word_lists), dtype=np.int64, count=len(word_lists))
+        words = np.fromiter(itertools.chain.from_iterable(word_lists), dtype=object, count=int(lengths.sum()))
+        return words, np.repeat(np.arange(len(word_lists)), lengths)
+
+    def encode_text(self, descriptions: Any) -> np.ndarray:
+        """Positional hashed word features, shape (rows, max_words)"""
+        descriptions = pd.Series(descriptions).fillna("").astype(str)
+        n_rows = len(descriptions)
+        features = np.zeros((n_rows, self.max_words))
+
+        words, rows = self._tokenize(descriptions.tolist())
+        if len(words) == 0:
+            return features
+
+        counts = np.bincount(rows, minlength=n_rows)
+        positions = np.arange(len(words)) - np.repeat(np.cumsum(counts) - counts, counts)
+        keep = positions < self.max_words
+
+        features[rows[keep], positions[keep]] = stable_hash(words[keep]) % np.uint64(self.word_buckets)
+        return features
+
+    def transform(self, df: pd.DataFrame) -> np.ndarray:
+        """Build the fallback feature matrix for a DataFrame"""
+        blocks = [
+            self.encode_categorical(df[col].to_numpy()).reshape(-1, 1)
+            for col in self.categorical_columns if col in df.columns
+        ]
+        if self.text_column in df.columns:
+            blocks.append(self.encode_text(df[self.text_column]))
+        else:
+            blocks.append(np.zeros((len(df), self.max_words)))
+        return np.concatenate(blocks, axis=1).astype(np.float64)
@@ -1,7 +1,45 @@
 import pandas as pd
 import io
-from typing import List, Dict, Any, Union
+import os
+import uuid
+import openpyxl
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+from typing import List, Dict, Any, Union, AsyncIterator, Iterator, Optional, Tuple
 from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+from ingest_pipeline import INGEST_CHUNK_ROWS
+from prediction_batch import PredictionBatch
+from row_validation import RejectedRows, first_missing_field, row_error_codes
+
+# Sheet read from Excel uploads when none is requested and the workbook has it
+EXCEL_DEFAULT_SHEET = os.environ.get("EXCEL_DEFAULT_SHEET", "Oracle")
+
+# Map upload column names to our expected format
+COLUMN_MAPPING = {
+    'Num_equipement': 'num_equipement',
+    'Systeme': 'systeme',
+    'Description': 'description',
+    'Date de détéction de l\'anomalie': 'date_detection',
+    'Description de l\'équipement': 'description_equipement',
+    'Section propriétaire': 'section_proprietaire'
+}
+
+# Identifier and text fields, read as strings from typed (Parquet/Arrow) uploads
+STRING_FIELDS = ('num_equipement', 'systeme', 'description', 'description_equipement', 'section_proprietaire')
+
+# Arrow IPC file format (Feather v2) magic bytes; the stream format has none
+ARROW_FILE_MAGIC = b'ARROW1'
+
+# Upload formats by file extension
+FILE_FORMATS = {
+    '.csv': 'csv',
+    '.xlsx': 'excel', '.xls': 'excel',
+    '.parquet': 'parquet', '.parq': 'parquet', '.pq': 'parquet',
+    '.arrows': 'arrow', '.arrow': 'arrow', '.ipc': 'arrow', '.feather': 'arrow',
+}
 
 class FileProcessor:
     @staticmethod
@@ -9,36 +47,241 @@ class FileProcessor:
         """Process uploaded CSV file and return list of anomaly data"""
         try:
             content = await file.read()
-            df = pd.read_csv(io.StringIO(content.decode('utf-8')))
+            # Parse off the event loop so other requests keep being served
+            df = await run_in_threadpool(lambda: pd.read_csv(io.StringIO(content.decode('utf-8'))))
             return FileProcessor._process_dataframe(df)
         except Exception as e:
             raise Exception(f"Error processing CSV file: {str(e)}")
     
     @staticmethod
-    async def process_excel_file(file: UploadFile) -> List[Dict[str, Any]]:
+    async def iter_csv_chunks(file: UploadFile, chunk_size: int = None) -> AsyncIterator[pd.DataFrame]:
+        """Parse an uploaded CSV file into DataFrames of ``chunk_size`` rows
+        
+        Reads straight from the spooled upload, so the file is never held in
+        memory as a whole. Cells are read as strings: with per-chunk type
+        inference the same identifier could otherwise come out as 123 in one
+        chunk and 123.0 in another.
+        """
+        await file.seek(0)
+        reader = await run_in_threadpool(
+            lambda: pd.read_csv(file.file, chunksize=chunk_size or INGEST_CHUNK_ROWS, dtype=str, encoding='utf-8')
+        )
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, reader, None)
+                if chunk is None:
+                    break
+                yield FileProcessor._prepare_frame(chunk)
+        finally:
+            reader.close()
+    
+    @staticmethod
+    async def process_excel_file(file: UploadFile, sheet_name: Optional[str] = None) -> List[Dict[str, Any]]:
         """Process uploaded Excel file and return list of anomaly data"""
         try:
             content = await file.read()
-            df = pd.read_excel(io.BytesIO(content))
+            def read():
+                with pd.ExcelFile(io.BytesIO(content)) as workbook:
+                    sheet = FileProcessor._select_sheet(workbook.sheet_names, sheet_name)
+                    return workbook.parse(sheet)
+            df = await run_in_threadpool(read)
             return FileProcessor._process_dataframe(df)
         except Exception as e:
             raise Exception(f"Error processing Excel file: {str(e)}")
     
+    @staticmethod
+    async def iter_excel_chunks(file: UploadFile, sheet_name: Optional[str] = None,
+                                chunk_size: int = None) -> AsyncIterator[pd.DataFrame]:
+        """Parse an uploaded Excel file into DataFrames of ``chunk_size`` rows
+        
+        .xlsx workbooks are opened in openpyxl's read-only mode, which parses
+        the sheet XML row by row instead of building every cell of the
+        workbook in memory. Cells are converted to strings as in
+        ``iter_csv_chunks``. Legacy .xls files have no streaming reader and
+        are parsed whole, then sliced into the same chunks.
+        """
+        await file.seek(0)
+        read_chunks = FileProcessor._xls_chunks if (file.filename or '').lower().endswith('.xls') else FileProcessor._xlsx_chunks
+        async for chunk in FileProcessor._iter_frames(read_chunks(file.file, sheet_name, chunk_size or INGEST_CHUNK_ROWS)):
+            yield chunk
+    
+    @staticmethod
+    async def iter_parquet_chunks(file: UploadFile, chunk_size: int = None) -> AsyncIterator[pd.DataFrame]:
+        """Read an uploaded Parquet file into DataFrames of ``chunk_size`` rows
+        
+        Only the mapped columns are decoded, one row-group batch at a time.
+        Column types are kept except for identifiers and text, which are read
+        as strings (see ``_arrow_to_frame``).
+        """
+        await file.seek(0)
+        async for chunk in FileProcessor._iter_frames(FileProcessor._parquet_chunks(file.file, chunk_size or INGEST_CHUNK_ROWS)):
+            yield chunk
+    
+    @staticmethod
+    async def iter_arrow_chunks(file: UploadFile, chunk_size: int = None) -> AsyncIterator[pd.DataFrame]:
+        """Read an uploaded Arrow IPC stream (or IPC file / Feather v2) into DataFrames of about ``chunk_size`` rows"""
+        await file.seek(0)
+        async for chunk in FileProcessor._iter_frames(FileProcessor._arrow_chunks(file.file, chunk_size or INGEST_CHUNK_ROWS)):
+            yield chunk
+    
+    @staticmethod
+    def file_format(filename: Optional[str]) -> Optional[str]:
+        """Upload format of a file name ('csv', 'excel', 'parquet' or 'arrow'), None when unsupported"""
+        return FILE_FORMATS.get(os.path.splitext(filename or '')[1].lower())
+    
+    @staticmethod
+    def iter_file_chunks(file: UploadFile, sheet_name: Optional[str] = None,
+                         chunk_size: int = None) -> AsyncIterator[pd.DataFrame]:
+        """Chunks of an upload in any supported format, chosen from its file extension"""
+        file_format = FileProcessor.file_format(file.filename)
+        if file_format == 'csv':
+            return FileProcessor.iter_csv_chunks(file, chunk_size)
+        if file_format == 'excel':
+            return FileProcessor.iter_excel_chunks(file, sheet_name, chunk_size)
+        if file_format == 'parquet':
+            return FileProcessor.iter_parquet_chunks(file, chunk_size)
+        if file_format == 'arrow':
+            return FileProcessor.iter_arrow_chunks(file, chunk_size)
+        raise ValueError(f"Unsupported file type: {file.filename}")
+    
+    @staticmethod
+    async def _iter_frames(chunks: Iterator[pd.DataFrame]) -> AsyncIterator[pd.DataFrame]:
+        """Pull the raw chunks of a file reader in the threadpool and prepare them"""
+        # The file is only opened and parsed inside next(), off the event loop
+        try:
+            while True:
+                chunk = await run_in_threadpool(next, chunks, None)
+                if chunk is None:
+                    break
+                yield FileProcessor._prepare_frame(chunk)
+        finally:
+            chunks.close()
+    
+    @staticmethod
+    def _select_sheet(sheet_names: List[str], sheet_name: Optional[str] = None) -> str:
+        """The requested sheet, else the "Oracle" sheet of our exports, else the first one"""
+        if sheet_name is not None:
+            if sheet_name not in sheet_names:
+                raise ValueError(f"Worksheet '{sheet_name}' not found, available sheets: {sheet_names}")
+            return sheet_name
+        if EXCEL_DEFAULT_SHEET in sheet_names:
+            return EXCEL_DEFAULT_SHEET
+        return sheet_names[0]
+    
+    @staticmethod
+    def _excel_cell_to_str(value: Any) -> Any:
+        """String value of a cell, None when empty (whole numbers lose their '.0' like in pd.read_excel)"""
+        if value is None or value == '':
+            return None
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value)
+    
+    @staticmethod
+    def _xlsx_chunks(source, sheet_name: Optional[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Frames of up to ``chunk_size`` rows from a read-only openpyxl workbook"""
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            sheet = workbook[FileProcessor._select_sheet(workbook.sheetnames, sheet_name)]
+            header = None
+            batch = []
+            for row in sheet.iter_rows(values_only=True):
+                values = [FileProcessor._excel_cell_to_str(value) for value in row]
+                # Blank rows (empty spacer lines in exports) are skipped rather than stored as empty anomalies
+                if all(value is None for value in values):
+                    continue
+                if header is None:
+                    header = [value if value is not None else f"Unnamed: {i}" for i, value in enumerate(values)]
+                    continue
+                # Read-only rows follow the sheet's stored dimensions and can be ragged
+                batch.append((values + [None] * len(header))[:len(header)])
+                if len(batch) == chunk_size:
+                    yield pd.DataFrame(batch, columns=header, dtype=object)
+                    batch = []
+            if header is None:
+                raise ValueError("No columns to parse from file")
+            if batch:
+                yield pd.DataFrame(batch, columns=header, dtype=object)
+        finally:
+            workbook.close()
+    
+    @staticmethod
+    def _xls_chunks(source, sheet_name: Optional[str], chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Frames of up to ``chunk_size`` rows from a legacy .xls workbook, parsed whole"""
+        with pd.ExcelFile(source) as workbook:
+            df = workbook.parse(FileProcessor._select_sheet(workbook.sheet_names, sheet_name), dtype=str)
+        for start in range(0, len(df), chunk_size):
+            yield df.iloc[start:start + chunk_size]
+    
+    @staticmethod
+    def _arrow_columns(names: List[str]) -> List[str]:
+        """Columns of a typed upload that ``_prepare_frame`` keeps, under either naming"""
+        wanted = set(COLUMN_MAPPING) | set(COLUMN_MAPPING.values())
+        return [name for name in names if name in wanted]
+    
+    @staticmethod
+    def _arrow_to_frame(table) -> pd.DataFrame:
+        """Arrow table or record batch to pandas, with identifiers and text as strings
+        
+        Numeric and date columns convert without copying where Arrow allows.
+        Identifiers stored as numbers are cast to strings in Arrow, so 123
+        stays "123" in every chunk, with or without nulls (as with
+        ``dtype=str`` CSV chunks).
+        """
+        columns = []
+        for name, column in zip(table.schema.names, table.columns):
+            if COLUMN_MAPPING.get(name, name) in STRING_FIELDS and not (pa.types.is_string(column.type) or pa.types.is_large_string(column.type)):
+                column = pc.cast(column, pa.string())
+            columns.append(column)
+        return pa.table(columns, names=table.schema.names).to_pandas(split_blocks=True, self_destruct=True)
+    
+    @staticmethod
+    def _parquet_chunks(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Frames of up to ``chunk_size`` rows from a Parquet file"""
+        parquet_file = pq.ParquetFile(source)
+        try:
+            columns = FileProcessor._arrow_columns(parquet_file.schema_arrow.names)
+            for batch in parquet_file.iter_batches(batch_size=chunk_size, columns=columns):
+                yield FileProcessor._arrow_to_frame(batch)
+        finally:
+            parquet_file.close()
+    
+    @staticmethod
+    def _arrow_chunks(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+        """Frames of about ``chunk_size`` rows from an Arrow IPC stream or file
+        
+        Writers choose their own record batch size, so small batches are
+        combined until a chunk is full; larger ones are passed as is.
+        """
+        is_file_format = source.read(len(ARROW_FILE_MAGIC)) == ARROW_FILE_MAGIC
+        source.seek(0)
+        if is_file_format:
+            reader = pa.ipc.open_file(source)
+            batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+        else:
+            reader = pa.ipc.open_stream(source)
+            batches = iter(reader)
+        columns = FileProcessor._arrow_columns(reader.schema.names)
+        pending, pending_rows = [], 0
+        for batch in batches:
+            pending.append(batch.select(columns))
+            pending_rows += batch.num_rows
+            if pending_rows >= chunk_size:
+                yield FileProcessor._arrow_to_frame(pa.Table.from_batches(pending))
+                pending, pending_rows = [], 0
+        if pending_rows:
+            yield FileProcessor._arrow_to_frame(pa.Table.from_batches(pending))
+    
     @staticmethod
     def _process_dataframe(df: pd.DataFrame) -> List[Dict[str, Any]]:
         """Process pandas DataFrame and extract relevant columns"""
-        # Map column names to our expected format
-        column_mapping = {
-            'Num_equipement': 'num_equipement',
-            'Systeme': 'systeme',
-            'Description': 'description',
-            'Date de détéction de l\'anomalie': 'date_detection',
-            'Description de l\'équipement': 'description_equipement',
-            'Section propriétaire': 'section_proprietaire'
-        }
-        
+        return FileProcessor._prepare_frame(df).to_dict('records')
+    
+    @staticmethod
+    def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+        """Rename and select the anomaly columns of an uploaded sheet, keeping it a DataFrame"""
         # Rename columns
-        df_renamed = df.rename(columns=column_mapping)
+        df_renamed = df.rename(columns=COLUMN_MAPPING)
         
         # Select only the columns we need for prediction
         required_columns = ['num_equipement', 'systeme', 'description']
@@ -54,10 +297,7 @@ class FileProcessor:
         df_selected = df_renamed[available_columns]
         
         # Fill NaN values
-        df_selected = df_selected.fillna("")
-        
-        # Convert to list of dictionaries
-        return df_selected.to_dict('records')
+        return df_selected.fillna("")
     
     @staticmethod
     def validate_anomaly_data(data: Dict[str, Any]) -> Dict[str, Any]:
@@ -79,6 +319,54 @@ class FileProcessor:
             'section_proprietaire': data.get('section_proprietaire', '')
         }
     
+    @staticmethod
+    def validate_frame(data: Union[pd.DataFrame, List[Dict[str, Any]]]) -> pd.DataFrame:
+        """Validate and clean a whole batch, column by column
+        
+        Same rules and error as ``validate_anomaly_data`` applied to every
+        row (the first invalid row raises), without a dict per row.
+        """
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(list(data))
+        codes = row_error_codes(df)
+        if codes.any():
+            # The first invalid row, and its first missing field
+            raise ValueError(f"Missing required field: {first_missing_field(int(codes[codes != 0][0]))}")
+        return FileProcessor._clean_frame(df, from_records=not isinstance(data, pd.DataFrame))
+    
+    @staticmethod
+    def validate_frame_rows(df: pd.DataFrame) -> Tuple[pd.DataFrame, RejectedRows]:
+        """Split a batch into its valid rows, cleaned as ``validate_frame`` does, and a report of the others
+        
+        Rows are checked with the same rules in a few column operations; an
+        invalid row is rejected without failing the batch. The report gives
+        rows by their index, the position in the upload.
+        """
+        codes = row_error_codes(df)
+        rejected = RejectedRows()
+        if codes.any():
+            rejected.add(codes, df.index.to_numpy())
+            df = df[codes == 0]
+        return FileProcessor._clean_frame(df), rejected
+    
+    @staticmethod
+    def _clean_frame(df: pd.DataFrame, from_records: bool = False) -> pd.DataFrame:
+        """Anomaly columns of valid rows: required fields stripped, optional ones defaulted to ''"""
+        required_fields = ['num_equipement', 'systeme', 'description']
+        validated = {field: df[field].astype(str).str.strip() for field in required_fields}
+        for field in ['date_detection', 'description_equipement', 'section_proprietaire']:
+            if field not in df.columns:
+                validated[field] = ''
+                continue
+            values = df[field]
+            if from_records:
+                # Keys absent from some records come out as NaN; default them to '' (explicit None is kept)
+                absent = values.isna()
+                if absent.any():
+                    absent[absent] = values[absent].map(lambda value: value is not None)
+                    values = values.mask(absent, '')
+            validated[field] = values
+        return pd.DataFrame(validated, index=df.index)
+    
     @staticmethod
     def prepare_for_database(anomaly_data: Dict[str, Any], predictions: Dict[str, int]) -> Dict[str, Any]:
         """Prepare anomaly data for database insertion"""
@@ -95,3 +383,48 @@ class FileProcessor:
             'ai_process_safety_score': predictions['ai_process_safety_score'],
             'ai_criticality_level': predictions['ai_criticality_level']
         }
+    
+    @staticmethod
+    def prepare_for_database_batch(anomalies_data: List[Dict[str, Any]], predictions: Any) -> List[Dict[str, Any]]:
+        """Prepare a whole batch of anomaly dicts for database insertion (see ``prepare_for_database_frame``)"""
+        if not anomalies_data:
+            return []
+        return FileProcessor.prepare_for_database_frame(pd.DataFrame(anomalies_data), predictions)
+    
+    @staticmethod
+    def prepare_for_database_frame(df: pd.DataFrame, predictions: Any) -> List[Dict[str, Any]]:
+        """Build the database rows of a whole batch from the anomaly and score columns
+        
+        Each row gets its id here, so an insert retried after a lost
+        response skips the rows already stored instead of storing them twice.
+        """
+        n_rows = len(df)
+        service = df['section_proprietaire'].tolist() if 'section_proprietaire' in df.columns else [''] * n_rows
+        system_id = df['systeme'].tolist() if 'systeme' in df.columns else [''] * n_rows
+        if not hasattr(predictions, 'columns'):
+            predictions = PredictionBatch.from_records(list(predictions))
+        return [
+            {
+                'id': str(uuid.uuid4()),
+                'equipement_id': equipement_id,
+                'description': description,
+                'service': section,
+                'system_id': system,
+                'status': 'nouvelle',
+                'source_origine': 'api',
+                'ai_fiabilite_integrite_score': f,
+                'ai_disponibilite_score': d,
+                'ai_process_safety_score': p,
+                'ai_criticality_level': c
+            }
+            for equipement_id, description, section, system, f, d, p, c in zip(
+                df['num_equipement'].tolist(),
+                df['description'].tolist(),
+                service,
+                system_id,
+                predictions.columns['ai_fiabilite_integrite_score'].tolist(),
+                predictions.columns['ai_disponibilite_score'].tolist(),
+                predictions.columns['ai_process_safety_score'].tolist(),
+                predictions.columns['ai_criticality_level'].tolist(),
+            )
+        ]
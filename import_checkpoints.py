@@ -0,0 +1,250 @@
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from content_hash import record_hashes
+
+# Committed chunks of file imports are recorded so an interrupted import can be resumed
+IMPORT_CHECKPOINTS_ENABLED = os.environ.get("IMPORT_CHECKPOINTS_ENABLED", "true").lower() in ("1", "true", "yes")
+# SQLite file of the checkpoints, shared by every API process on the host
+IMPORT_CHECKPOINTS_PATH = os.environ.get("IMPORT_CHECKPOINTS_PATH", "import_checkpoints.db")
+# Checkpoints of imports left unfinished for this long are deleted at startup
+IMPORT_CHECKPOINTS_RETENTION_HOURS = float(os.environ.get("IMPORT_CHECKPOINTS_RETENTION_HOURS", "168"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    batch_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    rows_committed INTEGER NOT NULL DEFAULT 0,
+    started_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS chunks (
+    batch_id TEXT NOT NULL,
+    first_offset INTEGER NOT NULL,
+    rows INTEGER NOT NULL,
+    offsets BLOB NOT NULL,
+    hashes BLOB NOT NULL,
+    PRIMARY KEY (batch_id, first_offset)
+);
+"""
+
+
+class ImportBatchUnavailable(Exception):
+    """The import batch cannot be resumed: unknown, already completed or being imported"""
+
+
+class CommittedRows:
+    """Rows of an upload an earlier attempt of its import already stored.
+
+    Rows are told apart by their position in the upload (the chunk index
+    set by ``IngestPipeline``); the hash recorded for each position makes
+    sure a retry uploads the same file.
+    """
+
+    def __init__(self, batch_id: str, offsets: np.ndarray, high: np.ndarray, low: np.ndarray):
+        order = np.argsort(offsets, kind="stable")
+        self.batch_id = batch_id
+        self.offsets, self.high, self.low = offsets[order], high[order], low[order]
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def skip(self, frame: pd.DataFrame) -> Tuple[pd.DataFrame, int]:
+        """Rows of ``frame`` not committed yet, and the count skipped; raises when a committed row differs"""
+        if not len(self.offsets) or not len(frame):
+            return frame, 0
+        positions = frame.index.to_numpy(dtype=np.int64)
+        where = np.minimum(np.searchsorted(self.offsets, positions), len(self.offsets) - 1)
+        committed = self.offsets[where] == positions
+        if not committed.any():
+            return frame, 0
+        high, low = record_hashes(frame[committed])
+        where = where[committed]
+        differs = (self.high[where] != high) | (self.low[where] != low)
+        if differs.any():
+            row = int(positions[committed][differs][0])
+            raise ValueError(f"Row {row + 1} does not match the interrupted import {self.batch_id}: "
+                             f"upload the same file to resume it")
+        return frame[~committed], int(committed.sum())
+
+
+class ImportCheckpoints:
+    """Chunk-level checkpoints of file imports, kept per import batch.
+
+    ``commit`` records the upload positions and row hashes of the rows of
+    a chunk once they are stored, in an SQLite table. When an import
+    fails or its process stops, ``begin`` on the same batch returns those
+    rows so a retry skips them before scoring (``CommittedRows.skip``)
+    and continues with the first chunk not committed. A row stored just
+    before a crash, whose checkpoint was not written yet, is stored again.
+    Checkpoints of a completed import are deleted; those of unfinished
+    imports after ``retention_hours``. Only one import of a batch can run
+    at a time in a process.
+    """
+
+    def __init__(self, path: str = None, retention_hours: float = None):
+        self.path = path or IMPORT_CHECKPOINTS_PATH
+        self.retention_hours = retention_hours if retention_hours is not None else IMPORT_CHECKPOINTS_RETENTION_HOURS
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection shared by the event loop's worker threads
+        self._lock = threading.Lock()
+        # Batches being imported by this process
+        self._active = set()
+
+        # Metrics
+        self.imports_resumed = 0
+        self.rows_resumed = 0
+        self.chunks_committed = 0
+        self.rows_committed = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            # A checkpoint lost to a power failure only makes a retry store its rows again
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, query: str, params: tuple = ()) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    def _purge(self):
+        expired = time.time() - self.retention_hours * 3600
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.execute("DELETE FROM chunks WHERE batch_id IN (SELECT batch_id FROM batches WHERE updated_at < ?)",
+                         (expired,))
+            purged = conn.execute("DELETE FROM batches WHERE updated_at < ?", (expired,)).rowcount
+            conn.execute("COMMIT")
+        if purged:
+            print(f"Import checkpoints: {purged} expired import batches deleted from {self.path}")
+
+    async def open(self):
+        """Open the checkpoint file and delete expired checkpoints"""
+        await asyncio.to_thread(self._purge)
+
+    async def status(self, batch_id: str) -> Optional[str]:
+        """Status of an import batch ('running', 'completed', 'partial' or 'failed'), None when unknown"""
+        rows = await asyncio.to_thread(self._execute, "SELECT status FROM batches WHERE batch_id = ?", (batch_id,))
+        return rows[0][0] if rows else None
+
+    def _load(self, batch_id: str) -> CommittedRows:
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                batch = conn.execute("SELECT status FROM batches WHERE batch_id = ?", (batch_id,)).fetchone()
+                if batch is not None and batch[0] == 'completed':
+                    raise ImportBatchUnavailable(f"Import batch {batch_id} is already completed")
+                conn.execute(
+                    "INSERT INTO batches (batch_id, status, attempts, started_at, updated_at) "
+                    "VALUES (?, 'running', 1, ?, ?) ON CONFLICT (batch_id) DO UPDATE SET status = 'running', "
+                    "attempts = attempts + 1, updated_at = excluded.updated_at", (batch_id, now, now)
+                )
+                chunks = conn.execute("SELECT offsets, hashes FROM chunks WHERE batch_id = ?", (batch_id,)).fetchall()
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        offsets = np.frombuffer(b"".join(chunk[0] for chunk in chunks), dtype="<i8").astype(np.int64)
+        pairs = np.frombuffer(b"".join(chunk[1] for chunk in chunks), dtype=">u8").reshape(-1, 2)
+        return CommittedRows(batch_id, offsets, pairs[:, 0].astype(np.uint64), pairs[:, 1].astype(np.uint64))
+
+    async def begin(self, batch_id: str) -> CommittedRows:
+        """Start (or resume) the import of a batch; returns the rows earlier attempts committed"""
+        if batch_id in self._active:
+            raise ImportBatchUnavailable(f"Import batch {batch_id} is already being imported")
+        self._active.add(batch_id)
+        try:
+            committed = await asyncio.to_thread(self._load, batch_id)
+        except BaseException:
+            self._active.discard(batch_id)
+            raise
+        if len(committed):
+            self.imports_resumed += 1
+            self.rows_resumed += len(committed)
+            print(f"Import checkpoints: resuming import batch {batch_id} after {len(committed)} committed rows")
+        return committed
+
+    def _insert(self, batch_id: str, offsets: np.ndarray, high: np.ndarray, low: np.ndarray):
+        pairs = np.empty((len(offsets), 2), dtype=">u8")
+        pairs[:, 0], pairs[:, 1] = high, low
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.execute(
+                "INSERT OR REPLACE INTO chunks (batch_id, first_offset, rows, offsets, hashes) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, int(offsets[0]), len(offsets), offsets.astype("<i8").tobytes(), pairs.tobytes()),
+            )
+            conn.execute("UPDATE batches SET rows_committed = rows_committed + ?, updated_at = ? WHERE batch_id = ?",
+                         (len(offsets), time.time(), batch_id))
+            conn.execute("COMMIT")
+
+    def _commit(self, batch_id: str, frame: pd.DataFrame, stored: Optional[np.ndarray]):
+        if stored is not None:
+            frame = frame[np.asarray(stored, dtype=bool)]
+        if not len(frame):
+            return 0
+        high, low = record_hashes(frame)
+        self._insert(batch_id, frame.index.to_numpy(dtype=np.int64), high, low)
+        return len(frame)
+
+    async def commit(self, batch_id: str, frame: pd.DataFrame, stored: np.ndarray = None):
+        """Record the stored rows of a chunk (all when ``stored`` is None) as committed"""
+        rows = await asyncio.to_thread(self._commit, batch_id, frame, stored)
+        if rows:
+            self.chunks_committed += 1
+            self.rows_committed += rows
+
+    def _finish(self, batch_id: str, status: str):
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.execute("UPDATE batches SET status = ?, updated_at = ? WHERE batch_id = ?",
+                         (status, time.time(), batch_id))
+            if status == 'completed':
+                # Nothing left to resume
+                conn.execute("DELETE FROM chunks WHERE batch_id = ?", (batch_id,))
+            conn.execute("COMMIT")
+
+    async def finish(self, batch_id: str, status: str):
+        """End an import attempt; checkpoints are kept unless it completed"""
+        try:
+            await asyncio.to_thread(self._finish, batch_id, status)
+        finally:
+            self._active.discard(batch_id)
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def metrics(self) -> Dict[str, Any]:
+        counts: Dict[str, Any] = {}
+        try:
+            counts = dict(self._execute("SELECT status, COUNT(*) FROM batches GROUP BY status"))
+        except sqlite3.Error as e:
+            print(f"Warning: could not count import checkpoints: {str(e)}")
+        return {
+            "path": self.path,
+            "batches": counts,
+            "importing_here": len(self._active),
+            "imports_resumed": self.imports_resumed,
+            "rows_resumed": self.rows_resumed,
+            "chunks_committed": self.chunks_committed,
+            "rows_committed": self.rows_committed,
+        }
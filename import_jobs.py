@@ -0,0 +1,401 @@
+import asyncio
+import json
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from fastapi import UploadFile
+
+from file_processor import FileProcessor
+from ingest_pipeline import IngestResult
+
+# SQLite file of the job table, shared by every API process on the host
+IMPORT_JOBS_PATH = os.environ.get("IMPORT_JOBS_PATH", "import_jobs.db")
+# Directory uploads are copied to until their job has run
+IMPORT_JOBS_SPOOL_DIR = os.environ.get("IMPORT_JOBS_SPOOL_DIR", "import_spool")
+# Jobs run at the same time by each process (0: this process only queues jobs)
+IMPORT_JOBS_WORKERS = int(os.environ.get("IMPORT_JOBS_WORKERS", "2"))
+# How often idle workers look for jobs queued by other processes
+IMPORT_JOBS_POLL_SECONDS = float(os.environ.get("IMPORT_JOBS_POLL_SECONDS", "1"))
+# How often a running job's progress is saved
+IMPORT_JOBS_PROGRESS_SECONDS = float(os.environ.get("IMPORT_JOBS_PROGRESS_SECONDS", "1"))
+# A running job without progress for this long is taken over (its process died)
+IMPORT_JOBS_LEASE_SECONDS = float(os.environ.get("IMPORT_JOBS_LEASE_SECONDS", "60"))
+# Runs of a job interrupted by a crash before it is marked failed
+IMPORT_JOBS_MAX_ATTEMPTS = int(os.environ.get("IMPORT_JOBS_MAX_ATTEMPTS", "3"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    filename TEXT NOT NULL,
+    sheet_name TEXT,
+    spool_path TEXT NOT NULL,
+    import_batch_id TEXT,
+    status TEXT NOT NULL,
+    owner TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    bytes_total INTEGER NOT NULL,
+    bytes_read INTEGER NOT NULL DEFAULT 0,
+    rows_total INTEGER,
+    rows_parsed INTEGER NOT NULL DEFAULT 0,
+    rows_scored INTEGER NOT NULL DEFAULT 0,
+    rows_stored INTEGER NOT NULL DEFAULT 0,
+    rows_failed INTEGER NOT NULL DEFAULT 0,
+    duplicates_skipped INTEGER NOT NULL DEFAULT 0,
+    rows_resumed INTEGER NOT NULL DEFAULT 0,
+    rows_rejected INTEGER NOT NULL DEFAULT 0,
+    rejected TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_by_status ON jobs (status, created_at);
+"""
+
+# Job states; a job ends in one of the last three, as its import batch
+JOB_STATUSES = ('queued', 'running', 'completed', 'partial', 'failed')
+
+_PROGRESS_FIELDS = ('bytes_read', 'rows_total', 'rows_parsed', 'rows_scored', 'rows_stored', 'rows_failed',
+                    'duplicates_skipped', 'rows_resumed', 'rows_rejected', 'rejected')
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value, tz=timezone.utc) if value else None
+
+
+class ImportJobQueue:
+    """Import jobs for large file uploads, run by a bounded pool of background workers.
+
+    ``submit`` copies the upload to the spool directory, records a queued
+    job in an SQLite table and returns at once. Each of ``workers`` tasks
+    claims the oldest queued job, streams the spooled file through
+    ``run_import`` (the chunked ingest pipeline) and saves the rows parsed,
+    scored and stored every ``progress_seconds``, which also renews its
+    claim. Several processes can share the table: a job is claimed by one
+    of them in a transaction. Jobs still running at shutdown are queued
+    again; a job whose process died is taken over once its claim is older
+    than ``lease_seconds``, up to ``max_attempts`` runs. A job that runs
+    again reads its file from the beginning but skips the rows its earlier
+    runs stored (import checkpoints, see ``ingest_chunks``) before scoring.
+    """
+
+    def __init__(self, run_import: Callable[[AsyncIterator[Any], str, IngestResult], Awaitable[Any]],
+                 path: str = None, spool_dir: str = None, workers: int = None, poll_seconds: float = None,
+                 progress_seconds: float = None, lease_seconds: float = None, max_attempts: int = None):
+        self.run_import = run_import
+        self.path = path or IMPORT_JOBS_PATH
+        self.spool_dir = spool_dir or IMPORT_JOBS_SPOOL_DIR
+        self.workers = workers if workers is not None else IMPORT_JOBS_WORKERS
+        self.poll_seconds = poll_seconds or IMPORT_JOBS_POLL_SECONDS
+        self.progress_seconds = progress_seconds or IMPORT_JOBS_PROGRESS_SECONDS
+        self.lease_seconds = lease_seconds or IMPORT_JOBS_LEASE_SECONDS
+        self.max_attempts = max_attempts or IMPORT_JOBS_MAX_ATTEMPTS
+        # Claims of this process, told apart from those of other processes
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection shared by the event loop's worker threads
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+        self.running = 0
+
+        # Metrics
+        self.submitted_total = 0
+        self.finished_total = 0
+        self.failed_total = 0
+        self.taken_over_total = 0
+        self.rows_stored_total = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, query: str, params: tuple = ()) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._connect().execute(query, params).fetchall()
+
+    def open(self):
+        """Open the job table and create the spool directory"""
+        os.makedirs(self.spool_dir, exist_ok=True)
+        with self._lock:
+            self._connect()
+
+    def start(self):
+        """Open the job table and start the workers (call from the event loop)"""
+        self.open()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        self._tasks = [loop.create_task(self._work()) for _ in range(self.workers)]
+        queued = self._execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')")[0][0]
+        if queued:
+            print(f"Import jobs: {queued} queued or running jobs in {self.path}")
+
+    async def stop(self):
+        """Stop the workers; jobs they were running are queued again for the next start"""
+        # A cancellation can be lost when it coincides with a wakeup (asyncio.wait_for)
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            if self._conn is not None:
+                # Not counted as an attempt: the job did not fail
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'queued', owner = NULL, attempts = attempts - 1 "
+                    "WHERE status = 'running' AND owner = ?", (self.owner,)
+                )
+                self._conn.close()
+                self._conn = None
+
+    def _spool(self, source, spool_path: str) -> int:
+        source.seek(0)
+        with open(spool_path, 'wb') as spool:
+            shutil.copyfileobj(source, spool, 1024 * 1024)
+            spool.flush()
+            # The job is only recorded once its file is on disk
+            os.fsync(spool.fileno())
+            return spool.tell()
+
+    async def submit(self, file: UploadFile, import_batch_id: str, sheet_name: Optional[str] = None) -> Dict[str, Any]:
+        """Spool an upload and queue its import; returns the job status"""
+        job_id = str(uuid.uuid4())
+        spool_path = os.path.join(self.spool_dir, job_id + os.path.splitext(file.filename)[1].lower())
+        os.makedirs(self.spool_dir, exist_ok=True)
+        size = await asyncio.to_thread(self._spool, file.file, spool_path)
+        await asyncio.to_thread(
+            self._execute,
+            "INSERT INTO jobs (id, filename, sheet_name, spool_path, import_batch_id, status, created_at, bytes_total) "
+            "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+            (job_id, file.filename, sheet_name, spool_path, import_batch_id, time.time(), size),
+        )
+        self.submitted_total += 1
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return await self.get(job_id)
+
+    def _claim(self) -> Optional[sqlite3.Row]:
+        """Take the oldest queued job, or a running one whose process stopped renewing its claim"""
+        now = time.time()
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                job = conn.execute(
+                    "SELECT * FROM jobs WHERE status = 'queued' OR (status = 'running' AND heartbeat_at < ?) "
+                    "ORDER BY created_at LIMIT 1", (now - self.lease_seconds,)
+                ).fetchone()
+                if job is not None and job['attempts'] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', finished_at = ?, error = ? WHERE id = ?",
+                        (now, f"Import interrupted {job['attempts']} times, giving up", job['id']),
+                    )
+                    conn.execute("COMMIT")
+                    self._remove_spool(job['spool_path'])
+                    return None
+                if job is not None:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'running', owner = ?, attempts = attempts + 1, started_at = ?, "
+                        "heartbeat_at = ?, bytes_read = 0, rows_total = NULL, rows_parsed = 0, rows_scored = 0, "
+                        "rows_stored = 0, rows_failed = 0, duplicates_skipped = 0, rows_resumed = 0, rows_rejected = 0, rejected = NULL "
+                        "WHERE id = ?",
+                        (self.owner, now, now, job['id']),
+                    )
+                    if job['status'] == 'running':
+                        self.taken_over_total += 1
+                        print(f"Import jobs: taking over job {job['id']} from stopped process {job['owner']}")
+                conn.execute("COMMIT")
+                return job
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    async def _work(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                job = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                job = None
+                print(f"Warning: could not claim an import job: {str(e)}")
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            self.running += 1
+            try:
+                await self._run(job)
+            finally:
+                self.running -= 1
+
+    def _save(self, job_id: str, progress: Dict[str, Any], status: str = 'running', error: Optional[str] = None):
+        now = time.time()
+        self._execute(
+            f"UPDATE jobs SET {', '.join(f'{field} = ?' for field in _PROGRESS_FIELDS)}, status = ?, error = ?, "
+            "heartbeat_at = ?, finished_at = ? WHERE id = ? AND owner = ?",
+            tuple(progress[field] for field in _PROGRESS_FIELDS)
+            + (status, error, now, None if status == 'running' else now, job_id, self.owner),
+        )
+
+    @staticmethod
+    def _progress(result: IngestResult, tracked: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            **tracked,
+            "rows_parsed": result.rows_read,
+            "rows_scored": result.rows_scored,
+            "rows_stored": result.rows_stored,
+            "rows_failed": result.rows_failed,
+            "duplicates_skipped": result.duplicates_skipped,
+            "rows_resumed": result.rows_resumed,
+            "rows_rejected": result.rows_rejected,
+            # Report of the rejected rows, as JSON
+            "rejected": json.dumps(result.rejected.to_dict()) if result.rows_rejected else None,
+        }
+
+    @staticmethod
+    async def _track(chunks: AsyncIterator[Any], source, result: IngestResult, tracked: Dict[str, Any]):
+        """Pass the chunks through, noting how far into the file the reader is"""
+        async for chunk in chunks:
+            tracked["bytes_read"] = source.tell()
+            yield chunk
+        # Every row has been read: the total is known
+        tracked["bytes_read"], tracked["rows_total"] = tracked["bytes_total"], result.rows_read
+
+    async def _report(self, job_id: str, result: IngestResult, tracked: Dict[str, Any]):
+        while True:
+            await asyncio.sleep(self.progress_seconds)
+            try:
+                await asyncio.to_thread(self._save, job_id, self._progress(result, tracked))
+            except Exception as e:
+                print(f"Warning: could not save progress of import job {job_id}: {str(e)}")
+
+    async def _run(self, job: sqlite3.Row):
+        result = IngestResult()
+        tracked = {"bytes_read": 0, "bytes_total": job['bytes_total'], "rows_total": None}
+        reporter = asyncio.ensure_future(self._report(job['id'], result, tracked))
+        error = None
+        try:
+            with open(job['spool_path'], 'rb') as spool:
+                upload = UploadFile(spool, filename=job['filename'])
+                chunks = FileProcessor.iter_file_chunks(upload, job['sheet_name'])
+                tracked_chunks = self._track(chunks, spool, result, tracked)
+                try:
+                    await self.run_import(tracked_chunks, job['import_batch_id'], result)
+                finally:
+                    # Closes the file readers while the file is still open (the run may have been cancelled)
+                    await tracked_chunks.aclose()
+                    await chunks.aclose()
+            if result.rows_read == 0:
+                status, error = 'failed', "No valid anomaly data found in file"
+            elif result.rows_rejected == result.rows_read:
+                status, error = 'failed', f"No valid anomaly data found in file: {result.rejected.summary()}"
+            else:
+                status = result.status()
+                error = result.errors[0] if result.errors else (result.rejected.summary() or None)
+        except Exception as e:
+            status, error = 'failed', str(e)
+        finally:
+            reporter.cancel()
+        await asyncio.to_thread(self._save, job['id'], self._progress(result, tracked), status, error)
+        self._remove_spool(job['spool_path'])
+        self.finished_total += 1
+        self.failed_total += status == 'failed'
+        self.rows_stored_total += result.rows_stored
+        print(f"Import job {job['id']} ({job['filename']}): {status}, {result.rows_stored} rows stored "
+              f"in {result.elapsed:.1f}s" + (f", {error}" if error else ""))
+
+    @staticmethod
+    def _remove_spool(spool_path: str):
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _status(job: sqlite3.Row) -> Dict[str, Any]:
+        """Job row with throughput and time left, estimated from the rows processed so far"""
+        processed = job['rows_stored'] + job['rows_failed'] + job['duplicates_skipped'] + job['rows_rejected']
+        elapsed = ((job['finished_at'] or time.time()) - job['started_at']) if job['started_at'] else 0.0
+        rows_per_second = processed / elapsed if elapsed > 0 else 0.0
+        # Rows stored by an earlier run are done but not part of this run's throughput
+        processed += job['rows_resumed']
+
+        rows_total, estimated = job['rows_total'], False
+        if rows_total is None and job['bytes_read']:
+            # Rows in the file, extrapolated from the share of it parsed so far
+            rows_total, estimated = round(job['rows_parsed'] * job['bytes_total'] / job['bytes_read']), True
+
+        finished = job['status'] not in ('queued', 'running')
+        if finished:
+            progress, eta = 1.0, 0.0
+        elif rows_total:
+            progress = min(1.0, processed / rows_total)
+            eta = max(0.0, (rows_total - processed) / rows_per_second) if rows_per_second else None
+        else:
+            progress, eta = 0.0, None
+        return {
+            "job_id": job['id'],
+            "status": job['status'],
+            "filename": job['filename'],
+            "import_batch_id": job['import_batch_id'],
+            "created_at": _timestamp(job['created_at']),
+            "started_at": _timestamp(job['started_at']),
+            "finished_at": _timestamp(job['finished_at']),
+            "attempts": job['attempts'],
+            "rows_parsed": job['rows_parsed'],
+            "rows_scored": job['rows_scored'],
+            "rows_stored": job['rows_stored'],
+            "rows_failed": job['rows_failed'],
+            "duplicates_skipped": job['duplicates_skipped'],
+            "rows_resumed": job['rows_resumed'],
+            "rows_rejected": job['rows_rejected'],
+            "rejected_rows": json.loads(job['rejected']) if job['rejected'] else None,
+            "rows_total": rows_total,
+            "rows_total_estimated": estimated,
+            "progress": progress,
+            "elapsed_seconds": elapsed,
+            "rows_per_second": rows_per_second,
+            "eta_seconds": eta,
+            "error": job['error'],
+        }
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Status of a job, None when unknown"""
+        rows = await asyncio.to_thread(self._execute, "SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return self._status(rows[0]) if rows else None
+
+    def metrics(self) -> Dict[str, Any]:
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        try:
+            counts.update({status: count for status, count in self._execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status")})
+        except sqlite3.Error as e:
+            print(f"Warning: could not count import jobs: {str(e)}")
+        return {
+            "path": self.path,
+            "workers": self.workers,
+            "running_here": self.running,
+            "jobs": counts,
+            "submitted_total": self.submitted_total,
+            "finished_total": self.finished_total,
+            "failed_total": self.failed_total,
+            "taken_over_total": self.taken_over_total,
+            "rows_stored_total": self.rows_stored_total,
+        }
@@ -0,0 +1,204 @@
+import asyncio
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from prediction_batch import PredictionBatch
+from prediction_cache import PredictionCache, merge_predictions
+
+EXECUTOR_MODES = ("thread", "process", "inline")
+
+# Predictor owned by a process-pool worker, loaded once by _init_worker
+_worker_predictor = None
+
+
+def _init_worker(model_path: str):
+    """Process-pool initializer: load the model once per worker"""
+    global _worker_predictor
+    from predictor import TAMSPredictor
+    _worker_predictor = TAMSPredictor(model_path)
+
+
+def _worker_ready() -> int:
+    return os.getpid()
+
+
+def _worker_predict_batch(anomalies_data: List[Dict[str, Any]]):
+    return _worker_predictor.predict_batch(anomalies_data)
+
+
+def _worker_predict_frame(df):
+    return _worker_predictor.predict_frame(df)
+
+
+def _worker_predict_single(anomaly_data: Dict[str, Any]):
+    return _worker_predictor.predict_single(anomaly_data)
+
+
+class InferenceExecutor:
+    """Run CPU-bound predictions off the event loop.
+
+    ``thread`` mode shares the in-process predictor with a thread pool,
+    ``process`` mode uses a process pool whose workers each load the model
+    once at startup, and ``inline`` runs on the event loop (the old
+    behaviour, mainly useful for comparison). At most ``max_concurrency``
+    prediction calls are dispatched at the same time; further calls wait.
+    With a ``cache``, records whose content was already scored by the same
+    model version are answered from it and only the distinct misses are
+    dispatched.
+    """
+
+    def __init__(self, predictor, mode: str = None, max_workers: int = None, max_concurrency: int = None,
+                 cache: Optional[PredictionCache] = None):
+        self.predictor = predictor
+        self.cache = cache
+        self.mode = (mode or os.environ.get("INFERENCE_EXECUTOR", "thread")).lower()
+        if self.mode not in EXECUTOR_MODES:
+            raise ValueError(f"INFERENCE_EXECUTOR must be one of {EXECUTOR_MODES}, got '{self.mode}'")
+
+        # At least two workers so a single-record call never queues behind a large import
+        self.max_workers = max_workers or int(os.environ.get("INFERENCE_WORKERS", str(max(2, min(4, os.cpu_count() or 1)))))
+        self.max_concurrency = max_concurrency or int(os.environ.get("INFERENCE_MAX_CONCURRENCY", str(self.max_workers)))
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._executor: Optional[Executor] = None
+
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls_total = 0
+
+    def _new_process_pool(self, model_path: str) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            initializer=_init_worker,
+            initargs=(model_path,),
+        )
+
+    def _warm_pool(self, executor: Executor):
+        """Force every process worker to spawn (and load the model) now"""
+        futures = [executor.submit(_worker_ready) for _ in range(self.max_workers)]
+        for future in futures:
+            future.result()
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.mode == "inline":
+            return None
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = self._new_process_pool(self.predictor.model_path)
+            else:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="inference")
+        return self._executor
+
+    def start(self):
+        """Create the pool up front so process workers load the model at startup"""
+        executor = self._get_executor()
+        if self.mode == "process":
+            self._warm_pool(executor)
+
+    async def swap_predictor(self, predictor):
+        """Route new calls to ``predictor``; calls already dispatched finish on the old one.
+
+        In process mode a new pool is started and warmed up first, then the
+        old pool is retired once its queued calls have completed.
+        """
+        if self.mode != "process" or self._executor is None:
+            self.predictor = predictor
+            return
+
+        new_pool = self._new_process_pool(predictor.model_path)
+        try:
+            await asyncio.to_thread(self._warm_pool, new_pool)
+        except Exception:
+            new_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        old_pool, self._executor = self._executor, new_pool
+        self.predictor = predictor
+        # Running and queued calls still complete; the workers exit afterwards
+        old_pool.shutdown(wait=False)
+
+    async def _dispatch(self, thread_fn, process_fn, payload):
+        self.waiting += 1
+        async with self._semaphore:
+            self.waiting -= 1
+            self.in_flight += 1
+            self.calls_total += 1
+            try:
+                executor = self._get_executor()
+                if executor is None:
+                    return thread_fn(payload)
+                fn = process_fn if self.mode == "process" else thread_fn
+                return await asyncio.get_running_loop().run_in_executor(executor, fn, payload)
+            finally:
+                self.in_flight -= 1
+
+    def _predict_fns(self, data):
+        """Thread and process-worker functions scoring a list of records or a DataFrame"""
+        if isinstance(data, list):
+            return self.predictor.predict_batch, _worker_predict_batch
+        return self.predictor.predict_frame, _worker_predict_frame
+
+    async def _predict_uncached(self, data) -> PredictionBatch:
+        predictions = await self._dispatch(*self._predict_fns(data), data)
+        if not isinstance(predictions, PredictionBatch):
+            predictions = PredictionBatch.from_records(list(predictions))
+        return predictions
+
+    async def _predict(self, data):
+        if self.cache is None or len(data) == 0:
+            return await self._dispatch(*self._predict_fns(data), data)
+
+        model_version = self.predictor.model_version
+        # Hashing a large upload takes a while, so it also stays off the event loop
+        keys, found = await asyncio.to_thread(self.cache.lookup, data, model_version)
+
+        # Rows with the same content are scored once
+        unique_rows: Dict[int, int] = {}
+        miss_rows, miss_sources = [], []
+        for i, (key, scores) in enumerate(zip(keys, found)):
+            if scores is None:
+                miss_rows.append(i)
+                miss_sources.append(unique_rows.setdefault(key, len(unique_rows)))
+        if not miss_rows:
+            return merge_predictions(found, [], None)
+
+        # Unique misses are numbered in order of first appearance
+        unique_positions = []
+        for i, source in zip(miss_rows, miss_sources):
+            if source == len(unique_positions):
+                unique_positions.append(i)
+        if isinstance(data, list):
+            unique_data = [data[i] for i in unique_positions]
+        else:
+            unique_data = data.iloc[unique_positions]
+        predictions = await self._predict_uncached(unique_data)
+        self.cache.store(list(unique_rows), predictions, model_version)
+        return merge_predictions(found, miss_rows, predictions.take(miss_sources))
+
+    async def predict_batch(self, anomalies_data: List[Dict[str, Any]]):
+        """Predict scores for multiple anomalies without blocking the event loop"""
+        return await self._predict(anomalies_data)
+
+    async def predict_frame(self, df) -> PredictionBatch:
+        """Predict scores for every row of a DataFrame without blocking the event loop"""
+        return await self._predict(df)
+
+    async def predict_single(self, anomaly_data: Dict[str, Any]) -> Dict[str, int]:
+        """Predict scores for a single anomaly without blocking the event loop"""
+        if self.cache is None:
+            return await self._dispatch(self.predictor.predict_single, _worker_predict_single, anomaly_data)
+        return (await self.predict_batch([anomaly_data]))[0]
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
+            self._executor = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "mode": self.mode,
+            "max_workers": self.max_workers,
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "calls_total": self.calls_total,
+        }
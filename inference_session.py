@@ -0,0 +1,137 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+# Fields produced by FileProcessor.validate_anomaly_data (and validate_frame), in order
+INPUT_FIELDS = (
+    'num_equipement',
+    'systeme',
+    'description',
+    'date_detection',
+    'description_equipement',
+    'section_proprietaire',
+)
+
+# Input field -> column name used when the model was trained
+TRAINING_COLUMN_NAMES = {
+    'num_equipement': 'Num_equipement',
+    'systeme': 'Systeme',
+    'description': "Description de l'équipement",
+    'section_proprietaire': 'Section propriétaire'
+}
+
+
+class ColumnPlan(NamedTuple):
+    """One step of the feature plan: source field -> transformer -> output slice"""
+    source: str
+    kind: str  # 'label' or 'text'
+    transformer: Any
+    output: slice
+
+
+def _resolve_label_source(col_key: str, fields: Tuple[str, ...]) -> Optional[str]:
+    """Find the input field a label encoder was trained on"""
+    for field_name in fields:
+        if (field_name.lower() == col_key.lower() or
+                field_name == col_key or
+                TRAINING_COLUMN_NAMES.get(field_name, field_name) == col_key):
+            return field_name
+    return None
+
+
+def _resolve_text_source(fields: Tuple[str, ...]) -> Optional[str]:
+    """Find the input field holding the free-text description"""
+    for field_name in fields:
+        if 'description' in field_name.lower() or 'desc' in field_name.lower():
+            return field_name
+    return None
+
+
+@dataclass(frozen=True)
+class InferenceSession:
+    """Immutable inference path compiled once when the model is loaded.
+
+    The feature schema is resolved into a fixed list of ``ColumnPlan`` steps
+    and the output width is known up front, so each call only encodes the
+    planned columns into one CSR feature matrix of that width, each column
+    at its planned offset, and runs the model.
+    """
+    model: Any
+    plan: Tuple[ColumnPlan, ...]
+    n_features: int
+    fallback_features: Optional[Callable[[pd.DataFrame], Any]] = None
+    input_fields: Tuple[str, ...] = field(default=INPUT_FIELDS)
+
+    @classmethod
+    def build(cls, model, label_lookups: Dict[str, Any] = None, vectorizer=None,
+              fallback_features: Callable[[pd.DataFrame], Any] = None,
+              input_fields: Tuple[str, ...] = INPUT_FIELDS) -> "InferenceSession":
+        """Validate the model and resolve the column plan"""
+        if model is None or isinstance(model, dict) or not callable(getattr(model, 'predict', None)):
+            raise ValueError(f"Cannot build an inference session for {type(model).__name__}: no predict method")
+
+        plan: List[ColumnPlan] = []
+        offset = 0
+        # The saved components are only used together, as in training
+        if label_lookups and vectorizer is not None:
+            for col_key, lookup in label_lookups.items():
+                source = _resolve_label_source(col_key, input_fields)
+                plan.append(ColumnPlan(source, 'label', lookup, slice(offset, offset + 1)))
+                offset += 1
+
+            width = len(vectorizer.get_feature_names_out())
+            plan.append(ColumnPlan(_resolve_text_source(input_fields), 'text', vectorizer, slice(offset, offset + width)))
+            offset += width
+
+        return cls(
+            model=model,
+            plan=tuple(plan),
+            n_features=offset,
+            fallback_features=fallback_features,
+            input_fields=tuple(input_fields),
+        )
+
+    @property
+    def uses_saved_components(self) -> bool:
+        return bool(self.plan)
+
+    def transform(self, data: Any) -> Any:
+        """Turn records or a DataFrame into the model feature matrix"""
+        df = data if isinstance(data, pd.DataFrame) else pd.DataFrame(data if isinstance(data, list) else [data])
+
+        if not self.plan:
+            return self.fallback_features(df)
+
+        # The entries of every planned column go straight to their place in
+        # one (n_rows, n_features) CSR matrix, at the offsets of the plan; the
+        # bag-of-words matrix is never densified and no per-column block is built
+        n_rows = len(df)
+        rows, cols, values = [], [], []
+        for step in self.plan:
+            if step.source is None or step.source not in df.columns:
+                # Missing input column: its features stay zero
+                continue
+            if step.kind == 'label':
+                input_values = df[step.source].fillna("unknown").astype(str).to_numpy()
+                encoded = step.transformer.transform(input_values)[0].astype(np.float64)
+                nonzero = np.flatnonzero(encoded)
+                rows.append(nonzero)
+                cols.append(np.full(len(nonzero), step.output.start))
+                values.append(encoded[nonzero])
+            else:
+                descriptions = df[step.source].fillna("unknown").astype(str)
+                counts = sp.coo_matrix(step.transformer.transform(descriptions))
+                rows.append(counts.row)
+                cols.append(counts.col + step.output.start)
+                values.append(counts.data.astype(np.float64))
+        if not rows:
+            return sp.csr_matrix((n_rows, self.n_features), dtype=np.float64)
+        return sp.csr_matrix((np.concatenate(values), (np.concatenate(rows), np.concatenate(cols))),
+                             shape=(n_rows, self.n_features))
+
+    def predict(self, data: Any) -> np.ndarray:
+        """Run the compiled plan and the model on records or a DataFrame"""
+        return np.asarray(self.model.predict(self.transform(data)))
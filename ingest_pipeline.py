@@ -0,0 +1,176 @@
+import asyncio
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from row_validation import RejectedRows
+
+# Rows parsed, scored and inserted together
+INGEST_CHUNK_ROWS = int(os.environ.get("INGEST_CHUNK_ROWS", "5000"))
+# Chunks buffered between two stages; bounds memory together with the chunk size
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", "2"))
+
+# Errors kept on an IngestResult; the counts cover every failure
+MAX_REPORTED_ERRORS = 10
+
+# Marks the end of the stream in the stage queues
+_DONE = object()
+
+
+class IngestResult:
+    """Outcome of one pipeline run"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.rows_scored = 0
+        self.rows_stored = 0
+        self.rows_failed = 0
+        self.duplicates_skipped = 0
+        self.rows_resumed = 0
+        self.rejected = RejectedRows()
+        self.errors: List[str] = []
+        self.chunks = 0
+        self.started = time.perf_counter()
+        self.stage_seconds = {"read": 0.0, "validate": 0.0, "resume": 0.0, "dedup": 0.0, "predict": 0.0, "store": 0.0}
+        self.elapsed = 0.0
+
+    def record_failures(self, rows: int, errors: List[str]):
+        """Count rows the store stage could not insert, keeping the first few errors"""
+        self.rows_failed += rows
+        self.errors.extend(errors[:MAX_REPORTED_ERRORS - len(self.errors)])
+
+    @property
+    def rows_rejected(self) -> int:
+        return self.rejected.rows
+
+    def status(self) -> str:
+        """Import batch status: 'completed', or 'partial'/'failed' when rows were rejected or could not be stored"""
+        if self.rows_failed == 0 and self.rows_rejected == 0:
+            return 'completed'
+        return 'partial' if self.rows_stored or self.rows_resumed else 'failed'
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows_read": self.rows_read,
+            "rows_scored": self.rows_scored,
+            "rows_stored": self.rows_stored,
+            "rows_failed": self.rows_failed,
+            "duplicates_skipped": self.duplicates_skipped,
+            "rows_resumed": self.rows_resumed,
+            "rows_rejected": self.rows_rejected,
+            "rejected": self.rejected.to_dict(),
+            "errors": list(self.errors),
+            "chunks": self.chunks,
+            "elapsed_seconds": self.elapsed,
+            "stage_seconds": dict(self.stage_seconds),
+        }
+
+
+class IngestPipeline:
+    """Read → predict → store, one chunk at a time with the stages overlapped.
+
+    Each stage runs as its own task and hands chunks to the next one through
+    a bounded queue, so while chunk N is being stored, chunk N+1 is scored
+    and chunk N+2 parsed. A full queue makes the upstream stage wait, which
+    keeps at most ``queue_size`` chunks per queue (plus one per stage) in
+    memory whatever the file size. The first error stops every stage and is
+    raised from ``run``; chunks stored before it stay stored. A chunk is a
+    DataFrame or a list of records, passed through as is; DataFrame rows
+    are indexed by their position in the upload. When given,
+    ``dedup_chunk`` drops rows already stored from each chunk before it is
+    scored and returns the chunk with the number of rows dropped;
+    ``resume_chunk`` does the same, before it, for rows an interrupted
+    import of the same upload already stored. ``validate_chunk`` runs
+    first and returns the valid rows with a ``RejectedRows`` report of the
+    others, which are counted on the result instead of failing the import.
+    """
+
+    def __init__(self, predict_batch: Callable[[Any], Awaitable[Any]],
+                 store_chunk: Callable[[Any, Any], Awaitable[int]],
+                 queue_size: int = None,
+                 dedup_chunk: Optional[Callable[[Any], Awaitable[Tuple[Any, int]]]] = None,
+                 resume_chunk: Optional[Callable[[Any], Awaitable[Tuple[Any, int]]]] = None,
+                 validate_chunk: Optional[Callable[[Any], Awaitable[Tuple[Any, RejectedRows]]]] = None):
+        self.predict_batch = predict_batch
+        self.store_chunk = store_chunk
+        self.queue_size = queue_size or INGEST_QUEUE_SIZE
+        self.dedup_chunk = dedup_chunk
+        self.resume_chunk = resume_chunk
+        self.validate_chunk = validate_chunk
+
+    async def _read(self, chunks: AsyncIterator[Any], out: asyncio.Queue, result: IngestResult):
+        started = time.perf_counter()
+        async for records in chunks:
+            if len(records):
+                if isinstance(records, pd.DataFrame):
+                    # Rows keep their position in the upload through the later stages
+                    records.index = pd.RangeIndex(result.rows_read, result.rows_read + len(records))
+                result.rows_read += len(records)
+                result.stage_seconds["read"] += time.perf_counter() - started
+                await out.put(records)
+                started = time.perf_counter()
+        await out.put(_DONE)
+
+    async def _predict(self, inbox: asyncio.Queue, out: asyncio.Queue, result: IngestResult):
+        while (records := await inbox.get()) is not _DONE:
+            if self.validate_chunk is not None:
+                started = time.perf_counter()
+                records, rejected = await self.validate_chunk(records)
+                result.rejected.merge(rejected)
+                result.stage_seconds["validate"] += time.perf_counter() - started
+                if not len(records):
+                    continue
+            if self.resume_chunk is not None:
+                started = time.perf_counter()
+                records, resumed = await self.resume_chunk(records)
+                result.rows_resumed += resumed
+                result.stage_seconds["resume"] += time.perf_counter() - started
+                if not len(records):
+                    continue
+            if self.dedup_chunk is not None:
+                started = time.perf_counter()
+                records, skipped = await self.dedup_chunk(records)
+                result.duplicates_skipped += skipped
+                result.stage_seconds["dedup"] += time.perf_counter() - started
+                if not len(records):
+                    continue
+            started = time.perf_counter()
+            predictions = await self.predict_batch(records)
+            result.rows_scored += len(records)
+            result.stage_seconds["predict"] += time.perf_counter() - started
+            await out.put((records, predictions))
+        await out.put(_DONE)
+
+    async def _store(self, inbox: asyncio.Queue, result: IngestResult):
+        while (item := await inbox.get()) is not _DONE:
+            records, predictions = item
+            started = time.perf_counter()
+            result.rows_stored += await self.store_chunk(records, predictions)
+            result.chunks += 1
+            result.stage_seconds["store"] += time.perf_counter() - started
+
+    async def run(self, chunks: AsyncIterator[Any], result: IngestResult = None) -> IngestResult:
+        """Run every chunk through the stages; pass ``result`` to read the progress after a failure"""
+        result = result if result is not None else IngestResult()
+        to_predict: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        to_store: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        tasks = [
+            asyncio.ensure_future(self._read(chunks, to_predict, result)),
+            asyncio.ensure_future(self._predict(to_predict, to_store, result)),
+            asyncio.ensure_future(self._store(to_store, result)),
+        ]
+        try:
+            # Returns when every stage is done or at the first failure; the
+            # remaining stages are then cancelled below
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+            for task in done:
+                if task.exception() is not None:
+                    raise task.exception()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+        result.elapsed = time.perf_counter() - result.started
+        return result
@@ -1,17 +1,32 @@
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Header, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from typing import List
+from typing import Any, Dict, List, Optional
+import asyncio
 import uuid
 import os
+import secrets
 import warnings
+from pydantic import ValidationError
 
 warnings.filterwarnings('ignore', category=UserWarning)
 
-from models import AnomalyInput, StorageResponse, BatchStorageResponse
+from models import AnomalyInput, StorageResponse, BatchStorageResponse, ImportJobResponse
 from predictor import predictor
 from database import supabase_client
 from file_processor import FileProcessor
+from micro_batcher import MicroBatcher
+from inference_executor import InferenceExecutor
+from prediction_cache import PredictionCache
+from model_reloader import ModelReloader
+from ingest_pipeline import IngestPipeline, IngestResult
+from bulk_writer import BulkWriter
+from dedup_index import DedupIndex, DEDUP_ENABLED
+from write_behind import WriteBehindQueue, WriteBehindFull, WRITE_BEHIND_ENABLED
+from import_jobs import ImportJobQueue
+from import_checkpoints import ImportCheckpoints, ImportBatchUnavailable, IMPORT_CHECKPOINTS_ENABLED
+from ndjson_stream import NDJSONIngest, NDJSONResponse
+from columnar_payload import parse_columnar_batch, JSON_CONTENT_TYPES, MSGPACK_CONTENT_TYPES
 
 app = FastAPI(
     title="TAMS Anomaly Storage API",
@@ -23,7 +38,9 @@ app = FastAPI(
     ### Main Features:
     * **Single Anomaly Storage**: Store individual anomalies with AI predictions
     * **Batch Storage**: Process multiple anomalies at once
-    * **File Upload**: Support for CSV and Excel file processing
+    * **Streaming Storage**: Send newline-delimited JSON and get each record's outcome as soon as it is stored
+    * **File Upload**: Support for CSV, Excel, Parquet and Arrow file processing
+    * **Import Jobs**: Large files are imported in the background, with progress tracking
     * **Database Integration**: Automatic storage in Supabase
     * **AI Scoring**: Predicts Fiabilité Intégrité, Disponibilité, and Process Safety scores
     
@@ -63,6 +80,63 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Records already scored by the current model are answered from an in-process cache
+PREDICTION_CACHE_ENABLED = os.environ.get("PREDICTION_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+prediction_cache = PredictionCache() if PREDICTION_CACHE_ENABLED else None
+
+# Model inference runs in a thread or process pool, never on the event loop
+inference_executor = InferenceExecutor(predictor, cache=prediction_cache)
+
+# Concurrent /store/single requests are scored together in one predict_batch call
+MICRO_BATCH_ENABLED = os.environ.get("MICRO_BATCH_ENABLED", "true").lower() in ("1", "true", "yes")
+micro_batcher = MicroBatcher(inference_executor.predict_batch)
+
+# Inserts are split into size-bounded chunks sent concurrently, each retried on transient errors;
+# rows carry their id, so a retried chunk that was already stored is not stored twice
+bulk_writer = BulkWriter(supabase_client, ignore_duplicates=True)
+
+# Rows of file imports already stored are skipped before prediction
+dedup_index = DedupIndex() if DEDUP_ENABLED else None
+
+# /store/stream reads NDJSON bodies and answers per record, one micro-batch at a time
+ndjson_ingest = NDJSONIngest()
+
+# Stored chunks of file imports are checkpointed; a failed import is resumed with its import_batch_id
+import_checkpoints = ImportCheckpoints() if IMPORT_CHECKPOINTS_ENABLED else None
+
+# /store/single acknowledges once the record is in a durable local queue; a background task stores it
+write_behind = WriteBehindQueue(BulkWriter(supabase_client, ignore_duplicates=True)) if WRITE_BEHIND_ENABLED else None
+
+# New models are loaded, checked and swapped in without a restart
+model_reloader = ModelReloader(inference_executor)
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
+@app.on_event("startup")
+async def startup():
+    inference_executor.start()
+    model_reloader.start()
+    if write_behind:
+        write_behind.start()
+    if dedup_index:
+        await dedup_index.open()
+    if import_checkpoints:
+        await import_checkpoints.open()
+    import_jobs.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    await import_jobs.stop()
+    await model_reloader.stop()
+    await micro_batcher.stop()
+    inference_executor.shutdown()
+    if write_behind:
+        await write_behind.stop()
+    if dedup_index:
+        dedup_index.close()
+    if import_checkpoints:
+        import_checkpoints.close()
+    await supabase_client.close()
+
 # Mount static files
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 if os.path.exists(static_dir):
@@ -77,18 +151,79 @@ async def root():
     """
     return {"message": "TAMS Anomaly Storage API is running", "version": "1.0.0"}
 
+@app.get("/metrics", tags=["Health"])
+async def metrics():
+    """
+    Runtime metrics
+    
+    Returns micro-batching statistics for `/store/single` (batch sizes and queue wait times),
+    the inference executor load, the prediction cache hit/miss counters, model reloads,
+    database client requests, bulk insert chunks/retries, the write-behind queue depth and
+    flush lag, NDJSON streams, the import deduplication index, import checkpoints and the import
+    jobs by status.
+    """
+    return {
+        "micro_batching": {"enabled": MICRO_BATCH_ENABLED, **micro_batcher.metrics()},
+        "inference_executor": inference_executor.metrics(),
+        "prediction_cache": {"enabled": PREDICTION_CACHE_ENABLED,
+                             **(prediction_cache.metrics() if prediction_cache else {})},
+        "model_reload": model_reloader.metrics(),
+        "database": supabase_client.metrics(),
+        "bulk_writer": bulk_writer.metrics(),
+        "write_behind": {"enabled": WRITE_BEHIND_ENABLED, **(write_behind.metrics() if write_behind else {})},
+        "ndjson_stream": ndjson_ingest.metrics(),
+        "dedup": {"enabled": DEDUP_ENABLED, **(dedup_index.metrics() if dedup_index else {})},
+        "import_checkpoints": {"enabled": IMPORT_CHECKPOINTS_ENABLED,
+                               **(import_checkpoints.metrics() if import_checkpoints else {})},
+        "import_jobs": import_jobs.metrics(),
+    }
+
+@app.post("/admin/reload-model", tags=["Admin"])
+async def reload_model(x_admin_token: Optional[str] = Header(None)):
+    """
+    Reload the model without a restart
+    
+    Loads the model from the configured path in the background, warms it up and checks it on a
+    canary batch, then swaps it in. Requests already being scored finish on the previous model.
+    Requires `ADMIN_TOKEN` to be configured and sent in the `X-Admin-Token` header; without it
+    the endpoint is disabled.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled: set ADMIN_TOKEN to enable them")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
+    
+    report = await model_reloader.reload(reason="admin")
+    if report["status"] == "in_progress":
+        raise HTTPException(status_code=409, detail="A model reload is already in progress")
+    if report["status"] == "failed":
+        raise HTTPException(status_code=500, detail=report)
+    return report
+
 @app.post("/store/single", response_model=StorageResponse, tags=["Data Storage"])
 async def store_single_anomaly(anomaly: AnomalyInput):
     try:
         # Validate input data
         anomaly_data = FileProcessor.validate_anomaly_data(anomaly.dict())
         
-        # Make prediction
-        predictions = predictor.predict_single(anomaly_data)
+        # Make prediction (batched with concurrent requests when enabled)
+        if MICRO_BATCH_ENABLED:
+            predictions = await micro_batcher.submit(anomaly_data)
+        else:
+            predictions = await inference_executor.predict_single(anomaly_data)
         
         # Prepare data for database
         db_data = FileProcessor.prepare_for_database(anomaly_data, predictions)
         
+        if write_behind:
+            # Durably queued: stored in the database by the background flusher
+            anomaly_id = await write_behind.enqueue(db_data)
+            return StorageResponse(
+                success=True,
+                message="Anomaly accepted for storage",
+                anomaly_id=anomaly_id
+            )
+        
         # Store in database
         stored_anomaly = await supabase_client.create_anomaly(db_data)
         
@@ -104,9 +239,37 @@ async def store_single_anomaly(anomaly: AnomalyInput):
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except WriteBehindFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def store_batch_frame(validated_frame) -> BatchStorageResponse:
+    """Score and store a validated batch under a new batch ID; raises when nothing could be stored"""
+    # Make predictions
+    predictions = await inference_executor.predict_frame(validated_frame)
+    
+    # Prepare data for database
+    db_data_list = FileProcessor.prepare_for_database_frame(validated_frame, predictions)
+    
+    # Create batch ID
+    batch_id = str(uuid.uuid4())
+    
+    # Store in database, in concurrent chunks
+    written = await bulk_writer.write(db_data_list, batch_id)
+    
+    if written.rows_stored == 0:
+        raise HTTPException(status_code=500, detail=f"Failed to store anomalies in database: {written.errors[0] if written.errors else ''}")
+    
+    # Return simple confirmation
+    return BatchStorageResponse(
+        success=written.rows_failed == 0,
+        message=f"{written.rows_stored} anomalies successfully stored"
+                + (f", {written.rows_failed} failed: {written.errors[0]}" if written.rows_failed else ""),
+        total_stored=written.rows_stored,
+        total_failed=written.rows_failed
+    )
+
 @app.post("/store/batch", response_model=BatchStorageResponse, tags=["Data Storage"])
 async def store_batch_anomalies(anomalies: List[AnomalyInput]):
     """
@@ -132,43 +295,260 @@ async def store_batch_anomalies(anomalies: List[AnomalyInput]):
         if not anomalies:
             raise HTTPException(status_code=400, detail="No anomalies provided")
         
-        # Validate input data
-        validated_data = []
-        for anomaly in anomalies:
-            validated_data.append(FileProcessor.validate_anomaly_data(anomaly.dict()))
-        
-        # Make predictions
-        predictions_list = predictor.predict_batch(validated_data)
-        
-        # Prepare data for database
-        db_data_list = []
-        for anomaly_data, predictions in zip(validated_data, predictions_list):
-            db_data = FileProcessor.prepare_for_database(anomaly_data, predictions)
-            db_data_list.append(db_data)
+        # Validate input data, as one DataFrame from here to the database rows
+        validated_frame = FileProcessor.validate_frame([anomaly.dict() for anomaly in anomalies])
         
-        # Create batch ID
-        batch_id = str(uuid.uuid4())
+        return await store_batch_frame(validated_frame)
         
-        # Store in database
-        stored_anomalies = await supabase_client.create_anomalies_batch(db_data_list, batch_id)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
+
+def record_error(error: Exception) -> str:
+    """One-line reason a streamed record was rejected"""
+    if isinstance(error, ValidationError):
+        return "; ".join(f"{'.'.join(str(loc) for loc in e['loc'])}: {e['msg']}" for e in error.errors())
+    return str(error)
+
+async def store_stream_batch(records: List[Dict[str, Any]], batch_id: str) -> List[Dict[str, Any]]:
+    """Validate, score and store one micro-batch of a stream; returns each record's outcome"""
+    outcomes: List[Dict[str, Any]] = [None] * len(records)
+    valid, positions = [], []
+    for i, record in enumerate(records):
+        try:
+            valid.append(FileProcessor.validate_anomaly_data(AnomalyInput(**record).dict()))
+            positions.append(i)
+        except (ValidationError, ValueError, TypeError) as e:
+            outcomes[i] = {"status": "error", "error": record_error(e)}
+    if not valid:
+        return outcomes
+    
+    validated_frame = FileProcessor.validate_frame(valid)
+    predictions = await inference_executor.predict_frame(validated_frame)
+    
+    # Each row has its id, so each record's outcome can name its row
+    db_data_list = FileProcessor.prepare_for_database_frame(validated_frame, predictions)
+    written = await bulk_writer.write(db_data_list, batch_id)
+    
+    for chunk in written.chunks:
+        for j in range(chunk.start, chunk.start + chunk.rows):
+            if chunk.stored:
+                outcomes[positions[j]] = {"status": "stored", "id": db_data_list[j]['id'], "scores": predictions[j]}
+            else:
+                outcomes[positions[j]] = {"status": "error", "error": f"Failed to store anomaly in database: {chunk.error}"}
+    return outcomes
+
+@app.post("/store/stream", tags=["Data Storage"], response_class=NDJSONResponse, openapi_extra={
+    "requestBody": {"required": True, "content": {"application/x-ndjson": {"schema": {"type": "string"}}}},
+    "responses": {"200": {"content": {"application/x-ndjson": {}}}},
+})
+async def store_stream_anomalies(request: Request):
+    """
+    Store anomalies sent as newline-delimited JSON, streaming back each record's outcome
+    
+    The body is read as it arrives, one anomaly object per line (same fields as single storage).
+    Records are scored and stored in micro-batches, and the outcome of every record is sent back
+    as soon as its batch is stored, so memory stays bounded and the first results arrive while
+    the body is still being uploaded.
+    
+    ### Output (NDJSON, in input order):
+    - `{"line": 1, "status": "stored", "id": "...", "scores": {...}}`
+    - `{"line": 2, "status": "error", "error": "Missing required field: systeme"}`
+    - A last `{"summary": {"records": ..., "stored": ..., "failed": ...}}` line
+    
+    An invalid line only rejects that record. All records are stored with the import batch ID
+    returned in the `X-Import-Batch-Id` header.
+    """
+    batch_id = str(uuid.uuid4())
+    # Not a plain StreamingResponse: its disconnect listener would consume the request body
+    return NDJSONResponse(
+        ndjson_ingest.run(request.stream(), lambda records: store_stream_batch(records, batch_id)),
+        media_type="application/x-ndjson",
+        headers={"X-Import-Batch-Id": batch_id},
+    )
+
+_COLUMNS_SCHEMA = {
+    "type": "object",
+    "required": ["num_equipement", "systeme", "description"],
+    "properties": {
+        field: {"type": "array", "items": {"type": "string", "nullable": field not in ("num_equipement", "systeme", "description")}}
+        for field in ("num_equipement", "systeme", "description", "date_detection", "description_equipement", "section_proprietaire")
+    },
+    "example": {
+        "num_equipement": ["EQ001", "EQ002"],
+        "systeme": ["Hydraulic", "Electrical"],
+        "description": ["Pressure drop detected in main valve", "Breaker trips under load"],
+        "section_proprietaire": ["Maintenance", None],
+    },
+}
+
+@app.post("/store/batch/columnar", response_model=BatchStorageResponse, tags=["Data Storage"], openapi_extra={
+    "requestBody": {"required": True, "content": {
+        "application/json": {"schema": _COLUMNS_SCHEMA},
+        "application/msgpack": {"schema": _COLUMNS_SCHEMA},
+    }},
+})
+async def store_columnar_batch(request: Request):
+    """
+    Store a batch of anomalies sent column by column
+    
+    Same as `/store/batch`, with one array per field instead of one object per anomaly:
+    `{"num_equipement": [...], "systeme": [...], "description": [...], ...}`. Send it as JSON
+    (`application/json`) or MessagePack (`application/msgpack`).
+    
+    ### Features:
+    - No object per anomaly: the columns are type-checked and validated as whole arrays
+      and scored as they are, which keeps large batches (10k+ rows) cheap to parse
+    - Optional columns (`date_detection`, `description_equipement`, `section_proprietaire`)
+      may be left out or hold nulls
+    - The first invalid row fails the request, as in `/store/batch`
+    """
+    content_type = request.headers.get("content-type", "")
+    media_type = content_type.split(";")[0].strip().lower()
+    if media_type and media_type not in JSON_CONTENT_TYPES + MSGPACK_CONTENT_TYPES:
+        raise HTTPException(status_code=415, detail="Send the columns as application/json or application/msgpack")
+    try:
+        body = await request.body()
         
-        if not stored_anomalies:
-            raise HTTPException(status_code=500, detail="Failed to store anomalies in database")
+        # Decoded and validated off the event loop
+        validated_frame = await asyncio.to_thread(parse_columnar_batch, body, content_type)
         
-        # Return simple confirmation
-        return BatchStorageResponse(
-            success=True,
-            message=f"{len(stored_anomalies)} anomalies successfully stored",
-            total_stored=len(stored_anomalies)
-        )
+        return await store_batch_frame(validated_frame)
         
+    except HTTPException:
+        raise
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Internal server error: {str(e)}")
 
+async def store_chunk(anomalies_frame, predictions, batch_id: str, result: IngestResult = None) -> int:
+    """Insert one scored chunk; returns the number of stored rows
+    
+    Rows of insert requests that failed for good are counted on ``result``
+    instead of failing the whole import. Stored rows are added to the
+    deduplication index and checkpointed on the import batch.
+    """
+    db_data_list = FileProcessor.prepare_for_database_frame(anomalies_frame, predictions)
+    written = await bulk_writer.write(db_data_list, batch_id)
+    if written.rows_failed and result is not None:
+        result.record_failures(written.rows_failed, written.errors)
+    if import_checkpoints:
+        await import_checkpoints.commit(batch_id, anomalies_frame, written.stored_mask())
+    if dedup_index:
+        await dedup_index.settle(anomalies_frame, written.stored_mask(), owner=batch_id)
+    return written.rows_stored
+
+async def ingest_chunks(chunks, batch_id: str, result: IngestResult = None):
+    """Run a chunked upload through the ingest pipeline and record the outcome on its import batch
+    
+    Pass ``result`` to follow the progress while it runs. Rows missing a
+    required field are rejected and reported on the result; the others are
+    imported. When an earlier import of the batch was interrupted, the rows
+    it stored are skipped before scoring.
+    """
+    result = result if result is not None else IngestResult()
+    committed = await import_checkpoints.begin(batch_id) if import_checkpoints else None
+    pipeline = IngestPipeline(
+        inference_executor.predict_frame,
+        lambda anomalies_frame, predictions: store_chunk(anomalies_frame, predictions, batch_id, result),
+        dedup_chunk=(lambda anomalies_frame: dedup_index.claim(anomalies_frame, batch_id)) if dedup_index else None,
+        resume_chunk=(lambda anomalies_frame: asyncio.to_thread(committed.skip, anomalies_frame)) if committed else None,
+        validate_chunk=lambda anomalies_frame: asyncio.to_thread(FileProcessor.validate_frame_rows, anomalies_frame),
+    )
+    status = 'failed'
+    try:
+        await pipeline.run(chunks, result)
+        status = result.status()
+    except Exception:
+        # Chunks stored before the failure stay stored, and are skipped when the import is resumed
+        await supabase_client.update_import_batch(batch_id, result.rows_stored + result.rows_resumed, 'failed')
+        raise
+    finally:
+        if dedup_index:
+            # Rows claimed by chunks that were never stored
+            dedup_index.release(batch_id)
+        if import_checkpoints:
+            await import_checkpoints.finish(batch_id, status)
+    await supabase_client.update_import_batch(batch_id, result.rows_stored + result.rows_resumed, status)
+    return result
+
+# Large uploads are spooled to disk and imported by background workers; see /jobs
+import_jobs = ImportJobQueue(ingest_chunks)
+
+# Query parameter of the file import endpoints
+IMPORT_BATCH_ID_DESCRIPTION = ("Batch ID of a failed or interrupted import of the same file, to resume it: "
+                               "the rows it already stored are skipped and the import continues from there")
+
+async def import_batch_for(filename: str, import_batch_id: Optional[str] = None) -> str:
+    """A new import batch for an upload, or the interrupted one given to resume"""
+    if import_batch_id is None:
+        # The total is only known at the end; the batch record is updated then
+        return await supabase_client.create_import_batch(filename, 0, status='processing')
+    if not import_checkpoints:
+        raise HTTPException(status_code=400, detail="Resuming imports requires IMPORT_CHECKPOINTS_ENABLED")
+    status = await import_checkpoints.status(import_batch_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail=f"No interrupted import with batch ID {import_batch_id}")
+    if status == 'completed':
+        raise HTTPException(status_code=409, detail=f"Import batch {import_batch_id} is already completed")
+    return import_batch_id
+
+def ingest_response(result: IngestResult, batch_id: str, source: str) -> BatchStorageResponse:
+    """Confirmation of a file import; raises when rows were read but none could be stored"""
+    if result.rows_rejected and result.rows_rejected == result.rows_read:
+        raise HTTPException(status_code=400, detail=f"No valid anomaly data found in file: {result.rejected.summary()}")
+    if result.rows_stored == 0 and result.rows_resumed == 0 and result.rows_failed:
+        raise HTTPException(status_code=500, detail=f"Failed to store anomalies in database: {result.errors[0]}")
+    
+    message = f"{result.rows_stored} anomalies successfully stored from {source} file"
+    if result.rows_resumed:
+        message += f", {result.rows_resumed} already stored by the interrupted import"
+    if result.duplicates_skipped:
+        message += f", {result.duplicates_skipped} duplicates skipped"
+    if result.rows_failed:
+        message += f", {result.rows_failed} failed: {result.errors[0]}"
+    if result.rows_rejected:
+        message += f", {result.rejected.summary()}"
+    return BatchStorageResponse(
+        success=result.rows_failed == 0 and result.rows_rejected == 0,
+        message=message,
+        total_stored=result.rows_stored,
+        total_failed=result.rows_failed,
+        duplicates_skipped=result.duplicates_skipped,
+        rows_resumed=result.rows_resumed,
+        total_rejected=result.rows_rejected,
+        rejected_rows=result.rejected.to_dict() if result.rows_rejected else None,
+        import_batch_id=batch_id
+    )
+
+async def import_upload(file: UploadFile, chunks, import_batch_id: Optional[str], source: str) -> BatchStorageResponse:
+    """Import the parsed chunks of an uploaded file under a new (or the resumed) batch and confirm it"""
+    try:
+        batch_id = await import_batch_for(file.filename, import_batch_id)
+        
+        # Parse, predict and store chunk by chunk with the stages overlapped
+        result = await ingest_chunks(chunks, batch_id)
+        
+        if result.rows_read == 0:
+            raise HTTPException(status_code=400, detail="No valid anomaly data found in file")
+        
+        # Return simple confirmation
+        return ingest_response(result, batch_id, source)
+        
+    except HTTPException:
+        raise
+    except ImportBatchUnavailable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error processing {source} file: {str(e)}")
+
 @app.post("/store/file/csv", response_model=BatchStorageResponse, tags=["File Upload"])
-async def store_from_csv_file(file: UploadFile = File(...)):
+async def store_from_csv_file(
+    file: UploadFile = File(...),
+    import_batch_id: Optional[str] = Query(None, description=IMPORT_BATCH_ID_DESCRIPTION)
+):
     """
     Process and store anomalies from CSV file
     
@@ -186,54 +566,24 @@ async def store_from_csv_file(file: UploadFile = File(...)):
     
     ### Features:
     - Automatic data validation and cleaning
-    - Batch processing for efficiency
+    - Streamed in chunks: parsing, scoring and storage overlap and memory stays bounded
     - Import tracking with unique batch ID
     - Error handling for malformed data
+    - Rows already imported (same normalized fields) are skipped before scoring
     
     ### Response:
     Simple confirmation with total count and batch ID for tracking.
     """
-    try:
-        if not file.filename.endswith('.csv'):
-            raise HTTPException(status_code=400, detail="File must be a CSV file")
-        
-        # Process file
-        anomalies_data = await FileProcessor.process_csv_file(file)
-        
-        if not anomalies_data:
-            raise HTTPException(status_code=400, detail="No valid anomaly data found in file")
-        
-        # Make predictions
-        predictions_list = predictor.predict_batch(anomalies_data)
-        
-        # Prepare data for database
-        db_data_list = []
-        for anomaly_data, predictions in zip(anomalies_data, predictions_list):
-            db_data = FileProcessor.prepare_for_database(anomaly_data, predictions)
-            db_data_list.append(db_data)
-        
-        # Create batch ID
-        batch_id = await supabase_client.create_import_batch(file.filename, len(anomalies_data))
-        
-        # Store in database
-        stored_anomalies = await supabase_client.create_anomalies_batch(db_data_list, batch_id)
-        
-        if not stored_anomalies:
-            raise HTTPException(status_code=500, detail="Failed to store anomalies in database")
-        
-        # Return simple confirmation
-        return BatchStorageResponse(
-            success=True,
-            message=f"{len(stored_anomalies)} anomalies successfully stored from CSV file",
-            total_stored=len(stored_anomalies),
-            import_batch_id=batch_id
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing CSV file: {str(e)}")
+    if not file.filename.endswith('.csv'):
+        raise HTTPException(status_code=400, detail="File must be a CSV file")
+    return await import_upload(file, FileProcessor.iter_csv_chunks(file), import_batch_id, "CSV")
 
 @app.post("/store/file/excel", response_model=BatchStorageResponse, tags=["File Upload"])
-async def store_from_excel_file(file: UploadFile = File(...)):
+async def store_from_excel_file(
+    file: UploadFile = File(...),
+    sheet_name: Optional[str] = Query(None, description="Worksheet to import (default: \"Oracle\" if present, else the first sheet)"),
+    import_batch_id: Optional[str] = Query(None, description=IMPORT_BATCH_ID_DESCRIPTION)
+):
     """
     Process and store anomalies from Excel file
     
@@ -245,48 +595,108 @@ async def store_from_excel_file(file: UploadFile = File(...)):
     
     ### Features:
     - Supports multiple Excel formats
-    - Automatic data type detection
-    - Sheet processing (uses first sheet)
+    - .xlsx files are streamed row by row in chunks: large workbooks are never fully loaded
+    - Sheet selection with `sheet_name` (defaults to the "Oracle" sheet, else the first sheet)
     - Header row detection
+    - Rows already imported (same normalized fields) are skipped before scoring
+    """
+    if not (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
+        raise HTTPException(status_code=400, detail="File must be an Excel file (.xlsx or .xls)")
+    return await import_upload(file, FileProcessor.iter_excel_chunks(file, sheet_name), import_batch_id, "Excel")
+
+@app.post("/store/file/parquet", response_model=BatchStorageResponse, tags=["File Upload"])
+async def store_from_parquet_file(
+    file: UploadFile = File(...),
+    import_batch_id: Optional[str] = Query(None, description=IMPORT_BATCH_ID_DESCRIPTION)
+):
+    """
+    Process and store anomalies from Parquet file
+    
+    Upload a Parquet file (.parquet) containing multiple anomaly records for processing and storage.
+    Returns only confirmation without prediction results.
+    
+    ### Parquet Format:
+    Same columns as the CSV format; the API field names (`num_equipement`, ...) are accepted too.
+    Other columns are not read.
+    
+    ### Features:
+    - No CSV conversion: column types are kept (identifiers and text are read as strings)
+    - Read one row-group batch at a time, streamed through parsing, scoring and storage
+    - Import tracking with unique batch ID
+    - Rows already imported (same normalized fields) are skipped before scoring
+    """
+    if not file.filename.endswith(('.parquet', '.parq', '.pq')):
+        raise HTTPException(status_code=400, detail="File must be a Parquet file (.parquet)")
+    return await import_upload(file, FileProcessor.iter_parquet_chunks(file), import_batch_id, "Parquet")
+
+@app.post("/store/file/arrow", response_model=BatchStorageResponse, tags=["File Upload"])
+async def store_from_arrow_file(
+    file: UploadFile = File(...),
+    import_batch_id: Optional[str] = Query(None, description=IMPORT_BATCH_ID_DESCRIPTION)
+):
+    """
+    Process and store anomalies from an Arrow IPC stream
+    
+    Upload an Arrow IPC stream (.arrows) or IPC file / Feather v2 (.arrow, .feather) containing
+    multiple anomaly records for processing and storage. Returns only confirmation without prediction results.
+    
+    ### Arrow Format:
+    Same columns as the CSV format; the API field names (`num_equipement`, ...) are accepted too.
+    Other columns are not read.
+    
+    ### Features:
+    - No CSV conversion: column types are kept (identifiers and text are read as strings)
+    - Record batches are streamed through parsing, scoring and storage
+    - Import tracking with unique batch ID
+    - Rows already imported (same normalized fields) are skipped before scoring
+    """
+    if not file.filename.endswith(('.arrows', '.arrow', '.ipc', '.feather')):
+        raise HTTPException(status_code=400, detail="File must be an Arrow IPC file (.arrows, .arrow or .feather)")
+    return await import_upload(file, FileProcessor.iter_arrow_chunks(file), import_batch_id, "Arrow")
+
+@app.post("/jobs/file", response_model=ImportJobResponse, status_code=202, tags=["Import Jobs"])
+async def submit_import_job(
+    file: UploadFile = File(...),
+    sheet_name: Optional[str] = Query(None, description="Worksheet of an Excel file (default: \"Oracle\" if present, else the first sheet)"),
+    import_batch_id: Optional[str] = Query(None, description=IMPORT_BATCH_ID_DESCRIPTION)
+):
     """
+    Import a large file in the background
+    
+    Upload a CSV, Excel, Parquet or Arrow file. It is saved to disk and a job ID is returned
+    right away; background workers then parse, score and store it in chunks as the
+    `/store/file/*` endpoints do. Follow the job with `GET /jobs/{job_id}`.
+    
+    ### Features:
+    - No request timeout, however large the file: the response does not wait for the import
+    - Jobs survive restarts: queued and interrupted jobs are resumed by the next start
+    - A bounded number of jobs run at a time (`IMPORT_JOBS_WORKERS` per API process)
+    - Rows already imported (same normalized fields) are skipped before scoring
+    """
+    if not FileProcessor.file_format(file.filename):
+        raise HTTPException(status_code=400, detail="File must be a CSV, Excel, Parquet or Arrow file")
     try:
-        if not (file.filename.endswith('.xlsx') or file.filename.endswith('.xls')):
-            raise HTTPException(status_code=400, detail="File must be an Excel file (.xlsx or .xls)")
-        
-        # Process file
-        anomalies_data = await FileProcessor.process_excel_file(file)
-        
-        if not anomalies_data:
-            raise HTTPException(status_code=400, detail="No valid anomaly data found in file")
-        
-        # Make predictions
-        predictions_list = predictor.predict_batch(anomalies_data)
-        
-        # Prepare data for database
-        db_data_list = []
-        for anomaly_data, predictions in zip(anomalies_data, predictions_list):
-            db_data = FileProcessor.prepare_for_database(anomaly_data, predictions)
-            db_data_list.append(db_data)
-        
-        # Create batch ID
-        batch_id = await supabase_client.create_import_batch(file.filename, len(anomalies_data))
-        
-        # Store in database
-        stored_anomalies = await supabase_client.create_anomalies_batch(db_data_list, batch_id)
-        
-        if not stored_anomalies:
-            raise HTTPException(status_code=500, detail="Failed to store anomalies in database")
-        
-        # Return simple confirmation
-        return BatchStorageResponse(
-            success=True,
-            message=f"{len(stored_anomalies)} anomalies successfully stored from Excel file",
-            total_stored=len(stored_anomalies),
-            import_batch_id=batch_id
-        )
-        
+        batch_id = await import_batch_for(file.filename, import_batch_id)
+        job = await import_jobs.submit(file, batch_id, sheet_name)
+        return ImportJobResponse(**job)
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing Excel file: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error queuing import job: {str(e)}")
+
+@app.get("/jobs/{job_id}", response_model=ImportJobResponse, tags=["Import Jobs"])
+async def get_import_job(job_id: str):
+    """
+    Progress of an import job
+    
+    Returns the job status (`queued`, `running`, then `completed`, `partial` or `failed`) with the
+    rows parsed, scored and stored so far, the throughput and the estimated time left. While the
+    file is still being parsed, its total row count is estimated from the share of the file read.
+    """
+    job = await import_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Import job {job_id} not found")
+    return ImportJobResponse(**job)
 
 if __name__ == "__main__":
     try:
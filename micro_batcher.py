@@ -0,0 +1,149 @@
+import asyncio
+import inspect
+import os
+import time
+from collections import deque
+from typing import Any, Callable, Dict, List, Optional
+
+# Upper bounds of the batch size histogram buckets
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class MicroBatcher:
+    """Collect concurrent single-record predictions into one predict_batch call.
+
+    Requests wait in a queue for at most ``window_ms`` after the first one of
+    a batch arrives, or until ``max_batch_size`` records are queued. The batch
+    is scored with a single call and each waiting request gets its own row.
+    """
+
+    def __init__(self, predict_batch: Callable[[List[Dict[str, Any]]], Any],
+                 max_batch_size: int = None, window_ms: float = None):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max_batch_size or int(os.environ.get("MICRO_BATCH_MAX_SIZE", "64"))
+        window_ms = window_ms if window_ms is not None else float(os.environ.get("MICRO_BATCH_WINDOW_MS", "5"))
+        self.window = window_ms / 1000.0
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        # Records taken from the queue by the worker and not answered yet
+        self._batch: list = []
+
+        # Metrics
+        self.batches_total = 0
+        self.records_total = 0
+        self.max_batch_seen = 0
+        self.batch_size_histogram = {bucket: 0 for bucket in BATCH_SIZE_BUCKETS}
+        self.batch_size_histogram['+Inf'] = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self._recent_waits = deque(maxlen=1024)
+
+    def _ensure_started(self):
+        if self._queue is None:
+            # Created once: records queued when a worker stops are served by the next one
+            self._queue = asyncio.Queue()
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def submit(self, anomaly_data: Dict[str, Any]) -> Dict[str, int]:
+        """Queue one record and wait for its prediction"""
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((anomaly_data, future, time.perf_counter()))
+        return await future
+
+    async def stop(self):
+        """Stop the background worker; requests still waiting for a prediction are cancelled"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        # The batch being scored and the queued records would otherwise never be answered
+        waiting, self._batch = self._batch, []
+        while self._queue is not None and not self._queue.empty():
+            waiting.append(self._queue.get_nowait())
+        for _, future, _ in waiting:
+            future.cancel()
+
+    async def _collect(self) -> list:
+        """Wait for the first record, then fill the batch until the window closes"""
+        self._batch = batch = [await self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                # Still take whatever is already queued
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+            started = time.perf_counter()
+            self._record_batch(len(batch), [started - enqueued for _, _, enqueued in batch])
+
+            try:
+                results = self.predict_batch([record for record, _, _ in batch])
+                if inspect.isawaitable(results):
+                    results = await results
+                if len(results) != len(batch):
+                    # Never leave a request waiting for a row that does not exist
+                    raise RuntimeError(f"predict_batch returned {len(results)} predictions for {len(batch)} records")
+                for (_, future, _), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self._batch = []
+
+    def _record_batch(self, size: int, waits: List[float]):
+        self.batches_total += 1
+        self.records_total += size
+        self.max_batch_seen = max(self.max_batch_seen, size)
+        for bucket in BATCH_SIZE_BUCKETS:
+            if size <= bucket:
+                self.batch_size_histogram[bucket] += 1
+                break
+        else:
+            self.batch_size_histogram['+Inf'] += 1
+        self.queue_wait_total += sum(waits)
+        self.queue_wait_max = max(self.queue_wait_max, max(waits))
+        self._recent_waits.extend(waits)
+
+    def metrics(self) -> Dict[str, Any]:
+        """Batch size and queue wait statistics"""
+        waits = sorted(self._recent_waits)
+
+        def recent_percentile(pct: float) -> float:
+            if not waits:
+                return 0.0
+            return waits[min(len(waits) - 1, int(len(waits) * pct / 100))] * 1000
+
+        return {
+            "window_ms": self.window * 1000,
+            "max_batch_size": self.max_batch_size,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "batches_total": self.batches_total,
+            "records_total": self.records_total,
+            "avg_batch_size": self.records_total / self.batches_total if self.batches_total else 0.0,
+            "max_batch_size_seen": self.max_batch_seen,
+            "batch_size_histogram": {str(k): v for k, v in self.batch_size_histogram.items()},
+            "queue_wait_avg_ms": self.queue_wait_total / self.records_total * 1000 if self.records_total else 0.0,
+            "queue_wait_max_ms": self.queue_wait_max * 1000,
+            "queue_wait_p50_ms": recent_percentile(50),
+            "queue_wait_p99_ms": recent_percentile(99),
+        }
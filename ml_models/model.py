@@ -1,5 +1,6 @@
 import pandas as pd
 import numpy as np
+import scipy.sparse as sp
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import LabelEncoder
 from sklearn.feature_extraction.text import CountVectorizer
@@ -19,12 +20,13 @@ for col in ["Num_equipement", "Systeme"]:
     label_encoders[col] = le
 
 vectorizer = CountVectorizer(max_features=100)
-text_features = vectorizer.fit_transform(df["Description"]).toarray()
+text_features = vectorizer.fit_transform(df["Description"])
 
-X = np.concatenate([
-    df[["Num_equipement", "Systeme"]].values,
-    text_features
-], axis=1)
+# Same sparse layout as TAMSPredictor: encoded columns, then bag-of-words
+X = sp.hstack([
+    sp.csr_matrix(df[["Num_equipement", "Systeme"]].values.astype(np.float64)),
+    text_features.astype(np.float64)
+], format="csr")
 
 y = df[["Fiabilité Intégrité", "Disponibilté", "Process Safety", "Criticité"]]
 
@@ -38,4 +40,11 @@ mse_scores = mean_squared_error(y_test, y_pred, multioutput='raw_values')
 for i, col in enumerate(y.columns):
     print(f"{col} MSE: {mse_scores[i]:.4f}")
 
-joblib.dump(model, "multi_output_model.pkl")
+# Save the encoders and vectorizer with the model so serving builds the same features
+joblib.dump({
+    "model": model,
+    "label_encoders": label_encoders,
+    "vectorizer": vectorizer,
+    "target_columns": list(y.columns),
+    "categorical_columns": ["Num_equipement", "Systeme"],
+}, "multi_output_model.pkl")
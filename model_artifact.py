@@ -0,0 +1,184 @@
+"""Memory-mappable model artifact.
+
+An artifact is a directory holding a ``manifest.json`` and one raw ``.npy``
+file per array: the flattened tree ensemble, the label encoder lookup
+tables and the vectorizer vocabulary. Loading it with ``mmap_mode='r'``
+maps the files instead of unpickling objects, so every worker process
+shares the same page-cache copy of the model and startup does no parsing.
+
+Convert a pickled model bundle with:
+
+    python model_artifact.py ml_models/multi_output_model.pkl [artifact_dir]
+"""
+import datetime
+import json
+import os
+import shutil
+import sys
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from encoders import LabelLookup, VocabularyLookup
+from tree_ensemble import TreeEnsembleEvaluator, TreeEnsembleScorer, export_ensemble
+
+ARTIFACT_FORMAT = "tams-model-artifact"
+ARTIFACT_VERSION = 1
+MANIFEST_NAME = "manifest.json"
+
+
+def default_artifact_path(model_path: str) -> str:
+    """Artifact directory next to a pickled bundle: model.pkl -> model.artifact"""
+    return os.path.splitext(model_path)[0] + ".artifact"
+
+
+def is_artifact(path: Optional[str]) -> bool:
+    return bool(path) and os.path.isfile(os.path.join(path, MANIFEST_NAME))
+
+
+def _save_array(directory: str, name: str, array: np.ndarray) -> Dict[str, Any]:
+    array = np.ascontiguousarray(array)
+    if array.dtype.hasobject:
+        raise ValueError(f"Array '{name}' has dtype object and cannot be memory-mapped")
+    filename = f"{name}.npy"
+    np.save(os.path.join(directory, filename), array, allow_pickle=False)
+    return {"file": filename, "dtype": array.dtype.str, "shape": list(array.shape)}
+
+
+def _load_array(directory: str, entry: Dict[str, Any], mmap_mode: Optional[str]) -> np.ndarray:
+    array = np.load(os.path.join(directory, entry["file"]), mmap_mode=mmap_mode, allow_pickle=False)
+    if array.dtype.str != entry["dtype"] or list(array.shape) != entry["shape"]:
+        raise ValueError(f"{entry['file']} does not match the manifest: "
+                         f"{array.dtype.str}{list(array.shape)} != {entry['dtype']}{entry['shape']}")
+    return array
+
+
+def save_artifact(bundle: Dict[str, Any], directory: str, source: str = None, probe_rows: int = 64) -> Dict[str, Any]:
+    """Write a model bundle (as saved by ml_models/model.py) as an artifact directory.
+
+    The exported ensemble is checked against the model on a random probe
+    batch first. Files are written to a temporary directory which replaces
+    ``directory`` once complete. Returns the manifest.
+    """
+    model = bundle.get('model')
+    arrays = export_ensemble(model)
+    if arrays is None:
+        raise ValueError(f"Unsupported model type for artifact export: {type(model).__name__}")
+    evaluator = TreeEnsembleEvaluator(arrays)
+    n_features = getattr(model, "n_features_in_", None)
+    if n_features:
+        probe = np.random.default_rng(0).integers(0, 50, size=(probe_rows, n_features)).astype(np.float64)
+        if not evaluator.matches(model, probe):
+            raise ValueError("Exported ensemble predictions differ from the model")
+    arrays = dict(arrays, children=evaluator.children, is_leaf=evaluator.is_leaf)
+
+    tmp_dir = directory.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    manifest = {
+        "format": ARTIFACT_FORMAT,
+        "version": ARTIFACT_VERSION,
+        "created_at": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "source": source,
+        "model_type": type(model).__name__,
+        "n_features": int(n_features) if n_features else None,
+        "target_columns": list(bundle.get('target_columns', [])),
+        "categorical_columns": list(bundle.get('categorical_columns', [])),
+        "ensemble": {name: _save_array(tmp_dir, f"ensemble.{name}", array) for name, array in arrays.items()},
+        "label_encoders": {},
+        "vectorizer": None,
+    }
+
+    for i, (col_key, encoder) in enumerate(bundle.get('label_encoders', {}).items()):
+        lookup = LabelLookup.from_encoder(encoder)
+        manifest["label_encoders"][col_key] = {
+            "sorted_keys": _save_array(tmp_dir, f"encoder.{i}.sorted_keys", lookup.sorted_keys),
+            "codes": _save_array(tmp_dir, f"encoder.{i}.codes", lookup.codes),
+        }
+
+    vectorizer = bundle.get('vectorizer')
+    if vectorizer is not None:
+        vocabulary = VocabularyLookup.from_vectorizer(vectorizer)
+        manifest["vectorizer"] = {
+            "params": vocabulary.params,
+            "binary": vocabulary.binary,
+            "dtype": vocabulary.dtype.str,
+            "sorted_terms": _save_array(tmp_dir, "vectorizer.sorted_terms", vocabulary.sorted_terms),
+            "indices": _save_array(tmp_dir, "vectorizer.indices", vocabulary.indices),
+        }
+
+    # The manifest is written last: a directory without one is never loaded
+    with open(os.path.join(tmp_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_dir, directory)
+    return manifest
+
+
+class ModelArtifact:
+    """A loaded artifact: the evaluator and the feature components, all backed by mapped arrays"""
+
+    def __init__(self, path: str, mmap_mode: Optional[str] = "r"):
+        with open(os.path.join(path, MANIFEST_NAME), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("format") != ARTIFACT_FORMAT:
+            raise ValueError(f"{path} is not a model artifact")
+        if manifest.get("version") != ARTIFACT_VERSION:
+            raise ValueError(f"Unsupported artifact version {manifest.get('version')} (expected {ARTIFACT_VERSION})")
+
+        self.path = path
+        self.manifest = manifest
+        self.target_columns: List[str] = manifest.get("target_columns", [])
+        self.categorical_columns: List[str] = manifest.get("categorical_columns", [])
+
+        arrays = {name: _load_array(path, entry, mmap_mode) for name, entry in manifest["ensemble"].items()}
+        self.evaluator = TreeEnsembleEvaluator(arrays)
+
+        self.label_lookups = {
+            col_key: LabelLookup.from_arrays(_load_array(path, entry["sorted_keys"], mmap_mode),
+                                             _load_array(path, entry["codes"], mmap_mode))
+            for col_key, entry in manifest["label_encoders"].items()
+        }
+
+        self.vectorizer = None
+        if manifest.get("vectorizer"):
+            entry = manifest["vectorizer"]
+            self.vectorizer = VocabularyLookup(
+                _load_array(path, entry["sorted_terms"], mmap_mode),
+                _load_array(path, entry["indices"], mmap_mode),
+                entry["params"],
+                binary=entry["binary"],
+                dtype=entry["dtype"],
+            )
+
+    def scorer(self) -> TreeEnsembleScorer:
+        """A scorer running every batch through the evaluator (there is no pickled model)"""
+        return TreeEnsembleScorer(self.evaluator)
+
+
+def load_artifact(path: str, mmap_mode: Optional[str] = "r") -> ModelArtifact:
+    return ModelArtifact(path, mmap_mode=mmap_mode)
+
+
+def convert(model_path: str, artifact_path: str = None) -> str:
+    """Convert a pickled model bundle into an artifact directory"""
+    import joblib
+
+    artifact_path = artifact_path or default_artifact_path(model_path)
+    bundle = joblib.load(model_path)
+    if not isinstance(bundle, dict):
+        bundle = {'model': bundle}
+    manifest = save_artifact(bundle, artifact_path, source=os.path.basename(model_path))
+    n_trees = manifest["ensemble"]["roots"]["shape"][0]
+    n_nodes = manifest["ensemble"]["feature"]["shape"][0]
+    print(f"Artifact written to {artifact_path}: {n_trees} trees, {n_nodes} nodes, "
+          f"encoders={len(manifest['label_encoders'])}, vectorizer={manifest['vectorizer'] is not None}")
+    return artifact_path
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print("Usage: python model_artifact.py <model.pkl> [artifact_dir]")
+        sys.exit(2)
+    convert(*sys.argv[1:])
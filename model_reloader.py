@@ -0,0 +1,177 @@
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Scored by every candidate model before it is swapped in
+CANARY_RECORDS = [
+    {'num_equipement': 'EQ001', 'systeme': 'Hydraulic', 'description': 'Pressure drop detected in main valve'},
+    {'num_equipement': 'EQ002', 'systeme': 'Electrical', 'description': 'Motor overheat and burning smell'},
+    {'num_equipement': 'EQ003', 'systeme': 'Mechanical', 'description': 'Slight vibration during routine check'},
+    {'num_equipement': 'EQ004', 'systeme': 'Pneumatic', 'description': 'Air leak on actuator fitting'},
+    {'num_equipement': 'EQ005', 'systeme': 'Instrumentation', 'description': 'Transmitter calibration drift'},
+]
+
+SCORE_FIELDS = ('ai_fiabilite_integrite_score', 'ai_disponibilite_score', 'ai_process_safety_score')
+
+
+def _load_predictor(model_path: str):
+    from predictor import TAMSPredictor
+    return TAMSPredictor(model_path)
+
+
+class ModelReloader:
+    """Reload the model without a restart.
+
+    A candidate predictor is loaded in a worker thread, warmed up and checked
+    on ``canary_records``; only if it passes is it swapped into the
+    ``InferenceExecutor``. Calls already dispatched finish on the old model.
+    With ``watch_seconds`` > 0 the model, artifact manifest and rules files
+    are polled and a reload starts once a change has been stable for one
+    polling interval.
+    """
+
+    def __init__(self, executor, load_predictor: Callable[[str], Any] = None,
+                 canary_records: List[Dict[str, Any]] = None, watch_seconds: float = None):
+        self.executor = executor
+        self.load_predictor = load_predictor or _load_predictor
+        self.canary_records = canary_records or CANARY_RECORDS
+        self.watch_seconds = watch_seconds if watch_seconds is not None else float(
+            os.environ.get("MODEL_RELOAD_WATCH_SECONDS", "0"))
+
+        self._lock = asyncio.Lock()
+        self._watcher: Optional[asyncio.Task] = None
+
+        # Metrics
+        self.reloads_total = 0
+        self.reload_failures = 0
+        self.last_reload: Optional[Dict[str, Any]] = None
+
+    @property
+    def in_progress(self) -> bool:
+        return self._lock.locked()
+
+    def _watched_paths(self) -> List[str]:
+        predictor = self.executor.predictor
+        paths = [predictor.model_path]
+        if getattr(predictor, 'artifact_path', None):
+            paths.append(os.path.join(predictor.artifact_path, "manifest.json"))
+        paths.append(os.environ.get("TAMS_RULES_PATH") or predictor.rule_engine.path)
+        return [path for path in paths if path]
+
+    def files_version(self) -> Tuple:
+        """Size and mtime of every watched file (None when missing)"""
+        version = []
+        for path in self._watched_paths():
+            try:
+                stat = os.stat(path)
+                version.append((path, stat.st_size, stat.st_mtime_ns))
+            except OSError:
+                version.append((path, None))
+        return tuple(version)
+
+    def check_canary(self, candidate) -> Dict[str, Any]:
+        """Warm up ``candidate`` on the canary batch and validate its predictions.
+
+        Runs in a worker thread. Agreement with the serving model is reported
+        but does not fail the check: a retrained model is expected to differ.
+        """
+        current = self.executor.predictor
+        if current.model_loaded and not candidate.model_loaded:
+            return {"passed": False, "reason": "the new model could not be loaded (rule-based fallback only)"}
+
+        started = time.perf_counter()
+        predictions = list(candidate.predict_batch(self.canary_records))
+        candidate.predict_single(self.canary_records[0])
+        warmup_ms = (time.perf_counter() - started) * 1000
+
+        if len(predictions) != len(self.canary_records):
+            return {"passed": False, "reason": f"expected {len(self.canary_records)} predictions, got {len(predictions)}"}
+        for row in predictions:
+            scores = [row[field] for field in SCORE_FIELDS]
+            if not all(1 <= score <= 5 for score in scores) or row['ai_criticality_level'] != sum(scores):
+                return {"passed": False, "reason": f"invalid canary prediction {row}"}
+
+        baseline = list(current.predict_batch(self.canary_records))
+        agreement = sum(new == old for new, old in zip(predictions, baseline)) / len(predictions)
+        return {"passed": True, "warmup_ms": warmup_ms, "canary_agreement": agreement}
+
+    async def reload(self, reason: str = "admin") -> Dict[str, Any]:
+        """Load, check and swap in the model from the configured path.
+
+        Returns a report whose ``status`` is ``reloaded``, ``unchanged``,
+        ``failed`` or ``in_progress`` (another reload is running).
+        """
+        if self._lock.locked():
+            return {"status": "in_progress"}
+
+        async with self._lock:
+            started = time.perf_counter()
+            previous_version = self.executor.predictor.model_version
+            report: Dict[str, Any] = {"reason": reason, "previous_version": previous_version}
+            try:
+                candidate = await asyncio.to_thread(self.load_predictor, self.executor.predictor.model_path)
+                report["model_version"] = candidate.model_version
+                if candidate.model_version == previous_version:
+                    report["status"] = "unchanged"
+                else:
+                    canary = await asyncio.to_thread(self.check_canary, candidate)
+                    passed = canary.pop("passed")
+                    report.update(canary)
+                    if passed:
+                        await self.executor.swap_predictor(candidate)
+                        report["status"] = "reloaded"
+                        self.reloads_total += 1
+                    else:
+                        report["status"] = "failed"
+                        self.reload_failures += 1
+            except Exception as e:
+                print(f"Model reload error: {e}")
+                report.update(status="failed", reason=f"{type(e).__name__}: {e}")
+                self.reload_failures += 1
+
+            report["duration_ms"] = (time.perf_counter() - started) * 1000
+            report["finished_at"] = time.time()
+            self.last_reload = report
+            print(f"Model reload ({reason}): {report['status']}")
+            return report
+
+    async def _watch(self):
+        seen = self.files_version()
+        pending = None
+        while True:
+            await asyncio.sleep(self.watch_seconds)
+            current = self.files_version()
+            if current == seen:
+                pending = None
+            elif current == pending:
+                # Unchanged for a whole interval: the new file is completely written
+                seen = current
+                pending = None
+                await self.reload(reason="file change")
+            else:
+                pending = current
+
+    def start(self):
+        """Start the file watcher when ``watch_seconds`` > 0"""
+        if self.watch_seconds > 0 and (self._watcher is None or self._watcher.done()):
+            self._watcher = asyncio.get_running_loop().create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            try:
+                await self._watcher
+            except asyncio.CancelledError:
+                pass
+            self._watcher = None
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "model_version": self.executor.predictor.model_version,
+            "watch_seconds": self.watch_seconds,
+            "in_progress": self.in_progress,
+            "reloads_total": self.reloads_total,
+            "reload_failures": self.reload_failures,
+            "last_reload": self.last_reload,
+        }
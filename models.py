@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class AnomalyInput(BaseModel):
@@ -38,11 +38,27 @@ class StorageResponse(BaseModel):
             }
         }
 
+class RejectedRowSample(BaseModel):
+    """One rejected row of an upload"""
+    row: int = Field(..., description="Position of the row in the upload, from 1 (header excluded)")
+    errors: List[str] = Field(..., description="Why the row was rejected, e.g. missing_description")
+
+class RejectedRowsReport(BaseModel):
+    """Rows of an upload rejected by validation"""
+    rows: int = Field(..., description="Number of rejected rows")
+    by_error: Dict[str, int] = Field(default_factory=dict, description="Rejected rows per error")
+    samples: List[RejectedRowSample] = Field(default_factory=list, description="First rejected rows (up to MAX_REJECTED_SAMPLES)")
+
 class BatchStorageResponse(BaseModel):
     """Simple response model for batch storage operations"""
     success: bool = Field(True, description="Indicates if the operation was successful")
     message: str = Field(..., description="Success or error message")
     total_stored: int = Field(..., description="Number of anomalies successfully stored")
+    total_failed: int = Field(0, description="Number of anomalies that could not be stored")
+    duplicates_skipped: int = Field(0, description="Number of rows skipped because they were already imported")
+    rows_resumed: int = Field(0, description="Number of rows skipped because the interrupted import being resumed stored them")
+    total_rejected: int = Field(0, description="Number of rows rejected because a required field is missing")
+    rejected_rows: Optional[RejectedRowsReport] = Field(None, description="Counts and first rows of the rejected rows")
     import_batch_id: Optional[str] = Field(None, description="Batch ID for file uploads")
     
     class Config:
@@ -55,6 +71,55 @@ class BatchStorageResponse(BaseModel):
             }
         }
 
+class ImportJobResponse(BaseModel):
+    """Status and progress of a background import job"""
+    job_id: str = Field(..., description="Import job ID")
+    status: str = Field(..., description="queued, running, completed, partial or failed")
+    filename: str = Field(..., description="Name of the uploaded file")
+    import_batch_id: Optional[str] = Field(None, description="Batch ID the imported anomalies are stored with")
+    created_at: datetime = Field(..., description="When the file was uploaded")
+    started_at: Optional[datetime] = Field(None, description="When the current run of the job started")
+    finished_at: Optional[datetime] = Field(None, description="When the job finished")
+    attempts: int = Field(0, description="Runs of the job so far (more than one after a restart)")
+    rows_parsed: int = Field(0, description="Rows read from the file")
+    rows_scored: int = Field(0, description="Rows scored by the model")
+    rows_stored: int = Field(0, description="Rows stored in the database")
+    rows_failed: int = Field(0, description="Rows that could not be stored")
+    duplicates_skipped: int = Field(0, description="Rows skipped because they were already imported")
+    rows_resumed: int = Field(0, description="Rows skipped because an earlier run of the job stored them")
+    rows_rejected: int = Field(0, description="Rows rejected because a required field is missing")
+    rejected_rows: Optional[RejectedRowsReport] = Field(None, description="Counts and first rows of the rejected rows")
+    rows_total: Optional[int] = Field(None, description="Rows in the file, estimated until it is fully parsed")
+    rows_total_estimated: bool = Field(False, description="Whether rows_total is an estimate")
+    progress: float = Field(0.0, description="Share of the rows processed, from 0 to 1")
+    elapsed_seconds: float = Field(0.0, description="Time spent running the job")
+    rows_per_second: float = Field(0.0, description="Rows processed (stored, failed, rejected or skipped) per second by the current run")
+    eta_seconds: Optional[float] = Field(None, description="Estimated time left, unknown before the first chunk is stored")
+    error: Optional[str] = Field(None, description="First error of a failed or partial import")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "job_id": "0b8f1c9e-2f4a-4f6e-9a77-5d1f3f0c2a11",
+                "status": "running",
+                "filename": "anomalies_2025.csv",
+                "import_batch_id": "123e4567-e89b-12d3-a456-426614174000",
+                "created_at": "2025-01-15T10:30:00Z",
+                "started_at": "2025-01-15T10:30:01Z",
+                "attempts": 1,
+                "rows_parsed": 120000,
+                "rows_scored": 115000,
+                "rows_stored": 110000,
+                "duplicates_skipped": 0,
+                "rows_total": 500000,
+                "rows_total_estimated": True,
+                "progress": 0.22,
+                "elapsed_seconds": 41.5,
+                "rows_per_second": 2650.6,
+                "eta_seconds": 147.1
+            }
+        }
+
 class AnomalyPrediction(BaseModel):
     num_equipement: str
     systeme: str
@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+# Records scored and stored together, and the longest wait for a batch to fill
+STREAM_BATCH_ROWS = int(os.environ.get("STREAM_BATCH_ROWS", "256"))
+STREAM_WINDOW_MS = float(os.environ.get("STREAM_WINDOW_MS", "10"))
+# Batches read ahead of the one being processed; bounds memory together with the batch size
+STREAM_QUEUE_BATCHES = int(os.environ.get("STREAM_QUEUE_BATCHES", "4"))
+# Longest accepted line; longer records are rejected without being buffered
+STREAM_MAX_LINE_BYTES = int(os.environ.get("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+
+# Marks the end of the body in the record queue
+_DONE = object()
+
+
+def encode_line(value: Dict[str, Any]) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8") + b"\n"
+
+
+class NDJSONIngest:
+    """Process a newline-delimited JSON body in micro-batches, streaming one result line per record.
+
+    A reader task splits the body into lines as it arrives and decodes
+    each one; at most ``queue_batches`` batches of records wait while a
+    batch is processed, so memory is bounded whatever the body size. A
+    batch closes at ``batch_rows`` records or ``window_ms`` after its first
+    record, so the first results go out while the body is still being
+    sent. ``process_batch`` gets the decoded records of a batch and returns
+    one outcome dict per record (``status`` "stored" or "error"); the
+    outcomes are sent back in input order with the record's line number,
+    then a final ``summary`` line. Lines that are not JSON objects get an
+    error outcome without reaching ``process_batch``.
+    """
+
+    def __init__(self, batch_rows: int = None, window_ms: float = None, queue_batches: int = None,
+                 max_line_bytes: int = None):
+        self.batch_rows = batch_rows or STREAM_BATCH_ROWS
+        window_ms = window_ms if window_ms is not None else STREAM_WINDOW_MS
+        self.window = window_ms / 1000.0
+        self.queue_batches = queue_batches or STREAM_QUEUE_BATCHES
+        self.max_line_bytes = max_line_bytes or STREAM_MAX_LINE_BYTES
+
+        # Metrics
+        self.streams_total = 0
+        self.streams_active = 0
+        self.records_total = 0
+        self.records_stored = 0
+        self.records_rejected = 0
+        self.batches_total = 0
+        self.first_result_ms_max = 0.0
+
+    def _decode(self, line_no: int, line: bytes) -> Tuple[int, Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            return line_no, None, f"Invalid JSON: {str(e)}"
+        if not isinstance(record, dict):
+            return line_no, None, "Each line must be a JSON object"
+        return line_no, record, None
+
+    async def _read(self, body: AsyncIterator[bytes], out: asyncio.Queue):
+        buffer = bytearray()
+        line_no = 0
+        oversized = False
+        async for data in body:
+            start = 0
+            while (end := data.find(b"\n", start)) != -1:
+                line_no += 1
+                if oversized or len(buffer) + end - start > self.max_line_bytes:
+                    await out.put((line_no, None, f"Line longer than {self.max_line_bytes} bytes"))
+                else:
+                    buffer += data[start:end]
+                    if buffer.strip():
+                        await out.put(self._decode(line_no, bytes(buffer)))
+                buffer.clear()
+                oversized = False
+                start = end + 1
+            if not oversized:
+                buffer += data[start:]
+                if len(buffer) > self.max_line_bytes:
+                    # The rest of the line is dropped as it arrives
+                    buffer.clear()
+                    oversized = True
+        if oversized:
+            await out.put((line_no + 1, None, f"Line longer than {self.max_line_bytes} bytes"))
+        elif buffer.strip():
+            # Last line without a trailing newline
+            await out.put(self._decode(line_no + 1, bytes(buffer)))
+        await out.put(_DONE)
+
+    async def _collect(self, inbox: asyncio.Queue) -> Tuple[list, bool]:
+        """Wait for the first record, then fill the batch until it is full or the window closes"""
+        first = await inbox.get()
+        if first is _DONE:
+            return [], True
+        batch = [first]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.batch_rows:
+            remaining = deadline - time.perf_counter()
+            try:
+                item = inbox.get_nowait() if remaining <= 0 else await asyncio.wait_for(inbox.get(), timeout=remaining)
+            except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _process(self, batch: list, process_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        records = [record for _, record, _ in batch if record is not None]
+        try:
+            outcomes = iter(await process_batch(records) if records else [])
+        except Exception as e:
+            # The whole batch failed (e.g. the model): every record gets the error
+            outcomes = iter([{"status": "error", "error": str(e)}] * len(records))
+        return [{"line": line_no, **(next(outcomes) if record is not None else {"status": "error", "error": error})}
+                for line_no, record, error in batch]
+
+    async def run(self, body: AsyncIterator[bytes],
+                  process_batch: Callable[[List[Dict[str, Any]]], Awaitable[List[Dict[str, Any]]]]) -> AsyncIterator[bytes]:
+        """Result lines for the records of ``body``, one chunk per batch, then the summary line"""
+        started = time.perf_counter()
+        counts = {"records": 0, "stored": 0, "failed": 0}
+        first_result = None
+        inbox: asyncio.Queue = asyncio.Queue(maxsize=self.batch_rows * self.queue_batches)
+        reader = asyncio.ensure_future(self._read(body, inbox))
+        self.streams_total += 1
+        self.streams_active += 1
+        try:
+            done = False
+            while not done:
+                # A failed read (body not readable, client gone) ends the stream
+                batch_task = asyncio.ensure_future(self._collect(inbox))
+                await asyncio.wait([batch_task, reader], return_when=asyncio.FIRST_COMPLETED)
+                if not batch_task.done():
+                    if reader.exception() is not None:
+                        batch_task.cancel()
+                        raise reader.exception()
+                    await batch_task
+                batch, done = batch_task.result()
+                if not batch:
+                    continue
+                results = await self._process(batch, process_batch)
+                stored = sum(result["status"] == "stored" for result in results)
+                counts["records"] += len(results)
+                counts["stored"] += stored
+                counts["failed"] += len(results) - stored
+                self.batches_total += 1
+                self.records_total += len(results)
+                self.records_stored += stored
+                self.records_rejected += len(results) - stored
+                if first_result is None:
+                    first_result = time.perf_counter() - started
+                    self.first_result_ms_max = max(self.first_result_ms_max, first_result * 1000)
+                yield b"".join(encode_line(result) for result in results)
+            await reader
+        finally:
+            reader.cancel()
+            self.streams_active -= 1
+        yield encode_line({"summary": {**counts, "elapsed_seconds": time.perf_counter() - started,
+                                       "first_result_seconds": first_result}})
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "batch_rows": self.batch_rows,
+            "window_ms": self.window * 1000,
+            "streams_total": self.streams_total,
+            "streams_active": self.streams_active,
+            "records_total": self.records_total,
+            "records_stored": self.records_stored,
+            "records_rejected": self.records_rejected,
+            "batches_total": self.batches_total,
+            "avg_batch_size": self.records_total / self.batches_total if self.batches_total else 0.0,
+            "first_result_ms_max": self.first_result_ms_max,
+        }
+
+
+class NDJSONResponse(StreamingResponse):
+    """Streaming response whose body iterator reads the request body.
+
+    ``StreamingResponse`` listens for a client disconnect while streaming,
+    which calls ``receive`` alongside the body iterator and takes the body
+    messages from it: the stream would see no records or hang. This
+    response only sends, and leaves ``receive`` to the body read, which
+    ends the stream (``ClientDisconnect``) when the client goes away.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
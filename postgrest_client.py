@@ -0,0 +1,206 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+# Connections kept open to PostgREST and reused between requests
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+# Idle pooled connections are closed after this many seconds
+DB_KEEPALIVE_SECONDS = float(os.environ.get("DB_KEEPALIVE_SECONDS", "30"))
+# Read/write/pool timeout of one request, and connect timeout
+DB_TIMEOUT_SECONDS = float(os.environ.get("DB_TIMEOUT_SECONDS", "30"))
+DB_CONNECT_TIMEOUT_SECONDS = float(os.environ.get("DB_CONNECT_TIMEOUT_SECONDS", "5"))
+
+
+class PostgrestError(Exception):
+    """Error response from PostgREST; the message holds the response body (code, message, details)"""
+
+    def __init__(self, status_code: int, body: str):
+        self.status_code = status_code
+        self.body = body
+        super().__init__(f"HTTP {status_code}: {body}")
+
+
+class AsyncPostgrestClient:
+    """Non-blocking storage client for the Supabase REST (PostgREST) API.
+
+    Drop-in replacement for ``SupabaseClient``: same methods, results and
+    error handling, but requests are awaited on an ``httpx.AsyncClient``
+    instead of blocking the event loop, and go through a pool of
+    ``pool_size`` keep-alive connections, so concurrent inserts neither
+    queue behind each other nor pay a new TCP/TLS handshake each time.
+    """
+
+    def __init__(self, url: str = None, service_role_key: str = None, pool_size: int = None,
+                 timeout: float = None, connect_timeout: float = None, keepalive_seconds: float = None):
+        url = url or os.environ.get("SUPABASE_URL")
+        # Use service role key to bypass RLS authentication rules
+        service_role_key = service_role_key or os.environ.get("SUPABASE_ROLE_KEY")
+
+        if not url or not service_role_key:
+            raise ValueError("SUPABASE_URL and SUPABASE_ROLE_KEY must be set in environment variables")
+
+        self.base_url = f"{url.rstrip('/')}/rest/v1"
+        self.headers = {
+            "apikey": service_role_key,
+            "Authorization": f"Bearer {service_role_key}",
+        }
+        self.pool_size = pool_size or DB_POOL_SIZE
+        self.limits = httpx.Limits(
+            max_connections=self.pool_size,
+            max_keepalive_connections=self.pool_size,
+            keepalive_expiry=keepalive_seconds if keepalive_seconds is not None else DB_KEEPALIVE_SECONDS,
+        )
+        self.timeout = httpx.Timeout(
+            timeout if timeout is not None else DB_TIMEOUT_SECONDS,
+            connect=connect_timeout if connect_timeout is not None else DB_CONNECT_TIMEOUT_SECONDS,
+        )
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        # Metrics
+        self.requests_total = 0
+        self.errors_total = 0
+        self.in_flight = 0
+        print(f"Using async PostgREST client (pool of {self.pool_size} keep-alive connections)")
+
+    def _discard_client(self):
+        """Drop the client of another event loop, closing its pool on that loop when it still runs"""
+        client, loop = self._client, self._loop
+        self._client, self._loop = None, None
+        if loop is not None and loop.is_running() and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(client.aclose(), loop)
+        # A stopped loop cannot run the close: its connections are released with the client
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        if self._client is not None and self._loop is not loop:
+            # Pooled connections belong to the event loop that opened them
+            self._discard_client()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers=self.headers,
+                limits=self.limits,
+                timeout=self.timeout,
+            )
+            self._loop = loop
+        return self._client
+
+    async def _request(self, method: str, table: str, json: Any = None,
+                       params: Dict[str, str] = None, returning: str = "representation",
+                       resolution: str = None) -> List[Dict[str, Any]]:
+        """Send one PostgREST request and return the rows of the response"""
+        prefer = f"return={returning}" + (f",resolution={resolution}" if resolution else "")
+        self.requests_total += 1
+        self.in_flight += 1
+        try:
+            response = await self._get_client().request(
+                method, f"/{table}", json=json, params=params, headers={"Prefer": prefer}
+            )
+        except httpx.HTTPError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        if response.status_code >= 400:
+            self.errors_total += 1
+            raise PostgrestError(response.status_code, response.text)
+        return response.json() if response.content else []
+
+    async def create_anomaly(self, anomaly_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Create a single anomaly record in the database"""
+        try:
+            data = await self._request("POST", "anomalies", json=anomaly_data)
+            return data[0] if data else None
+        except Exception as e:
+            raise Exception(f"Error creating anomaly: {str(e)}")
+
+    async def create_anomalies_batch(self, anomalies_data: List[Dict[str, Any]], batch_id: str) -> List[Dict[str, Any]]:
+        """Create multiple anomaly records in a batch"""
+        try:
+            # Add batch_id to each anomaly
+            for anomaly in anomalies_data:
+                anomaly['import_batch_id'] = batch_id
+
+            return await self._request("POST", "anomalies", json=anomalies_data)
+        except Exception as e:
+            # If foreign key constraint fails, try without import_batch_id
+            if "foreign key constraint" in str(e) and "import_batch_id" in str(e):
+                print("Warning: import_batch_id foreign key constraint failed, retrying without batch_id")
+                try:
+                    anomalies_without_batch = []
+                    for anomaly in anomalies_data:
+                        anomaly_copy = anomaly.copy()
+                        anomaly_copy.pop('import_batch_id', None)
+                        anomalies_without_batch.append(anomaly_copy)
+
+                    return await self._request("POST", "anomalies", json=anomalies_without_batch)
+                except Exception as retry_error:
+                    raise Exception(f"Error creating anomalies batch (retry failed): {str(retry_error)}")
+            else:
+                raise Exception(f"Error creating anomalies batch: {str(e)}")
+
+    async def insert_rows(self, table: str, rows: List[Dict[str, Any]], ignore_duplicates: bool = False) -> None:
+        """Insert rows without returning them; errors are raised as is (used by BulkWriter)
+
+        With ``ignore_duplicates``, rows whose primary key already exists are skipped.
+        """
+        await self._request("POST", table, json=rows, returning="minimal",
+                            resolution="ignore-duplicates" if ignore_duplicates else None)
+
+    async def create_import_batch(self, filename: str, total_records: int, status: str = 'completed') -> str:
+        """Create an import batch record and return its ID"""
+        try:
+            batch_data = {
+                'id': str(uuid.uuid4()),
+                'filename': filename,
+                'total_records': total_records,
+                'status': status,
+                'created_at': datetime.utcnow().isoformat()
+            }
+
+            data = await self._request("POST", "import_batches", json=batch_data)
+            if data:
+                return data[0]['id']
+            # The anomalies table might not have the foreign key constraint
+            return batch_data['id']
+
+        except Exception as e:
+            # The import_batches table is optional
+            print(f"Warning: Could not create import batch record: {str(e)}")
+            return str(uuid.uuid4())
+
+    async def update_import_batch(self, batch_id: str, total_records: int, status: str) -> None:
+        """Update the record count and status of an import batch (e.g. at the end of a streamed import)"""
+        try:
+            await self._request(
+                "PATCH", "import_batches",
+                json={'total_records': total_records, 'status': status},
+                params={'id': f'eq.{batch_id}'},
+                returning="minimal",
+            )
+        except Exception as e:
+            print(f"Warning: Could not update import batch record: {str(e)}")
+
+    async def close(self):
+        """Close the pooled connections"""
+        if self._client is None:
+            return
+        if self._loop is asyncio.get_running_loop():
+            client, self._client, self._loop = self._client, None, None
+            await client.aclose()
+        else:
+            self._discard_client()
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "client": "async",
+            "pool_size": self.pool_size,
+            "in_flight": self.in_flight,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+        }
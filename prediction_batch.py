@@ -0,0 +1,73 @@
+from typing import Any, Dict, Iterator, List, Sequence
+
+import numpy as np
+
+SCORE_COLUMNS = (
+    "ai_fiabilite_integrite_score",
+    "ai_disponibilite_score",
+    "ai_process_safety_score",
+    "ai_criticality_level",
+)
+
+
+class PredictionBatch(Sequence):
+    """Columnar prediction results.
+
+    Holds one int array per score column. It behaves like the list of
+    prediction dicts ``predict_batch`` used to return (``len``, indexing,
+    iteration, ``zip``), but each dict is only built when a row is accessed.
+    Bulk consumers such as ``FileProcessor.prepare_for_database_frame`` read
+    the columns directly.
+    """
+
+    def __init__(self, columns: Dict[str, Any]):
+        self.columns = {name: np.asarray(columns[name], dtype=np.int64) for name in SCORE_COLUMNS}
+
+    @classmethod
+    def from_raw(cls, raw: Any) -> "PredictionBatch":
+        """Round and clip raw model outputs (rows x [fiabilite, disponibilite, process_safety, ...])
+
+        Criticality is always the sum of the three clipped scores, even when
+        the model predicts it as a fourth output.
+        """
+        raw = np.asarray(raw, dtype=np.float64)
+        # np.rint rounds half to even, like the built-in round()
+        scores = np.clip(np.rint(raw[:, :3]), 1, 5).astype(np.int64)
+        return cls({
+            "ai_fiabilite_integrite_score": scores[:, 0],
+            "ai_disponibilite_score": scores[:, 1],
+            "ai_process_safety_score": scores[:, 2],
+            "ai_criticality_level": scores.sum(axis=1),
+        })
+
+    @classmethod
+    def from_records(cls, records: List[Dict[str, int]]) -> "PredictionBatch":
+        return cls({name: [record[name] for record in records] for name in SCORE_COLUMNS})
+
+    @classmethod
+    def concat(cls, batches: Sequence["PredictionBatch"]) -> "PredictionBatch":
+        return cls({name: np.concatenate([batch.columns[name] for batch in batches]) if batches else []
+                    for name in SCORE_COLUMNS})
+
+    def __len__(self) -> int:
+        return len(self.columns[SCORE_COLUMNS[0]])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return PredictionBatch({name: values[index] for name, values in self.columns.items()})
+        return {name: int(values[index]) for name, values in self.columns.items()}
+
+    def __iter__(self) -> Iterator[Dict[str, int]]:
+        columns = [self.columns[name].tolist() for name in SCORE_COLUMNS]
+        for row in zip(*columns):
+            yield dict(zip(SCORE_COLUMNS, row))
+
+    def take(self, indices: Any) -> "PredictionBatch":
+        """Rows at ``indices`` as a new batch"""
+        return PredictionBatch({name: values[indices] for name, values in self.columns.items()})
+
+    def to_records(self) -> List[Dict[str, int]]:
+        return list(self)
+
+    def __repr__(self) -> str:
+        return f"PredictionBatch({len(self)} rows)"
@@ -0,0 +1,141 @@
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from content_hash import content_hashes
+from prediction_batch import SCORE_COLUMNS, PredictionBatch
+
+# Bookkeeping of one OrderedDict entry (hash table slot + linked-list node), on top of key and value
+_ENTRY_OVERHEAD_BYTES = 104
+
+
+class PredictionCache:
+    """In-process LRU + TTL cache of predictions keyed on record content.
+
+    Keys are the 128-bit content hash of the normalized ``num_equipement``,
+    ``systeme`` and ``description`` (see ``content_hash``). Entries belong
+    to one model version: when a lookup comes with a different version the
+    whole cache is dropped. Least recently used entries are evicted once the
+    estimated size exceeds ``max_bytes``; entries older than ``ttl_seconds``
+    count as misses. Safe to use from several threads.
+    """
+
+    def __init__(self, max_bytes: int = None, ttl_seconds: float = None):
+        self.max_bytes = max_bytes if max_bytes is not None else int(
+            float(os.environ.get("PREDICTION_CACHE_MAX_MB", "64")) * 2**20)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.environ.get("PREDICTION_CACHE_TTL_SECONDS", "3600"))
+        self.model_version: Optional[str] = None
+        self._entries: "OrderedDict[int, Tuple[float, Tuple[int, ...]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _entry_bytes(key: int, entry: Tuple[float, Tuple[int, ...]]) -> int:
+        expires_at, scores = entry
+        return (_ENTRY_OVERHEAD_BYTES + sys.getsizeof(key) + sys.getsizeof(entry)
+                + sys.getsizeof(expires_at) + sys.getsizeof(scores))
+
+    def _check_version(self, model_version: str):
+        if model_version != self.model_version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.bytes = 0
+            self.model_version = model_version
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def lookup(self, records: Any, model_version: str) -> Tuple[List[int], List[Optional[Tuple[int, ...]]]]:
+        """Content keys and cached scores (None on a miss) for every record of a list or DataFrame"""
+        keys = content_hashes(records)
+        now = time.monotonic()
+        found: List[Optional[Tuple[int, ...]]] = []
+        with self._lock:
+            self._check_version(model_version)
+            entries = self._entries
+            for key in keys:
+                entry = entries.get(key)
+                if entry is not None and entry[0] < now:
+                    del entries[key]
+                    self.bytes -= self._entry_bytes(key, entry)
+                    self.expirations += 1
+                    entry = None
+                if entry is None:
+                    found.append(None)
+                else:
+                    entries.move_to_end(key)
+                    found.append(entry[1])
+            n_hits = sum(scores is not None for scores in found)
+            self.hits += n_hits
+            self.misses += len(keys) - n_hits
+        return keys, found
+
+    def store(self, keys: List[int], batch: PredictionBatch, model_version: str):
+        """Cache the rows of ``batch`` under ``keys`` and evict down to ``max_bytes``"""
+        columns = [batch.columns[name].tolist() for name in SCORE_COLUMNS]
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            # A model swap while the batch was being scored: the results belong to the old model
+            if model_version != self.model_version:
+                return
+            entries = self._entries
+            for key, scores in zip(keys, zip(*columns)):
+                previous = entries.pop(key, None)
+                if previous is not None:
+                    self.bytes -= self._entry_bytes(key, previous)
+                entry = (expires_at, scores)
+                entries[key] = entry
+                self.bytes += self._entry_bytes(key, entry)
+            while self.bytes > self.max_bytes and entries:
+                old_key, old_entry = entries.popitem(last=False)
+                self.bytes -= self._entry_bytes(old_key, old_entry)
+                self.evictions += 1
+
+    def metrics(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "model_version": self.model_version,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def merge_predictions(found: List[Optional[Tuple[int, ...]]], miss_rows: List[int],
+                      miss_batch: PredictionBatch) -> PredictionBatch:
+    """Combine cached scores and freshly predicted rows, in input order.
+
+    ``miss_batch`` holds the predictions for ``miss_rows``, row for row.
+    """
+    columns = {name: np.empty(len(found), dtype=np.int64) for name in SCORE_COLUMNS}
+    hit_rows = [i for i, scores in enumerate(found) if scores is not None]
+    if hit_rows:
+        hit_scores = np.array([found[i] for i in hit_rows], dtype=np.int64)
+        for j, name in enumerate(SCORE_COLUMNS):
+            columns[name][hit_rows] = hit_scores[:, j]
+    if miss_rows:
+        for name in SCORE_COLUMNS:
+            columns[name][miss_rows] = miss_batch.columns[name]
+    return PredictionBatch(columns)
@@ -0,0 +1,79 @@
+import os
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Fields every anomaly must have, with the error code bit of each
+REQUIRED_FIELDS = ('num_equipement', 'systeme', 'description')
+ERROR_BITS = {field: 1 << i for i, field in enumerate(REQUIRED_FIELDS)}
+
+# Rejected rows listed in a report; the counts cover every rejected row
+MAX_REJECTED_SAMPLES = int(os.environ.get("MAX_REJECTED_SAMPLES", "20"))
+
+
+def row_error_codes(df: pd.DataFrame) -> np.ndarray:
+    """Error code of every row: one bit per required field that is missing or empty (0: valid)"""
+    codes = np.zeros(len(df), dtype=np.uint8)
+    for field, bit in ERROR_BITS.items():
+        if field not in df.columns:
+            codes |= bit
+            continue
+        values = df[field]
+        # Missing or falsy values, as `not data[field]` in the per-row check
+        missing = values.isna().to_numpy() | ~values.astype(bool).to_numpy()
+        codes[missing] |= bit
+    return codes
+
+
+def error_names(code: int) -> List[str]:
+    """Readable errors of one error code, in field order"""
+    return [f"missing_{field}" for field, bit in ERROR_BITS.items() if code & bit]
+
+
+def first_missing_field(code: int) -> str:
+    return next(field for field, bit in ERROR_BITS.items() if code & bit)
+
+
+class RejectedRows:
+    """Compact report of the rows a validation stage rejected.
+
+    Counts rows per error over every chunk and keeps the upload position
+    and errors of the first ``MAX_REJECTED_SAMPLES`` rejected rows.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.by_error: Dict[str, int] = {f"missing_{field}": 0 for field in REQUIRED_FIELDS}
+        self.samples: List[Dict[str, Any]] = []
+
+    def add(self, codes: np.ndarray, positions: np.ndarray):
+        """Count the rows with a non-zero code; ``positions`` are their 0-based positions in the upload"""
+        rejected = np.flatnonzero(codes)
+        if not len(rejected):
+            return
+        self.rows += len(rejected)
+        for field, bit in ERROR_BITS.items():
+            self.by_error[f"missing_{field}"] += int(np.count_nonzero(codes[rejected] & bit))
+        for i in rejected[:MAX_REJECTED_SAMPLES - len(self.samples)]:
+            self.samples.append({"row": int(positions[i]) + 1, "errors": error_names(int(codes[i]))})
+
+    def merge(self, other: "RejectedRows"):
+        self.rows += other.rows
+        for name, count in other.by_error.items():
+            self.by_error[name] += count
+        self.samples.extend(other.samples[:MAX_REJECTED_SAMPLES - len(self.samples)])
+
+    def summary(self) -> str:
+        """One line for messages: the count and the first rejected row"""
+        if not self.rows:
+            return ""
+        first = self.samples[0]
+        return f"{self.rows} rows rejected (first: row {first['row']}, {', '.join(first['errors'])})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "by_error": {name: count for name, count in self.by_error.items() if count},
+            "samples": list(self.samples),
+        }
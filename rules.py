@@ -0,0 +1,154 @@
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+    import pandas as pd
+    VECTORIZED_RULES_AVAILABLE = True
+except ImportError:
+    VECTORIZED_RULES_AVAILABLE = False
+
+# pyarrow's RE2 kernels match a whole column in C++; pandas is the fallback
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+SCORE_FIELDS = ("ai_fiabilite_integrite_score", "ai_disponibilite_score", "ai_process_safety_score")
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), "ml_models", "fallback_rules.json")
+
+# Used when the rules file is missing or invalid; same content as the shipped file
+DEFAULT_RULES = {
+    "default_scores": {field: 3 for field in SCORE_FIELDS},
+    "keyword_rules": [
+        {"name": "critical", "keywords": ["failure", "broken", "leak", "fire", "explosion", "pressure", "overheat"],
+         "scores": {"ai_fiabilite_integrite_score": 4, "ai_disponibilite_score": 4, "ai_process_safety_score": 5}},
+        {"name": "medium", "keywords": ["wear", "drift", "irregularities", "drop", "issue"],
+         "scores": {"ai_fiabilite_integrite_score": 3, "ai_disponibilite_score": 3, "ai_process_safety_score": 3}},
+        {"name": "low", "keywords": ["calibration", "maintenance", "check"],
+         "scores": {"ai_fiabilite_integrite_score": 2, "ai_disponibilite_score": 2, "ai_process_safety_score": 2}},
+    ],
+    "system_rules": [
+        {"name": "electrical", "keywords": ["electrical"], "adjust": {"ai_process_safety_score": 1}},
+        {"name": "fluid", "keywords": ["hydraulic", "pneumatic"], "adjust": {"ai_disponibilite_score": 1}},
+    ],
+}
+
+
+def _escape_literal(keyword: str) -> str:
+    """Escape regex metacharacters in a way both Python re and RE2 accept"""
+    return re.sub(r"([\\.^$|?*+()\[\]{}-])", r"\\\1", keyword)
+
+
+def _compile_keywords(keywords: List[str]) -> re.Pattern:
+    """One alternation per rule; longest keywords first, matched as substrings"""
+    alternatives = sorted({keyword.lower() for keyword in keywords}, key=len, reverse=True)
+    # An empty keyword list compiles to a pattern that never matches
+    return re.compile("|".join(_escape_literal(keyword) for keyword in alternatives) or "[^\\s\\S]")
+
+
+class RuleEngine:
+    """Keyword rules for scoring anomalies when no model is available.
+
+    Keyword rules are tried in order against the description and the first
+    match sets the scores; system rules are then tried in order against the
+    system name and the first match adjusts them. Each rule's keyword list is
+    compiled into a single regex once, and ``predict_frame`` scores a whole
+    DataFrame with vectorized string matching and ``np.select``.
+    """
+
+    def __init__(self, rules: Dict[str, Any], path: Optional[str] = None):
+        self.path = path
+        self.default_scores = {field: int(rules["default_scores"][field]) for field in SCORE_FIELDS}
+        self.keyword_rules = [
+            (rule.get("name", f"rule_{i}"), _compile_keywords(rule["keywords"]),
+             {field: int(rule["scores"].get(field, self.default_scores[field])) for field in SCORE_FIELDS})
+            for i, rule in enumerate(rules.get("keyword_rules", []))
+        ]
+        self.system_rules = [
+            (rule.get("name", f"system_rule_{i}"), _compile_keywords(rule["keywords"]),
+             {field: int(rule.get("adjust", {}).get(field, 0)) for field in SCORE_FIELDS})
+            for i, rule in enumerate(rules.get("system_rules", []))
+        ]
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "RuleEngine":
+        """Load rules from TAMS_RULES_PATH (or the shipped file), falling back to the built-in rules"""
+        path = path or os.environ.get("TAMS_RULES_PATH") or DEFAULT_RULES_PATH
+        try:
+            with open(path, encoding="utf-8") as f:
+                engine = cls(json.load(f), path=path)
+            print(f"Fallback rules loaded from {path}")
+            return engine
+        except Exception as e:
+            print(f"Warning: Could not load fallback rules from {path}: {e}")
+            print("Using built-in fallback rules")
+            return cls(DEFAULT_RULES)
+
+    @staticmethod
+    def _with_criticality(scores: Dict[str, int]) -> Dict[str, int]:
+        scores["ai_criticality_level"] = sum(scores[field] for field in SCORE_FIELDS)
+        return scores
+
+    def predict_row(self, anomaly_data: Dict[str, Any]) -> Dict[str, int]:
+        """Score a single anomaly"""
+        description = str(anomaly_data.get('description', '')).lower()
+        system = str(anomaly_data.get('systeme', '')).lower()
+
+        scores = dict(self.default_scores)
+        for _, pattern, rule_scores in self.keyword_rules:
+            if pattern.search(description):
+                scores = dict(rule_scores)
+                break
+
+        for _, pattern, adjust in self.system_rules:
+            if pattern.search(system):
+                for field in SCORE_FIELDS:
+                    scores[field] += adjust[field]
+                break
+
+        for field in SCORE_FIELDS:
+            scores[field] = max(1, min(5, scores[field]))
+        return self._with_criticality(scores)
+
+    def predict_frame(self, df: "pd.DataFrame") -> Dict[str, "np.ndarray"]:
+        """Score a whole DataFrame, returning one int array per score column"""
+        if not VECTORIZED_RULES_AVAILABLE:
+            raise RuntimeError("numpy and pandas are required for vectorized rule scoring")
+        n_rows = len(df)
+
+        def lowered(column: str):
+            values = df[column].fillna("").astype(str) if column in df.columns else pd.Series([""] * n_rows)
+            if ARROW_AVAILABLE:
+                return pc.utf8_lower(pa.array(values.to_numpy(dtype=object), type=pa.string()))
+            return values.str.lower()
+
+        def matches(values, pattern: re.Pattern) -> "np.ndarray":
+            if ARROW_AVAILABLE:
+                return pc.match_substring_regex(values, pattern.pattern).to_numpy(zero_copy_only=False)
+            return values.str.contains(pattern, regex=True).to_numpy()
+
+        descriptions = lowered('description')
+        systems = lowered('systeme')
+
+        keyword_masks = [matches(descriptions, pattern) for _, pattern, _ in self.keyword_rules]
+        system_masks = [matches(systems, pattern) for _, pattern, _ in self.system_rules]
+
+        result = {}
+        for field in SCORE_FIELDS:
+            if keyword_masks:
+                scores = np.select(keyword_masks, [rule_scores[field] for _, _, rule_scores in self.keyword_rules],
+                                   default=self.default_scores[field])
+            else:
+                scores = np.full(n_rows, self.default_scores[field])
+            if system_masks:
+                scores = scores + np.select(system_masks, [adjust[field] for _, _, adjust in self.system_rules], default=0)
+            result[field] = np.clip(scores, 1, 5).astype(np.int64)
+
+        result["ai_criticality_level"] = sum(result[field] for field in SCORE_FIELDS)
+        return result
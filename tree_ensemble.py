@@ -0,0 +1,212 @@
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+# Keep the (rows x trees) traversal state of one chunk around this many cells
+CHUNK_CELLS = 1 << 21
+
+
+def _forest_trees(estimator) -> Optional[List[Any]]:
+    """Return the fitted single-output trees of an averaging forest, or None"""
+    trees = getattr(estimator, "estimators_", None)
+    if not trees or getattr(estimator, "n_outputs_", None) != 1:
+        return None
+    # Only averaging regressors (RandomForest / ExtraTrees) share sklearn's predict formula
+    if type(estimator).__name__ not in ("RandomForestRegressor", "ExtraTreesRegressor"):
+        return None
+    return list(trees)
+
+
+def export_ensemble(model) -> Optional[Dict[str, np.ndarray]]:
+    """Flatten a forest, or a MultiOutputRegressor of forests, into contiguous arrays.
+
+    All trees of all targets are concatenated: per node ``feature``,
+    ``threshold``, ``left``, ``right``, ``missing_left`` and the leaf ``value``;
+    per tree the global index of its root; and per target the range of trees
+    averaged into it. Leaves point to themselves, so a finished row simply
+    stays put while the others keep walking. Returns None for unsupported
+    models.
+    """
+    if type(model).__name__ == "MultiOutputRegressor":
+        estimators = getattr(model, "estimators_", None) or []
+    else:
+        estimators = [model]
+
+    target_trees = [_forest_trees(estimator) for estimator in estimators]
+    if not target_trees or any(trees is None for trees in target_trees):
+        return None
+
+    features, thresholds, lefts, rights, missing, values, roots = [], [], [], [], [], [], []
+    target_offsets = [0]
+    offset = 0
+    max_depth = 0
+    for trees in target_trees:
+        for tree in trees:
+            t = tree.tree_
+            node_ids = np.arange(t.node_count)
+            is_leaf = t.children_left == -1
+
+            features.append(np.where(is_leaf, 0, t.feature).astype(np.int32))
+            thresholds.append(np.where(is_leaf, np.inf, t.threshold).astype(np.float64))
+            lefts.append((np.where(is_leaf, node_ids, t.children_left) + offset).astype(np.int64))
+            rights.append((np.where(is_leaf, node_ids, t.children_right) + offset).astype(np.int64))
+            if hasattr(t, "missing_go_to_left"):
+                missing.append(np.asarray(t.missing_go_to_left, dtype=bool))
+            else:
+                missing.append(np.zeros(t.node_count, dtype=bool))
+            values.append(np.ascontiguousarray(t.value[:, 0, 0], dtype=np.float64))
+            roots.append(offset)
+            max_depth = max(max_depth, int(t.max_depth))
+            offset += t.node_count
+        target_offsets.append(len(roots))
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "missing_left": np.concatenate(missing),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int64),
+        "target_offsets": np.asarray(target_offsets, dtype=np.int64),
+        "max_depth": np.asarray(max_depth, dtype=np.int64),
+    }
+
+
+class TreeEnsembleEvaluator:
+    """Vectorized scorer over an exported ensemble.
+
+    All trees for all targets are traversed together, one NumPy step per
+    tree level for every (row, tree) pair that has not reached a leaf yet,
+    and per-target averages are accumulated in the same order as
+    scikit-learn so the predictions are bit-for-bit identical.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.arrays = arrays
+        self.feature = arrays["feature"]
+        self.threshold = arrays["threshold"]
+        self.left = arrays["left"]
+        self.right = arrays["right"]
+        self.missing_left = arrays["missing_left"]
+        self.value = arrays["value"]
+        self.roots = arrays["roots"]
+        self.target_offsets = arrays["target_offsets"]
+        self.max_depth = int(arrays["max_depth"])
+        self.n_targets = len(self.target_offsets) - 1
+        self.has_missing_left = bool(self.missing_left.any())
+        # Children interleaved as [left, right] per node for a single gather per step;
+        # saved artifacts carry both precomputed so memory-mapped arrays are not copied
+        if "children" in arrays and "is_leaf" in arrays:
+            self.children = arrays["children"]
+            self.is_leaf = arrays["is_leaf"]
+        else:
+            index_dtype = np.int32 if len(self.left) < np.iinfo(np.int32).max // 2 else np.int64
+            self.children = np.column_stack([self.left, self.right]).ravel().astype(index_dtype)
+            self.is_leaf = self.left == np.arange(len(self.left))
+
+    @classmethod
+    def from_model(cls, model) -> Optional["TreeEnsembleEvaluator"]:
+        """Export ``model`` and build an evaluator, or return None if unsupported"""
+        arrays = export_ensemble(model)
+        return cls(arrays) if arrays is not None else None
+
+    def _leaf_values(self, X: np.ndarray) -> np.ndarray:
+        """Leaf value reached by every row in every tree, shape (rows, trees)"""
+        n_rows, n_features = X.shape
+        n_trees = len(self.roots)
+        flat_X = X.ravel()
+
+        # One entry per (row, tree) pair still walking down its tree
+        nodes = np.tile(self.roots.astype(self.children.dtype), n_rows)
+        pairs = np.arange(n_rows * n_trees, dtype=np.int64)
+        row_base = np.repeat(np.arange(n_rows, dtype=np.int64) * n_features, n_trees)
+        leaves = np.empty(n_rows * n_trees, dtype=self.children.dtype)
+
+        for _ in range(self.max_depth):
+            x = flat_X[row_base + self.feature[nodes]]
+            # float32 inputs are compared in float64, as in the Cython trees
+            go_right = ~(x <= self.threshold[nodes])
+            if self.has_missing_left:
+                go_right &= ~(np.isnan(x) & self.missing_left[nodes])
+            nodes = self.children[2 * nodes + go_right]
+
+            # Leaves loop onto themselves; drop finished pairs once they are
+            # at least half of the working set
+            done = self.is_leaf[nodes]
+            n_done = np.count_nonzero(done)
+            if n_done == len(nodes):
+                break
+            if n_done * 2 >= len(nodes):
+                leaves[pairs[done]] = nodes[done]
+                active = ~done
+                nodes, pairs, row_base = nodes[active], pairs[active], row_base[active]
+        leaves[pairs] = nodes
+        return self.value[leaves].reshape(n_rows, n_trees)
+
+    def predict(self, X: Any) -> np.ndarray:
+        """Predict all targets, shape (rows, targets)"""
+        n_rows = X.shape[0]
+        out = np.empty((n_rows, self.n_targets), dtype=np.float64)
+        chunk = max(1, CHUNK_CELLS // max(1, len(self.roots)))
+        for start in range(0, n_rows, chunk):
+            block = X[start:start + chunk]
+            if hasattr(block, "toarray"):
+                block = block.toarray()
+            # scikit-learn casts inputs to float32 before walking the trees
+            block = np.asarray(block, dtype=np.float32)
+            leaf_values = self._leaf_values(block)
+            for k in range(self.n_targets):
+                lo, hi = self.target_offsets[k], self.target_offsets[k + 1]
+                # cumsum adds left to right, matching the forest's sequential accumulation
+                out[start:start + chunk, k] = np.cumsum(leaf_values[:, lo:hi], axis=1)[:, -1] / (hi - lo)
+        return out
+
+    def matches(self, model, X: Any) -> bool:
+        """Check the evaluator against the model's own predictions"""
+        expected = np.asarray(model.predict(X), dtype=np.float64).reshape(X.shape[0], -1)
+        return np.array_equal(self.predict(X), expected)
+
+
+class TreeEnsembleScorer:
+    """Route each batch to the faster of the array evaluator and the model.
+
+    The evaluator removes scikit-learn's per-estimator dispatch overhead,
+    which dominates small batches; for large batches the model's compiled
+    tree traversal is faster. Both give identical predictions. Without a
+    model (e.g. an evaluator built from exported arrays) every batch goes
+    to the evaluator.
+    """
+
+    def __init__(self, evaluator: TreeEnsembleEvaluator, model=None, max_batch: int = None):
+        self.evaluator = evaluator
+        self.model = model
+        self.max_batch = max_batch if max_batch is not None else int(os.environ.get("TAMS_TREE_EVALUATOR_MAX_BATCH", "64"))
+
+    def predict(self, X: Any) -> np.ndarray:
+        if self.model is None or X.shape[0] <= self.max_batch:
+            return self.evaluator.predict(X)
+        return np.asarray(self.model.predict(X))
+
+
+def build_scorer(model, n_features: int = None, probe_rows: int = 64) -> Optional[TreeEnsembleScorer]:
+    """Export ``model`` when supported and verify it on a random probe batch.
+
+    Disabled with TAMS_TREE_EVALUATOR=false. Returns None when the model is
+    unsupported or the probe predictions differ from scikit-learn.
+    """
+    if os.environ.get("TAMS_TREE_EVALUATOR", "true").lower() not in ("1", "true", "yes"):
+        return None
+    evaluator = TreeEnsembleEvaluator.from_model(model)
+    if evaluator is None:
+        return None
+
+    n_features = n_features or getattr(model, "n_features_in_", None)
+    if n_features:
+        rng = np.random.default_rng(0)
+        probe = rng.integers(0, 50, size=(probe_rows, n_features)).astype(np.float64)
+        if not evaluator.matches(model, probe):
+            print("Warning: tree evaluator predictions differ from the model, using the model directly")
+            return None
+    return TreeEnsembleScorer(evaluator, model)
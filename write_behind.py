@@ -0,0 +1,280 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+# Records are acknowledged once written to this local queue, then stored in the background
+WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "false").lower() in ("1", "true", "yes")
+# SQLite file of the queue (kept across restarts; unflushed records are replayed)
+WRITE_BEHIND_PATH = os.environ.get("WRITE_BEHIND_PATH", "write_behind.db")
+# SQLite synchronous mode: NORMAL survives process crashes, FULL also survives power loss
+WRITE_BEHIND_SYNCHRONOUS = os.environ.get("WRITE_BEHIND_SYNCHRONOUS", "NORMAL").upper()
+# Records sent to the database per flush, and the longest wait before a partial batch is flushed
+WRITE_BEHIND_FLUSH_ROWS = int(os.environ.get("WRITE_BEHIND_FLUSH_ROWS", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL_SECONDS", "1"))
+# Wait after a flush that stored nothing (database unreachable) before trying again
+WRITE_BEHIND_RETRY_SECONDS = float(os.environ.get("WRITE_BEHIND_RETRY_SECONDS", "5"))
+# Flushes a record may fail, other than transiently, before it is moved to the dead letter table
+WRITE_BEHIND_MAX_ATTEMPTS = int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", "10"))
+# Queued records above which new records are refused
+WRITE_BEHIND_MAX_DEPTH = int(os.environ.get("WRITE_BEHIND_MAX_DEPTH", "100000"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pending (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS dead_letter (
+    seq INTEGER PRIMARY KEY,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    attempts INTEGER NOT NULL,
+    error TEXT,
+    failed_at REAL NOT NULL
+);
+"""
+
+
+class WriteBehindFull(Exception):
+    """The queue holds ``max_depth`` records; the database is not keeping up"""
+
+
+class WriteBehindQueue:
+    """Durable local queue in front of the database for single-record storage.
+
+    ``enqueue`` commits the record to an SQLite database in WAL mode and
+    returns its id without waiting for the database round trip. A
+    background flusher sends the oldest ``flush_rows`` records through a
+    ``BulkWriter`` whenever that many are queued or ``flush_interval`` has
+    passed, and deletes them once stored. Records that are still queued at
+    shutdown or after a crash are replayed on the next start. Each record
+    gets its id when queued and duplicates are ignored on insert, so
+    replaying a record that was stored just before a crash does not store
+    it twice. Failed records are retried in ever smaller requests, and a
+    record failing ``max_attempts`` flushes is moved to the ``dead_letter``
+    table. Transient failures (database unreachable, timeout, 5xx) do not
+    count as attempts: the records wait in the queue until the database
+    is back, however long the outage.
+    """
+
+    def __init__(self, writer, path: str = None, flush_rows: int = None, flush_interval: float = None,
+                 retry_seconds: float = None, max_attempts: int = None, max_depth: int = None,
+                 synchronous: str = None):
+        self.writer = writer
+        self.path = path or WRITE_BEHIND_PATH
+        self.flush_rows = flush_rows or WRITE_BEHIND_FLUSH_ROWS
+        self.flush_interval = flush_interval if flush_interval is not None else WRITE_BEHIND_FLUSH_INTERVAL_SECONDS
+        self.retry_seconds = retry_seconds if retry_seconds is not None else WRITE_BEHIND_RETRY_SECONDS
+        self.max_attempts = max_attempts or WRITE_BEHIND_MAX_ATTEMPTS
+        self.max_depth = max_depth or WRITE_BEHIND_MAX_DEPTH
+        self.synchronous = synchronous or WRITE_BEHIND_SYNCHRONOUS
+
+        self._conn: Optional[sqlite3.Connection] = None
+        # One connection shared by the event loop's worker threads
+        self._lock = threading.Lock()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.depth = 0
+        self._oldest_enqueued_at: Optional[float] = None
+
+        # Metrics
+        self.enqueued_total = 0
+        self.replayed = 0
+        self.flushes_total = 0
+        self.flush_failures = 0
+        self.rows_flushed_total = 0
+        self.dead_lettered_total = 0
+        self.last_flush_at: Optional[float] = None
+        self.last_flush_lag: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def _connect(self):
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+            self._refresh_depth()
+        return self._conn
+
+    def _refresh_depth(self):
+        depth, oldest = self._conn.execute("SELECT COUNT(*), MIN(enqueued_at) FROM pending").fetchone()
+        self.depth, self._oldest_enqueued_at = depth, oldest
+
+    def open(self):
+        """Open the queue file; records left by a previous run are flushed first"""
+        with self._lock:
+            self._connect()
+        if self.depth:
+            self.replayed = self.depth
+            print(f"Write-behind queue: replaying {self.depth} unflushed records from {self.path}")
+
+    def _append(self, payload: str, enqueued_at: float):
+        with self._lock:
+            self._connect().execute(
+                "INSERT INTO pending (payload, enqueued_at) VALUES (?, ?)", (payload, enqueued_at)
+            )
+            if self.depth == 0:
+                self._oldest_enqueued_at = enqueued_at
+            self.depth += 1
+
+    async def enqueue(self, row: Dict[str, Any]) -> str:
+        """Durably queue one database row and return its id"""
+        if self.depth >= self.max_depth:
+            raise WriteBehindFull(f"Write-behind queue is full ({self.depth} records waiting for the database)")
+        row = {'id': row.get('id') or str(uuid.uuid4()), **row}
+        await asyncio.to_thread(self._append, json.dumps(row, default=str), time.time())
+        self.enqueued_total += 1
+        self._ensure_started()
+        if self.depth >= self.flush_rows:
+            self._wakeup.set()
+        return row['id']
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def start(self):
+        """Open the queue and start the flusher (call from the event loop)"""
+        self.open()
+        self._ensure_started()
+
+    async def stop(self, flush: bool = True):
+        """Stop the flusher, after a last flush when ``flush`` is set; queued records stay on disk"""
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        if flush and self.depth:
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Warning: write-behind flush at shutdown failed: {str(e)}")
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    async def _run(self):
+        while True:
+            if self.depth < self.flush_rows:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+                except asyncio.TimeoutError:
+                    pass
+            self._wakeup.clear()
+            if not self.depth:
+                continue
+            try:
+                stored = await self.flush()
+            except Exception as e:
+                stored = 0
+                self.last_error = f"{type(e).__name__}: {e}"
+                print(f"Warning: write-behind flush failed: {str(e)}")
+            if stored == 0 and self.depth:
+                # Nothing got through: give the database time to recover
+                await asyncio.sleep(self.retry_seconds)
+
+    def _read_batch(self) -> List[tuple]:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT seq, payload, enqueued_at, attempts FROM pending ORDER BY seq LIMIT ?", (self.flush_rows,)
+            ).fetchall()
+
+    def _settle(self, stored_seqs: List[int], failed: List[tuple]):
+        """Delete stored records; count a failed attempt on the others, dead-lettering the exhausted ones
+
+        ``failed`` holds (seq, attempts, error) of the records whose failure
+        was not transient; records that failed transiently stay as they are.
+        """
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("DELETE FROM pending WHERE seq = ?", [(seq,) for seq in stored_seqs])
+                retry = [(seq,) for seq, attempts, _ in failed if attempts + 1 < self.max_attempts]
+                dead = [(seq, error) for seq, attempts, error in failed if attempts + 1 >= self.max_attempts]
+                conn.executemany("UPDATE pending SET attempts = attempts + 1 WHERE seq = ?", retry)
+                conn.executemany(
+                    "INSERT OR REPLACE INTO dead_letter (seq, payload, enqueued_at, attempts, error, failed_at) "
+                    "SELECT seq, payload, enqueued_at, attempts + 1, ?, ? FROM pending WHERE seq = ?",
+                    [(error, time.time(), seq) for seq, error in dead],
+                )
+                conn.executemany("DELETE FROM pending WHERE seq = ?", [(seq,) for seq, _ in dead])
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            self._refresh_depth()
+            return len(dead)
+
+    async def flush(self) -> int:
+        """Send the oldest queued records to the database; returns how many were stored"""
+        batch = await asyncio.to_thread(self._read_batch)
+        if not batch:
+            return 0
+
+        stored_seqs, failed, transient = [], [], 0
+        for attempts in sorted({record[3] for record in batch}):
+            group = [record for record in batch if record[3] == attempts]
+            # Records that failed before go in smaller requests each time, isolating a bad record
+            chunk_rows = max(1, self.writer.chunk_rows // 10 ** attempts)
+            result = await self.writer.write([json.loads(payload) for _, payload, _, _ in group], chunk_rows=chunk_rows)
+            for chunk in result.chunks:
+                for seq, _, _, _ in group[chunk.start:chunk.start + chunk.rows]:
+                    if chunk.stored:
+                        stored_seqs.append(seq)
+                    elif chunk.transient:
+                        # Database unavailable: retried after a backoff without using up an attempt
+                        transient += 1
+                        self.last_error = chunk.error
+                    else:
+                        failed.append((seq, attempts, chunk.error))
+        dead = await asyncio.to_thread(self._settle, stored_seqs, failed)
+
+        now = time.time()
+        self.flushes_total += 1
+        self.rows_flushed_total += len(stored_seqs)
+        self.dead_lettered_total += dead
+        if stored_seqs:
+            self.last_flush_at = now
+            # Time the oldest record of this flush spent waiting for the database
+            self.last_flush_lag = now - batch[0][2]
+        if failed or transient:
+            self.flush_failures += 1
+        if failed:
+            self.last_error = failed[0][2]
+        if dead:
+            print(f"Warning: {dead} write-behind records failed {self.max_attempts} times, moved to dead_letter")
+        return len(stored_seqs)
+
+    def metrics(self) -> Dict[str, Any]:
+        now = time.time()
+        return {
+            "path": self.path,
+            "depth": self.depth,
+            "max_depth": self.max_depth,
+            # Age of the oldest record not yet in the database
+            "flush_lag_seconds": now - self._oldest_enqueued_at if self.depth and self._oldest_enqueued_at else 0.0,
+            "last_flush_lag_seconds": self.last_flush_lag,
+            "last_flush_age_seconds": now - self.last_flush_at if self.last_flush_at else None,
+            "enqueued_total": self.enqueued_total,
+            "replayed": self.replayed,
+            "flushes_total": self.flushes_total,
+            "flush_failures": self.flush_failures,
+            "rows_flushed_total": self.rows_flushed_total,
+            "dead_lettered_total": self.dead_lettered_total,
+            "last_error": self.last_error,
+        }